@@ -24,25 +24,72 @@ Options:
     --skip-setup          Skip resource extraction (if src/resources already exists)
     --skip-apk            Only build Game.love, skip APK packaging
     --force               Force Game.love rebuild even if sources are unchanged
+    --full-apk            Always rebuild the APK with apktool instead of swapping
+                          game.love into the last one
     --import-save PATH    Bake a desktop save folder or Takeout zip into the APK
     --steamodded [TAG]    Bundle Steamodded into the APK (default: latest release)
+    --bytecode            Ship Game.love's Lua as stripped LuaJIT bytecode (faster
+                          launch; 64-bit devices only, not with --steamodded)
+    --luajit PATH         LuaJIT 2.1 used by --bytecode (default: luajit on PATH)
+    --reproducible        Byte-identical Game.love, unsigned APK and IPA for
+                          identical inputs: every entry dated SOURCE_DATE_EPOCH or
+                          the last commit (implied when SOURCE_DATE_EPOCH is set)
+    --explain             Print why each build stage (extract, overlay, Game.love,
+                          decode, patches, repack, sign, IPA) ran or was skipped
+    --matrix FILE         Build every variant in a JSON list (keys: name,
+                          disable_crt, readabletro, steamodded, ios) into dist/,
+                          sharing the tool setup and unsigned APK; ends with a
+                          size/time table
+    --concurrent          With --ios, package the APK and the IPA side by side,
+                          each job's log printed whole, one merged timing report
+    --profile-out FILE    Write every timed span (wall, CPU, peak RSS, bytes read and
+                          written) to FILE as JSON, plus a Chrome trace next to it
+    --jobs N, -j N        Threads used to compress Game.love (default: all cores)
+    --cache-dir DIR       Shared download/artifact cache (default ~/.cache/balatro-portrait;
+                          'off' disables it)
+    --signer MODE         builtin: align and sign in Python (no JVM); legacy:
+                          uber-apk-signer / Termux apksigner; auto (default):
+                          builtin unless an APK was already signed the legacy way
     --version             Print the mod version and exit
 """
 
 import argparse
+import collections
+import concurrent.futures
+import contextlib
 import hashlib
+import http.client
+import inspect
+import io
 import json
 import os
 import platform
 import plistlib
 import re
 import shutil
+import struct
 import subprocess
 import sys
 import tarfile
+import tempfile
+import threading
 import time
+import traceback
+import urllib.error
 import urllib.request
 import zipfile
+import zlib
+
+try:
+    import resource                 # peak RSS; not on Windows
+except ImportError:
+    resource = None
+
+try:
+    import fcntl                    # lock files (POSIX)
+except ImportError:
+    fcntl = None
+    import msvcrt                   # lock files (Windows)
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Constants
@@ -63,9 +110,26 @@ def _read_mod_version():
 
 MOD_VERSION = _read_mod_version()
 
+
+def _version_code(version=None):
+    """android:versionCode for MOD_VERSION: 2_000_000_000 + major*1e6 +
+    minor*1e3 + patch. Builds used to stamp the Unix time, which stays below
+    2e9 until 2033, so these codes still install over every one of those."""
+    parts = [int(p) for p in re.findall(r"\d+", version or MOD_VERSION)[:3]]
+    major, minor, patch = parts + [0] * (3 - len(parts))
+    if major > 99 or minor > 999 or patch > 999:
+        raise ValueError(f"version {version or MOD_VERSION} does not fit a versionCode")
+    return 2_000_000_000 + major * 1_000_000 + minor * 1_000 + patch
+
+
 CONFIG_FILE = ".buildconfig.json"
 CACHE_FILE  = ".build_cache.json"
 OFFICIAL_ANDROID_PACKAGE = "com.playstack.balatro.android"
+# Reproducible builds (--reproducible, or SOURCE_DATE_EPOCH in the
+# environment): the timestamp every archive entry gets. None writes real ones.
+SOURCE_DATE = None
+# --explain: print why each build stage ran or was skipped.
+EXPLAIN = False
 DEFAULT_BUILD_CONFIG = {
     # Legacy key name kept for saved .buildconfig.json files: "crt": True
     # means the CRT shader gets DISABLED (the user-facing flag is --disable-crt).
@@ -77,6 +141,51 @@ DEFAULT_BUILD_CONFIG = {
 WORKDIR  = os.path.abspath("balatro-mobile-maker")
 JDK_DIR  = os.path.join(WORKDIR, "jdk")
 JAVA_BIN = os.path.join(JDK_DIR, "bin", "java")  # resolved after JDK extraction
+# Inputs of the last full APK build, for the game.love swap fast path.
+GRAPH_FILE     = os.path.join(WORKDIR, "build_graph.json")
+APK_TEMPLATE   = os.path.join(WORKDIR, "balatro-template.apk")
+SIGNER_KEY     = os.path.join(WORKDIR, "debug-signer.pem")
+SIGNED_APK     = os.path.join(WORKDIR, "balatro-aligned-debugSigned.apk")
+DOWNLOAD_STAMP_FILE = os.path.join(WORKDIR, "downloads.json")
+
+
+def _default_store_dir():
+    value = os.environ.get("BALATRO_PORTRAIT_CACHE")
+    if value is not None:
+        return None if value.lower() in ("", "0", "off", "none") else os.path.abspath(value)
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser(os.path.join("~", ".cache"))
+    return os.path.join(base, "balatro-portrait")
+
+
+def _parse_size(text):
+    text = text.strip().upper().rstrip("B")
+    scale = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}.get(text[-1:], 1)
+    return int(float(text.rstrip("KMG")) * scale)
+
+
+STORE_DEFAULT_MAX = "4G"
+
+
+def _store_max_bytes():
+    """BALATRO_PORTRAIT_CACHE_MAX, read when the store is trimmed rather than
+    at import, so a bad value cannot break every script importing build.py."""
+    value = os.environ.get("BALATRO_PORTRAIT_CACHE_MAX", STORE_DEFAULT_MAX)
+    try:
+        return _parse_size(value)
+    except ValueError:
+        print(f"  Warning: BALATRO_PORTRAIT_CACHE_MAX={value!r} is not a size such as 4G; "
+              f"using {STORE_DEFAULT_MAX}.")
+        return _parse_size(STORE_DEFAULT_MAX)
+
+
+# Downloads and build artifacts shared by every checkout on the machine,
+# stored by SHA-256 (BALATRO_PORTRAIT_CACHE=off or --cache-dir off disables
+# it). BALATRO_PORTRAIT_CACHE_MAX caps its size; least recently used entries
+# go first.
+STORE_DIR       = _default_store_dir()
 
 # Termux (building directly on an Android phone): the downloaded desktop JDK
 # and the aapt binaries bundled inside the apktool jar are x86-64 only and
@@ -149,6 +258,8 @@ CRT_NOISE_COMMENTED_LINES = (
 
 GAME_LOVE_EXCLUDE = {"smali", ".pyc", "__pycache__", ".git", ".gitignore", ".bak", ".build_cache.json"}
 
+READABLETRO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "patches", "readabletro")
+
 READABLETRO_LUA_PATCHES = {
     "game.lua": [
         (
@@ -173,41 +284,193 @@ READABLETRO_LUA_PATCHES = {
 # Helpers
 # ─────────────────────────────────────────────────────────────────────────────
 
+# The spans open on each thread, innermost last. Helpers deep in the build
+# (downloads, apktool, subprocesses) open theirs through _span(), under
+# whichever step is timing them, without being handed a profiler.
+_OPEN_SPANS = threading.local()
+
+
+def _open_spans():
+    stack = getattr(_OPEN_SPANS, "stack", None)
+    if stack is None:
+        stack = _OPEN_SPANS.stack = []
+    return stack
+
+
+def _resource_sample():
+    """(CPU seconds, peak RSS, bytes read, bytes written) of this process.
+    CPU includes subprocesses that have finished (apktool's JVM, luajit,
+    apksigner). Peak RSS is the larger of this process's and the largest
+    finished subprocess's. The byte counters come from /proc/self/io, so
+    they are None off Linux/Android, as is the RSS on Windows."""
+    t = os.times()
+    cpu = t.user + t.system + t.children_user + t.children_system
+    rss = None
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+        scale = 1 if sys.platform == "darwin" else 1024
+        rss = scale * max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                          resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    read = written = None
+    try:
+        with open("/proc/self/io") as f:
+            counters = dict(line.split(":", 1) for line in f if ":" in line)
+        read, written = int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        pass
+    return cpu, rss, read, written
+
+
 class BuildProfiler:
+    """Nested spans for one build. Each span records its wall and CPU time,
+    the peak RSS when it ended and the bytes read and written while it was
+    open. CPU and I/O are process-wide, so spans open side by side on
+    several threads each count the others' work too."""
+
     def __init__(self):
-        self.steps = []
+        self.spans = []
         self._wall = time.time()
-
-    def step(self, name):
-        return _Step(self, name)
-
-    def record(self, name, duration):
-        self.steps.append((name, duration))
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def step(self, name, **args):
+        """A span under the innermost step of this profiler open on this thread."""
+        parent = next((s for s in reversed(_open_spans()) if s.p is self), None)
+        return _Step(self, name, parent.id if parent else None, args)
+
+    def _new_ids(self, count=1):
+        with self._lock:
+            first = self._next_id
+            self._next_id += count
+        return first
+
+    def record(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    @property
+    def steps(self):
+        """(name, seconds) of the top-level spans."""
+        return [(s["name"], s["dur"]) for s in self.spans if s["parent"] is None]
+
+    def absorb(self, label, spans):
+        """Merge in the spans a worker process recorded. They are renumbered,
+        and the worker's top-level spans are named "<label>: <name>" and hung
+        under the step open here, if there is one."""
+        if not spans:
+            return
+        parent = next((s for s in reversed(_open_spans()) if s.p is self), None)
+        base = self._new_ids(max(s["id"] for s in spans) + 1)
+        for span in spans:
+            top = span["parent"] is None
+            self.record(dict(span, id=base + span["id"],
+                             name=f"{label}: {span['name']}" if top else span["name"],
+                             parent=(parent.id if parent else None) if top else base + span["parent"]))
+
+    def _tree(self):
+        """[(depth, span)] depth-first, children in start order."""
+        children = collections.defaultdict(list)
+        ids = {s["id"] for s in self.spans}
+        for span in self.spans:
+            children[span["parent"] if span["parent"] in ids else None].append(span)
+        out = []
+
+        def _walk(parent, depth):
+            for span in sorted(children[parent], key=lambda s: s["start"]):
+                out.append((depth, span))
+                _walk(span["id"], depth + 1)
+        _walk(None, 0)
+        return out
 
     def report(self):
         total = sum(d for _, d in self.steps)
         wall  = time.time() - self._wall
+        rows = [("  " * depth + span["name"], span) for depth, span in self._tree()]
         sep = "-" * 50
         print(f"\n{sep}")
+        width = max([28] + [len(name) for name, _ in rows])
         print("Build time breakdown:")
-        for name, d in self.steps:
-            pct = d / total * 100 if total else 0
-            print(f"  {name:<28}  {d:>5.1f}s  ({pct:.0f}%)")
-        print(f"  {'Total':<28}  {wall:>5.1f}s")
+        print(f"  {'':<{width}}  {'wall':>6}  {'':>6}  {'cpu':>6}  {'peak rss':>8}  {'read':>8}  {'written':>8}")
+        for name, span in rows:
+            pct = span["dur"] / max(total, wall) * 100 if wall else 0
+            print(f"  {name:<{width}}  {span['dur']:>5.1f}s  ({pct:>3.0f}%)  {span['cpu']:>5.1f}s  "
+                  f"{_format_mb(span['rss']):>8}  {_format_mb(span['read']):>8}  "
+                  f"{_format_mb(span['written']):>8}")
+        print(f"  {'Total':<{width}}  {wall:>5.1f}s")
+        if total > wall:
+            print("  (jobs ran side by side, so their steps add up to more than the total)")
         print(sep)
 
+    def export(self, path):
+        """Write the spans to `path` as JSON, and as a Chrome trace_event file
+        (chrome://tracing, ui.perfetto.dev) next to it, <stem>.trace.json.
+        Returns the trace file's path."""
+        spans = [span for _depth, span in self._tree()]
+        profile = {"version": MOD_VERSION, "started": self._wall,
+                   "wall": time.time() - self._wall, "spans": spans}
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+                   "args": {"name": "build.py" if pid == os.getpid() else f"build.py worker {pid}"}}
+                  for pid in sorted({span["pid"] for span in spans})]
+        for span in spans:
+            args = {"cpu_s": round(span["cpu"], 3), "peak_rss": span["rss"],
+                    "bytes_read": span["read"], "bytes_written": span["written"], **span["args"]}
+            events.append({"name": span["name"], "cat": "build", "ph": "X",
+                           "ts": round((span["start"] - self._wall) * 1e6),
+                           "dur": round(span["dur"] * 1e6), "pid": span["pid"], "tid": span["tid"],
+                           "args": args})
+        trace = os.path.splitext(path)[0] + ".trace.json"
+        for out, data in ((path, profile), (trace, {"traceEvents": events, "displayTimeUnit": "ms"})):
+            os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+            with open(out, "w") as f:
+                json.dump(data, f, indent=1)
+        return trace
+
+
+def _format_mb(value):
+    return "-" if value is None else f"{value / 1_048_576:.1f} MB"
+
 
 class _Step:
-    def __init__(self, profiler, name):
-        self.p    = profiler
-        self.name = name
+    def __init__(self, profiler, name, parent, args):
+        self.p      = profiler
+        self.name   = name
+        self.parent = parent
+        self.args   = args      # extra detail for the trace; may be added to while open
 
     def __enter__(self):
+        if self.p is None:
+            return self
+        self.id = self.p._new_ids()
         self._t = time.time()
+        self._sample = _resource_sample()
+        _open_spans().append(self)
         return self
 
     def __exit__(self, *_):
-        self.p.record(self.name, time.time() - self._t)
+        if self.p is None:
+            return
+        dur = time.time() - self._t
+        cpu, rss, read, written = _resource_sample()
+        _open_spans().remove(self)
+        self.p.record({
+            "id": self.id, "parent": self.parent, "name": self.name,
+            "start": self._t, "dur": dur, "cpu": cpu - self._sample[0], "rss": rss,
+            "read": None if read is None else read - self._sample[2],
+            "written": None if written is None else written - self._sample[3],
+            "pid": os.getpid(), "tid": threading.get_ident(), "args": self.args,
+        })
+
+
+def _span(name, parent=None, **args):
+    """A span under the innermost step open on this thread, or under
+    `parent` (a span taken from _open_spans() on another thread). Outside
+    any step it records nothing, so helpers can open spans unconditionally."""
+    if parent is None:
+        stack = _open_spans()
+        parent = stack[-1] if stack else None
+    if parent is None:
+        return _Step(None, name, None, args)
+    return _Step(parent.p, name, parent.id, args)
 
 
 def _ask(prompt, default=None):
@@ -229,6 +492,33 @@ def _ask(prompt, default=None):
         print("  Please enter y or n.")
 
 
+@contextlib.contextmanager
+def _file_lock(path):
+    """Hold an exclusive lock on `path`.lock for a read-modify-write of
+    `path` shared by several processes (the jobs of a concurrent build).
+    The OS drops the lock if its holder dies, so none is ever left stale."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".lock", "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:     # LK_LOCK gives up after ~10 s; keep waiting
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
 def _sha256_of(path):
     h = hashlib.sha256()
     with open(path, "rb") as f:
@@ -237,54 +527,705 @@ def _sha256_of(path):
     return h.hexdigest()
 
 
-def _verify_download(url, dest):
-    expected = TOOL_SHA256.get(url)
-    if not expected:
+# ── Shared tool cache ────────────────────────────────────────────────────────
+#
+# STORE_DIR/objects/ab/<sha256> holds one verified file each. Files are only
+# moved into place with os.replace, so concurrent builds never see a partial
+# object, and both copies of a file inserted twice are identical anyway.
+# Because content is never modified, objects are hardlinked into WORKDIR. For
+# that reason, recency lives in a sibling "<sha256>.used" file rather than the
+# object's own mtime, which it shares with every link. refs/<hash of key>
+# maps a name that has no pinned hash (an unpinned URL, a build key) to the
+# object it last resolved to.
+
+def _store_object(sha):
+    return os.path.join(STORE_DIR, "objects", sha[:2], sha)
+
+
+def _store_write(path, data):
+    """Atomically write `data` to `path` inside the store."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _store_touch(sha):
+    try:
+        _store_write(_store_object(sha) + ".used", "")
+    except OSError:
+        pass
+
+
+def _store_ref(key, max_age=None):
+    """Object hash last stored under `key`, or None. With `max_age`
+    (seconds), refs older than that are ignored."""
+    if not STORE_DIR:
+        return None
+    path = os.path.join(STORE_DIR, "refs", _bytes_hash(key.encode()))
+    try:
+        if max_age is not None and time.time() - os.stat(path).st_mtime > max_age:
+            return None
+        with open(path) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _store_get(sha):
+    """Path of the object `sha` if the store has it, marking it used."""
+    if not STORE_DIR or not sha:
+        return None
+    path = _store_object(sha)
+    if not os.path.isfile(path):
+        return None
+    _store_touch(sha)
+    return path
+
+
+def _store_link(sha, dest):
+    """Materialise object `sha` at `dest` (hardlink, else copy). Returns
+    False if the object is missing, e.g. evicted by another build.
+
+    The store may be shared with other users and tools, so an object is
+    hashed before it is used. One whose content no longer matches its name
+    is deleted and reported as missing, and the caller fetches a fresh copy."""
+    src = _store_get(sha)
+    if not src:
+        return False
+    tmp = dest + ".store.tmp"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    try:
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copyfile(src, tmp)
+    except FileNotFoundError:
+        return False
+    if _sha256_of(tmp) != sha:
+        print(f"  Cached copy of {os.path.basename(dest)} is corrupt - removing it.")
+        os.remove(tmp)
+        try:
+            os.remove(src)
+        except OSError:
+            pass
+        return False
+    os.replace(tmp, dest)
+    return True
+
+
+def _store_put(path, sha, key=None):
+    """Add the verified file `path` as object `sha`, recording it under `key`
+    when given. Never fails the build: the store is only a cache."""
+    if not STORE_DIR:
+        return
+    try:
+        obj = _store_object(sha)
+        if not os.path.isfile(obj):
+            os.makedirs(os.path.dirname(obj), exist_ok=True)
+            tmp = f"{obj}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                os.link(path, tmp)
+            except OSError:
+                shutil.copyfile(path, tmp)
+            os.replace(tmp, obj)
+        _store_touch(sha)
+        if key:
+            _store_write(os.path.join(STORE_DIR, "refs", _bytes_hash(key.encode())), sha)
+    except OSError as exc:
+        print(f"  Warning: could not add {os.path.basename(path)} to the cache: {exc}")
+
+
+def _store_evict(limit=None):
+    """Delete least recently used objects until the store fits in `limit`."""
+    if not STORE_DIR:
         return
-    actual = _sha256_of(dest)
-    if actual != expected:
-        print(f"  ERROR: SHA-256 mismatch for {os.path.basename(dest)}")
-        print(f"    expected: {expected}")
-        print(f"    actual:   {actual}")
-        print("  The download may be corrupted or tampered with.")
-        print(f"  Delete the file and re-run: {dest}")
-        os.remove(dest)
+    limit = _store_max_bytes() if limit is None else limit
+    objects = []
+    root = os.path.join(STORE_DIR, "objects")
+    for path, st in _scan_tree(root) if os.path.isdir(root) else ():
+        if len(os.path.basename(path)) != 64:
+            continue
+        try:
+            used = os.stat(path + ".used").st_mtime
+        except OSError:
+            used = 0
+        objects.append((used, st.st_size, path))
+    total = sum(size for _used, size, _path in objects)
+    for _used, size, path in sorted(objects):
+        if total <= limit:
+            break
+        for victim in (path, path + ".used"):
+            try:
+                os.remove(victim)
+            except OSError:
+                pass
+        total -= size
+
+
+DOWNLOAD_JOBS    = 4
+DOWNLOAD_CHUNK   = 1 << 20
+DOWNLOAD_RETRIES = 5
+DOWNLOAD_BACKOFF = 2.0
+# URLs without a pinned hash (the LMM base APK, Steamodded tags) resolve
+# through the shared cache for a week before being fetched again.
+UNPINNED_URL_TTL = 7 * 24 * 3600
+
+
+class DownloadError(Exception):
+    pass
+
+
+class _DownloadProgress:
+    """A single progress bar summed over every transfer in flight."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = {}
+        self._drawn = 0.0
+
+    def update(self, name, done, total):
+        with self._lock:
+            self._files[name] = (done, total)
+            now = time.monotonic()
+            if now - self._drawn < 0.2:
+                return
+            self._drawn = now
+            done = sum(d for d, _ in self._files.values())
+            if all(t for _, t in self._files.values()):
+                total = sum(t for _, t in self._files.values())
+                pct    = min(done / total * 100, 100)
+                filled = int(30 * pct / 100)
+                bar    = "#" * filled + "-" * (30 - filled)
+                sys.stdout.write(f"\r    [{bar}] {pct:.0f}%  {done/1e6:.1f}/{total/1e6:.1f} MB")
+            else:
+                sys.stdout.write(f"\r    {done/1e6:.1f} MB")
+            sys.stdout.flush()
+
+    def finish(self):
+        if self._drawn:
+            sys.stdout.write("\n")
+
+
+def _hash_part(path):
+    """(sha256 object, size) over what an earlier attempt left in `path`."""
+    h = hashlib.sha256()
+    size = 0
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK), b""):
+                h.update(chunk)
+                size += len(chunk)
+    return h, size
+
+
+def _fetch(url, dest, expected=None, progress=None):
+    """Stream `url` into `dest` and return its SHA-256.
+
+    Data goes to dest.part and is hashed as it arrives. A dropped connection
+    is retried with backoff, resuming from the bytes already on disk with an
+    HTTP Range request, and a .part left by an earlier run is resumed the
+    same way. If all retries fail, the .part is kept for the next run. A
+    download that does not match `expected` is deleted and raises
+    DownloadError. If the bad file came from a resume, it is first fetched
+    once more from scratch.
+
+    Without `expected` nothing could catch a bad splice: an unpinned URL
+    may serve a newer file than the one the .part came from. Those are
+    never resumed and always start over."""
+    tmp = dest + ".part"
+    name = os.path.basename(dest)
+    error = None
+    for attempt in range(DOWNLOAD_RETRIES):
+        if attempt:
+            time.sleep(min(DOWNLOAD_BACKOFF * 2 ** (attempt - 1), 30))
+        if not expected and os.path.exists(tmp):
+            os.remove(tmp)
+        h, have = _hash_part(tmp)
+        resumed = have > 0
+        headers = {"User-Agent": "Mozilla/5.0"}
+        if have:
+            headers["Range"] = f"bytes={have}-"
+        try:
+            try:
+                resp = urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=120)
+            except urllib.error.HTTPError as exc:
+                # 416: the .part already holds the whole file (an earlier run
+                # died before renaming it); the hash check below decides.
+                if exc.code != 416 or not have:
+                    raise
+                resp = None
+            if resp is not None:
+                with resp:
+                    start = 0
+                    if resp.status == 206:
+                        match = re.match(r"bytes (\d+)-", resp.headers.get("Content-Range", ""))
+                        start = int(match.group(1)) if match else -1
+                    if start != have:
+                        # Range ignored or answered for the wrong offset.
+                        h, have = hashlib.sha256(), 0
+                    length = resp.headers.get("Content-Length")
+                    total = have + int(length) if length else 0
+                    read = getattr(resp, "read1", resp.read)
+                    with open(tmp, "ab" if have else "wb") as f:
+                        while True:
+                            chunk = read(DOWNLOAD_CHUNK)
+                            if not chunk:
+                                break
+                            f.write(chunk)
+                            h.update(chunk)
+                            have += len(chunk)
+                            if progress:
+                                progress.update(name, have, total)
+                    if total and have < total:
+                        raise DownloadError(f"connection closed after {have} of {total} bytes")
+        except urllib.error.HTTPError as exc:
+            if exc.code < 500:
+                raise DownloadError(f"HTTP {exc.code} {exc.reason}")
+            error = exc
+            continue
+        except (OSError, http.client.HTTPException, DownloadError) as exc:
+            error = exc
+            continue
+
+        digest = h.hexdigest()
+        if expected and digest != expected:
+            os.remove(tmp)
+            if resumed:
+                error = DownloadError("resumed download did not verify")
+                continue
+            raise DownloadError(
+                f"SHA-256 mismatch for {name}\n"
+                f"    expected: {expected}\n"
+                f"    actual:   {digest}\n"
+                "  The download may be corrupted or tampered with.")
+        os.replace(tmp, dest)
+        return digest
+    note = "; the partial file is kept and resumed next run" if expected and os.path.exists(tmp) else ""
+    raise DownloadError(f"{error} (gave up after {DOWNLOAD_RETRIES} attempts{note})")
+
+
+def _load_download_stamps():
+    try:
+        with open(DOWNLOAD_STAMP_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_download_stamps(fresh):
+    """Merge `fresh` into the stamp file. The APK and IPA jobs of a concurrent
+    build download side by side, so the file is re-read and replaced under
+    a lock rather than rewritten from a stale copy."""
+    with _file_lock(DOWNLOAD_STAMP_FILE):
+        stamps = _load_download_stamps()
+        stamps.update(fresh)
+        stamps = {path: stamp for path, stamp in stamps.items() if os.path.exists(path)}
+        tmp = f"{DOWNLOAD_STAMP_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(stamps, f, indent=2)
+        os.replace(tmp, DOWNLOAD_STAMP_FILE)
+
+
+def _existing_digest(url, dest, stamps):
+    """SHA-256 of an already-downloaded file. A file whose stamp still
+    matches its url, size and mtime was verified when it was stored, so it is
+    not re-read. Returns None if the file fails verification."""
+    st = os.stat(dest)
+    stamp = stamps.get(dest)
+    if stamp and stamp[:3] == [url, st.st_size, st.st_mtime_ns]:
+        return stamp[3]
+    digest = _sha256_of(dest)
+    expected = TOOL_SHA256.get(url)
+    if expected and digest != expected:
+        return None
+    return digest
+
+
+def _download_many(items, jobs=DOWNLOAD_JOBS):
+    """Fetch [(url, dest)] on a bounded pool and return {dest: sha256}.
+    Files already in place are verified and reused, then the shared cache
+    is tried, and only what is left goes to the network."""
+    stamps = _load_download_stamps()
+    digests, pending = {}, []
+    for url, dest in items:
+        if os.path.exists(dest):
+            with _span(f"verify {os.path.basename(dest)}", url=url):
+                digest = _existing_digest(url, dest, stamps)
+            if digest:
+                print(f"  Already downloaded: {os.path.basename(dest)}")
+                digests[dest] = digest
+                continue
+            print(f"  {os.path.basename(dest)} failed verification - downloading it again.")
+            os.remove(dest)
+        sha = TOOL_SHA256.get(url) or _store_ref("url:" + url, UNPINNED_URL_TTL)
+        if sha and _store_link(sha, dest):
+            print(f"  From cache: {os.path.basename(dest)}")
+            digests[dest] = sha
+            continue
+        pending.append((url, dest))
+
+    failures = []
+    if pending:
+        names = ", ".join(os.path.basename(dest) for _url, dest in pending)
+        print(f"  Downloading {names} ...")
+        progress = _DownloadProgress()
+        stack = _open_spans()
+        parent = stack[-1] if stack else None
+
+        def _timed_fetch(url, dest):
+            with _span(f"download {os.path.basename(dest)}", parent, url=url):
+                return _fetch(url, dest, TOOL_SHA256.get(url), progress)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(jobs, len(pending)))) as pool:
+            futures = {pool.submit(_timed_fetch, url, dest): (url, dest) for url, dest in pending}
+            for future in concurrent.futures.as_completed(futures):
+                url, dest = futures[future]
+                try:
+                    digests[dest] = future.result()
+                except Exception as exc:
+                    # Not only DownloadError: a malformed response (a bad
+                    # Content-Length) must still fail cleanly, bar finished.
+                    failures.append((url, exc))
+        progress.finish()
+
+    for url, dest in items:
+        if dest in digests:
+            st = os.stat(dest)
+            stamps[dest] = [url, st.st_size, st.st_mtime_ns, digests[dest]]
+            pinned = url in TOOL_SHA256
+            if pinned or (url, dest) in pending:
+                _store_put(dest, digests[dest], None if pinned else "url:" + url)
+    _store_evict()
+    _save_download_stamps({dest: stamps[dest] for _url, dest in items if dest in digests})
+
+    if failures:
+        for url, exc in failures:
+            print(f"  ERROR: could not download {url}: {exc}")
         sys.exit(1)
+    return digests
 
 
 def _download(url, dest):
-    if os.path.exists(dest):
-        print(f"  Already downloaded: {os.path.basename(dest)}")
-        _verify_download(url, dest)
+    return _download_many([(url, dest)])[dest]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Zip packing
+# ─────────────────────────────────────────────────────────────────────────────
+#
+# zipfile can only write entries it compressed itself, so reusing the deflated
+# bytes of an unchanged entry from a previous archive needs a small writer of
+# our own. It emits the same layout zipfile does for our archives: no data
+# descriptors, no zip64 (Game.love and the IPA are far below 4 GB).
+
+_ZIP_LOCAL   = struct.Struct("<IHHHHHIIIHH")
+_ZIP_CENTRAL = struct.Struct("<IHHHHHHIIIHHHHHII")
+_ZIP_END     = struct.Struct("<IHHHHIIH")
+_ZIP_HOST    = 0 if os.name == "nt" else 3   # "made by" system, as zipfile records it
+_ZIP_FILE_ATTR = 0o100644 << 16               # regular rw-r--r-- file, for reproducible entries
+
+
+def _zip_host():
+    # A reproducible archive must not say which OS built it.
+    return 3 if SOURCE_DATE is not None else _ZIP_HOST
+
+
+def _zip_attr(st):
+    return _ZIP_FILE_ATTR if SOURCE_DATE is not None else (st.st_mode & 0xFFFF) << 16
+
+
+class _ZipEntry:
+    __slots__ = ("name", "method", "dostime", "dosdate", "crc", "csize", "size",
+                 "external_attr", "create_system", "offset")
+
+    def __init__(self, name, method, dostime, dosdate, crc, csize, size, external_attr,
+                 create_system=None):
+        self.name          = name
+        self.method        = method
+        self.dostime       = dostime
+        self.dosdate       = dosdate
+        self.crc           = crc
+        self.csize         = csize
+        self.size          = size
+        self.external_attr = external_attr
+        self.create_system = _zip_host() if create_system is None else create_system
+        self.offset        = 0   # offset of the compressed payload in the archive
+
+
+def _dos_datetime(timestamp):
+    # Reproducible builds pin every entry to SOURCE_DATE, read as UTC so the
+    # builder's time zone does not leak into the archive.
+    if SOURCE_DATE is not None:
+        return _dos_from_tuple(time.gmtime(SOURCE_DATE)[:6])
+    return _dos_from_tuple(time.localtime(timestamp)[:6])
+
+
+def _dos_from_tuple(date_time):
+    year, month, day, hour, minute, second = date_time
+    year = max(year, 1980)
+    return (hour << 11 | minute << 5 | second // 2,
+            (year - 1980) << 9 | month << 5 | day)
+
+
+def _zip_name_flags(name):
+    # Bit 11 marks a UTF-8 file name, exactly as zipfile sets it.
+    try:
+        name.encode("ascii")
+        return 0
+    except UnicodeEncodeError:
+        return 0x800
+
+
+def _deflate(data):
+    # Same settings zipfile uses for ZIP_DEFLATED with the default level.
+    c = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return c.compress(data) + c.flush()
+
+
+def _compress_entry(name, data, dos, external_attr=0o600 << 16,
+                    method=zipfile.ZIP_DEFLATED, create_system=None):
+    """Build the (entry, payload) pair for one member. Pure function of its
+    arguments, so it can run on any worker thread without changing the output."""
+    payload = _deflate(data) if method == zipfile.ZIP_DEFLATED else data
+    entry = _ZipEntry(name, method, dos[0], dos[1], zlib.crc32(data), len(payload),
+                      len(data), external_attr, create_system)
+    return entry, payload
+
+
+def _default_jobs():
+    return os.cpu_count() or 1
+
+
+def _ordered_map(fn, items, jobs):
+    """map() over a thread pool, yielding results in input order.
+
+    zlib and hashlib release the GIL, so threads give real parallelism for
+    the deflate work here. At most jobs*4 results are held in memory at once.
+    """
+    if jobs <= 1:
+        yield from map(fn, items)
         return
-    print(f"  Downloading {os.path.basename(dest)} ...")
-    tmp = dest + ".part"
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+        pending = collections.deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= jobs * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class _ZipWriter:
+    """Minimal zip writer that accepts either plain bytes or pre-deflated ones.
+
+    Compression happens outside the writer (see _compress_entry), and entries
+    are written strictly in the order they are added, so an archive built with
+    a thread pool is byte-identical to one built serially.
+    """
+
+    def __init__(self, path):
+        self.entries = []
+        self._fh = open(path, "wb")
+
+    def add(self, name, data, timestamp, external_attr=0o600 << 16):
+        return self.add_raw(*_compress_entry(name, data, _dos_datetime(timestamp), external_attr))
+
+    def add_raw(self, entry, payload):
+        name  = entry.name.encode("utf-8")
+        flags = _zip_name_flags(entry.name)
+        self._fh.write(_ZIP_LOCAL.pack(0x04034B50, 20, flags, entry.method,
+                                       entry.dostime, entry.dosdate, entry.crc,
+                                       entry.csize, entry.size, len(name), 0))
+        self._fh.write(name)
+        entry.offset = self._fh.tell()
+        self._fh.write(payload)
+        self.entries.append(entry)
+        return entry
+
+    def close(self):
+        start = self._fh.tell()
+        for entry in self.entries:
+            name  = entry.name.encode("utf-8")
+            flags = _zip_name_flags(entry.name)
+            header_offset = entry.offset - _ZIP_LOCAL.size - len(name)
+            self._fh.write(_ZIP_CENTRAL.pack(0x02014B50, entry.create_system << 8 | 20, 20,
+                                             flags, entry.method, entry.dostime,
+                                             entry.dosdate, entry.crc, entry.csize,
+                                             entry.size, len(name), 0, 0, 0, 0,
+                                             entry.external_attr, header_offset))
+            self._fh.write(name)
+        end = self._fh.tell()
+        self._fh.write(_ZIP_END.pack(0x06054B50, 0, 0, len(self.entries), len(self.entries),
+                                     end - start, start, 0))
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *_):
+        if exc_type is None:
+            self.close()
+        else:
+            self._fh.close()
+
+
+def _zip_raw_members(path):
+    """Yield (entry, payload) for every member of the zip at `path`, in archive
+    order, with the payload still compressed exactly as stored."""
+    with zipfile.ZipFile(path) as z, open(path, "rb") as fh:
+        for info in z.infolist():
+            fh.seek(info.header_offset)
+            header = _ZIP_LOCAL.unpack(fh.read(_ZIP_LOCAL.size))
+            if header[0] != 0x04034B50:
+                raise zipfile.BadZipFile(f"bad local header for {info.filename} in {path}")
+            fh.seek(header[9] + header[10], os.SEEK_CUR)
+            dostime, dosdate = _dos_from_tuple(info.date_time)
+            entry = _ZipEntry(info.filename, info.compress_type, dostime, dosdate, info.CRC,
+                              info.compress_size, info.file_size, info.external_attr,
+                              info.create_system)
+            yield entry, fh.read(info.compress_size)
+
+
+def _swap_zip_entry(path, name, data, out=None, drop=()):
+    """Replace one member of the zip at `path` (writing the result to `out`,
+    default `path` itself), copying every other member raw. The replacement
+    keeps the old member's position, attributes and stored/deflated choice.
+    Members whose names start with one of the `drop` prefixes are left out."""
+    out = out or path
+    tmp = out + ".tmp"
+    found = False
+    drop = tuple(drop)
+    with _ZipWriter(tmp) as zout:
+        for entry, payload in _zip_raw_members(path):
+            if drop and entry.name.startswith(drop):
+                continue
+            if entry.name == name:
+                method = entry.method if entry.method == zipfile.ZIP_STORED else zipfile.ZIP_DEFLATED
+                entry, payload = _compress_entry(name, data, (entry.dostime, entry.dosdate),
+                                                 entry.external_attr, method, entry.create_system)
+                found = True
+            zout.add_raw(entry, payload)
+    if not found:
+        os.remove(tmp)
+        raise KeyError(f"{name} not found in {path}")
+    os.replace(tmp, out)
+
+
+def _normalize_zip(path):
+    """Rewrite the zip at `path` in name order with SOURCE_DATE timestamps and
+    a fixed host, copying every payload raw. This makes an archive written by
+    another tool (apktool) depend only on its contents."""
+    dos = _dos_datetime(SOURCE_DATE)
+    members = sorted(_zip_raw_members(path), key=lambda member: member[0].name)
+    tmp = path + ".tmp"
+    with _ZipWriter(tmp) as zout:
+        for entry, payload in members:
+            entry.dostime, entry.dosdate = dos
+            entry.create_system = _zip_host()
+            zout.add_raw(entry, payload)
+    os.replace(tmp, path)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Build graph
+# ─────────────────────────────────────────────────────────────────────────────
+#
+# Every stage declares its inputs as {label: digest}, the stages it depends on
+# and the files it produces. It runs only if it never ran, was forced, one of
+# its outputs is missing or was modified since, or an input (an upstream
+# stage's key included) differs from its last successful run. Stages are
+# declared in dependency order and run as they are declared, so the graph is
+# the build script itself. Records live in GRAPH_FILE; --explain prints the
+# verdict for every stage.
+
+def _load_graph_state():
     try:
-        req  = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
-        resp = urllib.request.urlopen(req, timeout=120)
-        total = int(resp.headers.get("Content-Length", 0))
-        done  = 0
-        with open(tmp, "wb") as f:
-            while True:
-                chunk = resp.read(8192)
-                if not chunk:
-                    break
-                f.write(chunk)
-                done += len(chunk)
-                if total:
-                    pct    = min(done / total * 100, 100)
-                    filled = int(30 * pct / 100)
-                    bar    = "#" * filled + "-" * (30 - filled)
-                    sys.stdout.write(f"\r    [{bar}] {pct:.0f}%  {done/1e6:.1f}/{total/1e6:.1f} MB")
-                    sys.stdout.flush()
-        sys.stdout.write("\n")
-        os.rename(tmp, dest)
-    except Exception as exc:
-        if os.path.exists(tmp):
-            os.remove(tmp)
-        print(f"\n  ERROR: could not download {url}: {exc}")
-        sys.exit(1)
-    _verify_download(url, dest)
+        with open(GRAPH_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_graph_record(name, record):
+    """Merge one stage's record into GRAPH_FILE. The APK and IPA jobs of a
+    concurrent build both write it, so it is re-read and replaced under a
+    lock."""
+    with _file_lock(GRAPH_FILE):
+        state = _load_graph_state()
+        state[name] = record
+        tmp = f"{GRAPH_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, GRAPH_FILE)
+
+
+def _output_stamp(path):
+    if os.path.isdir(path):
+        return "dir"
+    return _archive_stamp(path) if os.path.exists(path) else None
+
+
+def _code_digest(*fns):
+    """Digest of the source of the functions a stage runs, so editing one of
+    them here is enough to re-run that stage."""
+    return _bytes_hash("\0".join(inspect.getsource(fn) for fn in fns).encode("utf-8"))
+
+
+def _stage_key(name):
+    record = _load_graph_state().get(name)
+    return record["key"] if record else None
+
+
+def _stale_reason(record, inputs, outputs, force):
+    if inputs is not None and record is None:
+        return "no previous run"
+    for path in outputs:
+        if not os.path.exists(path):
+            return f"output missing: {os.path.relpath(path)}"
+    if force:
+        return force
+    if inputs is None:
+        return None
+    for path in outputs:
+        if record["outputs"].get(path) != _output_stamp(path):
+            return f"output modified: {os.path.relpath(path)}"
+    changed = sorted(label for label in set(inputs) | set(record["inputs"])
+                     if inputs.get(label) != record["inputs"].get(label))
+    return "changed: " + ", ".join(changed) if changed else None
+
+
+def _stage(name, inputs, run=None, deps=(), outputs=(), force=None):
+    """Run one build stage unless it is fresh; returns True if it ran.
+
+    `inputs` is {label: digest}, extended with the key of every stage in
+    `deps`. None means the inputs are not tracked and only missing outputs
+    make the stage run. `force` is a reason to run regardless. A stage
+    without `run` is a pure input node (the Readabletro overlay, which only
+    exists in memory): it is recorded so dependants see its key change."""
+    if inputs is not None:
+        inputs = dict(inputs, **{f"{dep} stage": _stage_key(dep) or "none" for dep in deps})
+    with _span(f"stage {name}") as span:
+        reason = _stale_reason(_load_graph_state().get(name), inputs, outputs, force)
+        if reason:
+            verdict = "ran" if run else "changed"
+        else:
+            verdict = "skipped" if run else "unchanged"
+        why = reason or ("inputs unchanged" if inputs is not None else "outputs present")
+        span.args.update(verdict=verdict, reason=why)
+        if EXPLAIN:
+            print(f"  [explain] {name}: {verdict} - {why}")
+        if reason is None:
+            return False
+        if run:
+            run()
+        if inputs is not None:
+            key = _bytes_hash(json.dumps(inputs, sort_keys=True).encode("utf-8"))
+            _save_graph_record(name, {"key": key, "inputs": inputs,
+                                      "outputs": {path: _output_stamp(path) for path in outputs}})
+        return True
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -317,22 +1258,95 @@ def _find_installed_android_balatro_apk():
     return None
 
 
-def _find_extracted_source_folder(game_files_dir, folder):
-    """Find a desktop/LÖVE or official Android APK resource folder."""
-    source_options = (
-        os.path.join(game_files_dir, folder),
-        os.path.join(game_files_dir, "assets", folder),
-    )
-    for source in source_options:
-        if os.path.exists(source):
-            return source
-    return None
+RESOURCE_FOLDERS = ("resources", "localization")
+
+
+def _resource_members(archive):
+    """Map each RESOURCE_FOLDERS entry to (prefix, [ZipInfo]) for the
+    desktop/LÖVE layout ("resources/...") or the official Android APK layout
+    ("assets/resources/..."). A folder that is missing maps to None."""
+    found = {}
+    for folder in RESOURCE_FOLDERS:
+        for prefix in (folder + "/", "assets/" + folder + "/"):
+            members = [info for info in archive.infolist()
+                       if info.filename.startswith(prefix) and not info.is_dir()]
+            if members:
+                found[folder] = (prefix, members)
+                break
+        else:
+            found[folder] = None
+    return found
+
+
+def _crc_of(path):
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc & 0xFFFFFFFF
+
+
+def _extract_member(archive, info, dst):
+    """Stream one member to `dst` through a temp file, so an interrupted run
+    never leaves a truncated asset behind."""
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = dst + ".tmp"
+    with archive.open(info) as src, open(tmp, "wb") as out:
+        shutil.copyfileobj(src, out, 1 << 20)
+    os.replace(tmp, dst)
+
+
+def _extract_resources(balatro_path, src_dir):
+    """Stream RESOURCE_FOLDERS from the game archive into `src_dir`, skipping
+    files whose size and CRC already match and removing ones the archive no
+    longer has. Returns (written, written_bytes, skipped, skipped_bytes,
+    removed). Raises KeyError naming a folder the archive lacks."""
+    written = skipped = removed = 0
+    written_bytes = skipped_bytes = 0
+    with zipfile.ZipFile(balatro_path, "r") as z:
+        layout = _resource_members(z)
+        for folder in RESOURCE_FOLDERS:
+            if not layout[folder]:
+                raise KeyError(folder)
+
+        for folder in RESOURCE_FOLDERS:
+            prefix, members = layout[folder]
+            dst_root = os.path.join(src_dir, folder)
+            wanted = set()
+            for info in members:
+                rel = info.filename[len(prefix):]
+                parts = rel.split("/")
+                if any(part in ("", ".", "..") for part in parts) or ":" in rel:
+                    print(f"  Warning: skipping unsafe archive path {info.filename!r}")
+                    continue
+                dst = os.path.join(dst_root, *parts)
+                wanted.add(os.path.normcase(dst))
+                if (os.path.isfile(dst) and os.path.getsize(dst) == info.file_size
+                        and _crc_of(dst) == info.CRC):
+                    skipped += 1
+                    skipped_bytes += info.file_size
+                    continue
+                _extract_member(z, info, dst)
+                written += 1
+                written_bytes += info.file_size
+
+            # Files the game no longer ships (or left over from the other
+            # platform's layout) would otherwise end up in Game.love.
+            if os.path.isdir(dst_root):
+                for path, _st in list(_scan_tree(dst_root)):
+                    if os.path.normcase(path) not in wanted:
+                        os.remove(path)
+                        removed += 1
+    return written, written_bytes, skipped, skipped_bytes, removed
 
 
 def setup_resources(balatro_path=None):
-    """Extract resources and localization from the Balatro game file into src/."""
+    """Stream resources and localization from the Balatro game file into src/.
+
+    Only those two folders are read from the archive. Files whose size and CRC
+    already match are left untouched, which keeps their mtimes (and so
+    Game.love's incremental rebuild) intact after a game update."""
     script_dir      = os.path.dirname(os.path.abspath(__file__))
-    game_files_dir  = os.path.join(script_dir, "game_original_files")
     src_dir         = os.path.join(script_dir, "src")
 
     if not balatro_path:
@@ -364,12 +1378,13 @@ def setup_resources(balatro_path=None):
         sys.exit(1)
 
     print(f"  Extracting {os.path.basename(balatro_path)} ...")
-    if os.path.exists(game_files_dir):
-        shutil.rmtree(game_files_dir)
-    os.makedirs(game_files_dir, exist_ok=True)
     try:
-        with zipfile.ZipFile(balatro_path, "r") as z:
-            z.extractall(game_files_dir)
+        with _span("extract archive", game_file=os.path.basename(balatro_path)):
+            written, written_bytes, skipped, skipped_bytes, removed = \
+                _extract_resources(balatro_path, src_dir)
+    except KeyError as exc:
+        print(f"  ERROR: '{exc.args[0]}' not found inside Balatro game file - wrong file?")
+        sys.exit(1)
     except zipfile.BadZipFile:
         print("  ERROR: Not a valid ZIP/exe file.")
         sys.exit(1)
@@ -377,17 +1392,13 @@ def setup_resources(balatro_path=None):
         print(f"  ERROR: {exc}")
         sys.exit(1)
 
-    for folder in ("resources", "localization"):
-        src = _find_extracted_source_folder(game_files_dir, folder)
-        dst = os.path.join(src_dir, folder)
-        if not src:
-            print(f"  ERROR: '{folder}' not found inside Balatro game file - wrong file?")
-            sys.exit(1)
-        print(f"  Copying {folder} ...")
-        if os.path.exists(dst):
-            shutil.rmtree(dst)
-        shutil.copytree(src, dst)
+    # Extracted copies from older versions of this script.
+    legacy_dir = os.path.join(script_dir, "game_original_files")
+    if os.path.isdir(legacy_dir):
+        shutil.rmtree(legacy_dir)
 
+    print(f"  {written} files written ({written_bytes / 1e6:.1f} MB), "
+          f"{skipped} unchanged ({skipped_bytes / 1e6:.1f} MB skipped), {removed} removed.")
     print("  Done - resources ready.")
 
 
@@ -396,161 +1407,422 @@ def setup_resources(balatro_path=None):
 # ─────────────────────────────────────────────────────────────────────────────
 
 def _file_hash(path):
-    h = hashlib.md5()
+    # BLAKE2b is both faster than MD5 on 64-bit CPUs (phones included) and
+    # releases the GIL, so _fingerprint_files can spread it across cores.
+    h = hashlib.blake2b(digest_size=16)
     with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
+        for chunk in iter(lambda: f.read(1 << 20), b""):
             h.update(chunk)
     return h.hexdigest()
 
 
-def _sources_changed(src_dir, output_file):
-    cache = {}
-    if os.path.exists(CACHE_FILE):
+def _bytes_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _payload_digest(payload):
+    """Digest of a {name: bytes or nested dict} tree: baked-in saves and
+    bundled mods, which reach Game.love from memory rather than from src/."""
+    h = hashlib.sha256()
+
+    def _walk(node, prefix):
+        for name in sorted(node):
+            value = node[name]
+            if isinstance(value, dict):
+                _walk(value, f"{prefix}{name}/")
+            else:
+                h.update(f"{prefix}{name}\0{len(value)}\0".encode("utf-8"))
+                h.update(value)
+
+    _walk(payload or {}, "")
+    return h.hexdigest()
+
+
+def _load_build_cache(cache_file=None):
+    cache_file = cache_file or CACHE_FILE
+    if os.path.exists(cache_file):
         try:
-            with open(CACHE_FILE) as f:
-                cache = json.load(f)
+            with open(cache_file) as f:
+                return json.load(f)
         except Exception:
             pass
-
-    current = {}
-    for root, _, files in os.walk(src_dir):
-        for fn in files:
-            fp = os.path.join(root, fn)
+    return {}
+
+
+def _scan_tree(root):
+    """Yield (path, stat) for every file below root, using scandir's cached
+    d_type so directories are never stat'ed twice."""
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    yield entry.path, entry.stat()
+
+
+def _fingerprint_files(roots, cache):
+    """Return ({path: hash}, index) for every file under the given roots.
+
+    The index in CACHE_FILE remembers (size, mtime_ns, inode) per file; a file
+    whose stat still matches keeps its recorded hash without being read. Only
+    new or touched files are hashed, in parallel. A file modified in the same
+    clock tick the index was written could carry an unchanged mtime, so such
+    "racy" entries are always re-hashed (the same rule git uses for its index).
+    """
+    previous  = cache.get("index", {})
+    racy_ns   = cache.get("indexed_at_ns", 0)
+    index     = {}
+    suspects  = []
+    for path, st in (item for root in roots if os.path.isdir(root) for item in _scan_tree(root)):
+        stamp = [st.st_size, st.st_mtime_ns, st.st_ino]
+        prev  = previous.get(path)
+        if prev and prev[:3] == stamp and st.st_mtime_ns < racy_ns:
+            index[path] = prev
+        else:
+            index[path] = stamp + [None]
+            suspects.append(path)
+
+    if suspects:
+        # A file deleted since the scan is left out, as if the scan had
+        # missed it. Any other read error propagates: recording a stamp
+        # without a hash would make the file look unchanged from then on.
+        def _hash(path):
             try:
-                current[fp] = _file_hash(fp)
-            except Exception:
-                current[fp] = str(os.path.getmtime(fp))
+                return _file_hash(path)
+            except FileNotFoundError:
+                return None
+        with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+            for path, digest in zip(suspects, pool.map(_hash, suspects)):
+                if digest is None:
+                    del index[path]
+                else:
+                    index[path][3] = digest
 
-    unchanged = os.path.exists(output_file) and current == cache.get("files", {})
-    return not unchanged, current
+    return {path: rec[3] for path, rec in index.items()}, index
 
 
-def _apply_crt_patch(src_dir, apply):
-    game_lua = os.path.join(src_dir, "game.lua")
-    if not os.path.exists(game_lua):
-        return
-    with open(game_lua, "r", encoding="utf-8") as f:
-        content = f.read()
-    if apply:
-        if CRT_PATCH_MODIFIED in content:
-            return
-        if CRT_PATCH_ORIGINAL not in content:
-            print("  Warning: CRT patch target not found in game.lua - skipping.")
-            return
-        content = content.replace(CRT_PATCH_ORIGINAL, CRT_PATCH_MODIFIED)
-        print("  CRT shader disabled for all portrait modes.")
-    else:
-        if CRT_PATCH_ORIGINAL in content:
-            return
-        content = content.replace(CRT_PATCH_MODIFIED, CRT_PATCH_ORIGINAL)
-    with open(game_lua, "w", encoding="utf-8") as f:
-        f.write(content)
+def _sources_changed(roots, output_file, cache, options, fingerprint=None):
+    """Fingerprint every input tree and report whether Game.love is stale.
+    `options` (patch flags, transform revision) is part of the key because
+    the overlay applies them in memory; they never show up in src/ itself.
+    `fingerprint` is a (files, index) pair the caller already computed."""
+    current, index = fingerprint or _fingerprint_files(roots, cache)
+    previous = {path: rec[3] for path, rec in cache.get("index", {}).items()}
+    unchanged = (os.path.exists(output_file) and current == previous
+                 and cache.get("options") == options)
+    return not unchanged, current, index
 
 
-def _apply_crt_slider_mask_patch(src_dir):
-    crt_shader = os.path.join(src_dir, "resources", "shaders", "CRT.fs")
-    if not os.path.exists(crt_shader):
+def _save_build_index(cache, index, indexed_at_ns, cache_file=None):
+    """Store a fresh stat index in the build cache when it differs, so files
+    that were touched but not changed are not hashed again next run."""
+    if index == cache.get("index"):
         return
-    with open(crt_shader, "r", encoding="utf-8") as f:
-        content = f.read()
-    changed = False
-    if CRT_MASK_MODIFIED not in content:
-        if CRT_MASK_ORIGINAL not in content:
-            print("  Warning: CRT slider mask patch target not found in CRT.fs - skipping.")
-        else:
-            content = content.replace(CRT_MASK_ORIGINAL, CRT_MASK_MODIFIED)
-            changed = True
-            print("  CRT edge mask now follows the CRT slider.")
+    cache.update(indexed_at_ns=indexed_at_ns, index=index)
+    cache_file = cache_file or CACHE_FILE
+    tmp = f"{cache_file}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp, cache_file)
+
+
+def _archive_stamp(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _load_love_manifest(cache, output_file):
+    """Return {arcname: entry record} for the Game.love on disk, or {}.
+
+    The manifest is only trusted while Game.love is the exact file it was
+    written for; a replaced or touched archive means a full repack."""
+    manifest = cache.get("game_love")
+    if not manifest or not os.path.exists(output_file):
+        return {}
+    if manifest.get("archive") != _archive_stamp(output_file):
+        return {}
+    return manifest.get("entries", {})
+
 
+def _pack_love_entries(zout, plan, old, manifest, jobs):
+    """Write the planned Game.love entries in order. An entry whose content key
+    matches the manifest has its previous compressed bytes copied raw from
+    `old`; the rest are read and deflated on a `jobs`-wide thread pool.
+
+    `plan` is a list of (arcname, key, read, dos_datetime, external_attr).
+    Returns ({arcname: manifest record}, number of reused entries).
+    """
+    def _reusable(arc, key, dos, attr):
+        prev = manifest.get(arc)
+        return (old is not None and prev is not None and prev["hash"] == key
+                and (prev["dostime"], prev["dosdate"], prev["attr"]) == (*dos, attr))
+
+    def _build(item):
+        arc, key, read, dos, attr = item
+        if _reusable(arc, key, dos, attr):
+            return None
+        return _compress_entry(arc, read(), dos, attr)
+
+    records = {}
+    reused  = 0
+    for item, built in zip(plan, _ordered_map(_build, plan, jobs)):
+        arc, key = item[0], item[1]
+        if built is None:
+            prev = manifest[arc]
+            old.seek(prev["offset"])
+            entry = zout.add_raw(_ZipEntry(arc, prev["method"], prev["dostime"], prev["dosdate"],
+                                           prev["crc"], prev["csize"], prev["size"], prev["attr"]),
+                                 old.read(prev["csize"]))
+            reused += 1
+        else:
+            entry = zout.add_raw(*built)
+        records[arc] = {"hash": key, "crc": entry.crc, "offset": entry.offset,
+                        "csize": entry.csize, "size": entry.size, "method": entry.method,
+                        "dostime": entry.dostime, "dosdate": entry.dosdate,
+                        "attr": entry.external_attr}
+    return records, reused
+
+
+# ── Overlay ──────────────────────────────────────────────────────────────────
+#
+# src/ is never modified by a build. Patches are applied in memory as entries
+# are packed: Readabletro files are substituted by archive path, and the Lua
+# and shader transforms below rewrite content on the way into the zip.
+# zygisk/gen_assets.py embeds the same Lua through _transform_lua.
+
+def _patch_text(content, original, modified, label, strict=False):
+    """Apply one find/replace patch idempotently.
+
+    Insertion-shaped patches (the replacement still contains the target) are
+    done once the replacement is present; for any other shape the patch is
+    done once the target is gone. A missing target raises in strict mode and
+    only warns otherwise.
+    """
+    if original in modified:
+        applied = modified in content
+    else:
+        applied = original not in content and modified in content
+    if applied:
+        return content
+    if original in content:
+        return content.replace(original, modified)
+    if strict:
+        raise RuntimeError(f"{label} patch target not found")
+    print(f"  Warning: {label} patch target not found - skipping.")
+    return content
+
+
+def _transform_lua(rel, data, apply_crt, apply_readabletro, strict=False):
+    """Return the bytes that ship for the Lua file at `rel` (relative to src/).
+
+    Lovely-injector regex patches anchor on '\n' newlines. If a Lua source has
+    CRLF (e.g. Windows autocrlf checkout), some SMODS regex patches fail to match
+    and leave behind dangling original code that creates Lua syntax errors at runtime
+    (observed: "ambiguous syntax (function call x new statement)" near the leftover
+    `(k==6 or k ==16 ...)` block in create_UIBox_your_collection_blinds).
+    Normalize all packaged Lua files to LF so patches apply correctly.
+    """
+    data = data.replace(b"\r\n", b"\n")
+    patches = []
+    if apply_readabletro:
+        patches += [(orig, mod, f"Readabletro {rel}") for orig, mod in READABLETRO_LUA_PATCHES.get(rel, ())]
+    if apply_crt and rel == "game.lua":
+        patches.append((CRT_PATCH_ORIGINAL, CRT_PATCH_MODIFIED, "CRT disable game.lua"))
+    if not patches:
+        return data
+    content = data.decode("utf-8")
+    for original, modified, label in patches:
+        content = _patch_text(content, original, modified, label, strict)
+    return content.encode("utf-8")
+
+
+def _transform_crt_shader(data):
+    """Make CRT.fs follow the CRT slider and restore the Android noise uniform."""
+    content = data.decode("utf-8")
+    content = _patch_text(content, CRT_MASK_ORIGINAL, CRT_MASK_MODIFIED, "CRT slider mask CRT.fs")
+
+    # The Play Store APK's CRT.fs comments these lines out while portrait
+    # game.lua still sends noise_fac; desktop shaders have them live already.
     restored_noise = 0
     for original, replacement in CRT_NOISE_COMMENTED_LINES:
         if original in content:
             content = content.replace(original, replacement)
             restored_noise += 1
+    if restored_noise and restored_noise != len(CRT_NOISE_COMMENTED_LINES):
+        print("  Warning: Android CRT shader noise patch only partially applied.")
+    return content.encode("utf-8")
 
-    if restored_noise:
-        changed = True
-        print("  Android CRT shader noise uniform restored.")
 
-    if not changed:
+def _readabletro_overlay():
+    """Return {arcname: path} of the Readabletro files that replace or extend src/."""
+    overlay = {}
+    font = os.path.join(READABLETRO_DIR, "fonts", "TypoQuik-Bold.ttf")
+    if os.path.exists(font):
+        overlay["resources/fonts/TypoQuik-Bold.ttf"] = font
+    for shader in ("background.fs", "splash.fs"):
+        path = os.path.join(READABLETRO_DIR, "shaders", shader)
+        if os.path.exists(path):
+            overlay[f"resources/shaders/{shader}"] = path
+    texture_dir = os.path.join(READABLETRO_DIR, "textures", "2x")
+    if os.path.isdir(texture_dir):
+        for fn in sorted(os.listdir(texture_dir)):
+            if fn.endswith(".png"):
+                overlay[f"resources/textures/2x/{fn}"] = os.path.join(texture_dir, fn)
+    return overlay
+
+
+def _transform_revision():
+    """Fingerprint of every in-memory patch, so editing one here invalidates
+    Game.love the same way editing a source file does."""
+    return _bytes_hash(repr((CRT_PATCH_ORIGINAL, CRT_PATCH_MODIFIED, CRT_MASK_ORIGINAL,
+                             CRT_MASK_MODIFIED, CRT_NOISE_COMMENTED_LINES,
+                             sorted(READABLETRO_LUA_PATCHES.items()))).encode("utf-8"))
+
+
+def _legacy_backup_targets():
+    """The src/-relative files older builds patched in place and kept a .bak
+    of: the Readabletro Lua targets, shaders and 2x textures, and the CRT
+    files."""
+    rels = set(READABLETRO_LUA_PATCHES) | {"game.lua", "resources/shaders/CRT.fs",
+                                          "resources/shaders/background.fs",
+                                          "resources/shaders/splash.fs"}
+    textures = os.path.join(READABLETRO_DIR, "textures", "2x")
+    if os.path.isdir(textures):
+        rels.update(f"resources/textures/2x/{fn}" for fn in os.listdir(textures) if fn.endswith(".png"))
+    return sorted(rels)
+
+
+def _restore_legacy_backups(src_dir):
+    """Undo what an interrupted pre-overlay build left in src/.
+
+    Older builds patched src/ in place, kept .bak copies and reverted them
+    after packing; an interrupted build left the tree patched. Put the
+    originals back so the tree matches what the overlay expects. Only the
+    files those builds backed up are touched; other .bak files are the
+    user's own.
+    """
+    restored = 0
+    for rel in _legacy_backup_targets():
+        bak = os.path.join(src_dir, *rel.split("/")) + ".bak"
+        if os.path.exists(bak):
+            os.replace(bak, bak[:-4])
+            restored += 1
+    font = os.path.join(src_dir, "resources", "fonts", "TypoQuik-Bold.ttf")
+    patch_font = os.path.join(READABLETRO_DIR, "fonts", "TypoQuik-Bold.ttf")
+    if os.path.exists(font) and os.path.exists(patch_font) and _file_hash(font) == _file_hash(patch_font):
+        os.remove(font)
+        restored += 1
+    game_lua = os.path.join(src_dir, "game.lua")
+    if os.path.exists(game_lua):
+        with open(game_lua, "r", encoding="utf-8") as f:
+            content = f.read()
+        if CRT_PATCH_MODIFIED in content:
+            with open(game_lua, "w", encoding="utf-8") as f:
+                f.write(content.replace(CRT_PATCH_MODIFIED, CRT_PATCH_ORIGINAL))
+            restored += 1
+    if restored:
+        print(f"  Restored {restored} file(s) left patched in src/ by an interrupted build.")
+
+
+def _restore_legacy_once(src_dir="src"):
+    """Run _restore_legacy_backups the first time this checkout builds, and
+    record that in the build cache. main() calls it before any build or
+    worker process starts, so matrix variants never race on src/."""
+    cache = _load_build_cache()
+    if cache.get("legacy_restored") or not os.path.isdir(src_dir):
         return
+    _restore_legacy_backups(src_dir)
+    cache["legacy_restored"] = True
+    tmp = f"{CACHE_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp, CACHE_FILE)
 
-    if restored_noise and restored_noise != len(CRT_NOISE_COMMENTED_LINES):
-        print("  Warning: Android CRT shader noise patch only partially applied.")
 
-    with open(crt_shader, "w", encoding="utf-8") as f:
-        f.write(content)
+# ── Bytecode ─────────────────────────────────────────────────────────────────
+#
+# Optional (--bytecode): ship Lua as stripped LuaJIT bytecode, so the phone
+# undumps it instead of parsing ~37k lines of source on every launch. A dump
+# only loads into a matching VM: LÖVE 11 bundles LuaJIT 2.1 (dump version 2),
+# and on arm64 it is a GC64 build, which dumps record as the FR2 flag. Lovely
+# patches Lua *source* while it loads, so bytecode and mods don't mix.
 
+LUAJIT_DUMP_VERSION = 2
+_LUAJIT_DUMP_HEAD   = b"\x1bLJ"
+_LUAJIT_DUMP_FR2    = 0x08
 
-def _apply_readabletro(src_dir, apply):
-    font_src        = os.path.join("patches", "readabletro", "fonts", "TypoQuik-Bold.ttf")
-    font_dst        = os.path.join(src_dir, "resources", "fonts", "TypoQuik-Bold.ttf")
-    shader_src_dir  = os.path.join("patches", "readabletro", "shaders")
-    shader_dst_dir  = os.path.join(src_dir, "resources", "shaders")
-    texture_src_dir = os.path.join("patches", "readabletro", "textures", "2x")
-    texture_dst_dir = os.path.join(src_dir, "resources", "textures", "2x")
+# A bytecode APK leaves out the 32-bit ARM libraries: without them Android
+# refuses to install it on a 32-bit-only device, instead of installing a game
+# whose armeabi-v7a LuaJIT cannot load its Lua.
+_BYTECODE_DROPPED_LIBS = ("lib/armeabi-v7a/",)
 
-    if apply:
-        for rel, pairs in READABLETRO_LUA_PATCHES.items():
-            fp = os.path.join(src_dir, rel)
-            if not os.path.exists(fp):
-                continue
-            shutil.copy2(fp, fp + ".bak")
-            with open(fp, "r", encoding="utf-8") as f:
-                content = f.read()
-            for orig, mod in pairs:
-                content = content.replace(orig, mod)
-            with open(fp, "w", encoding="utf-8") as f:
-                f.write(content)
-
-        if os.path.exists(font_src):
-            os.makedirs(os.path.dirname(font_dst), exist_ok=True)
-            shutil.copy2(font_src, font_dst)
-
-        os.makedirs(shader_dst_dir, exist_ok=True)
-        for shader in ("background.fs", "splash.fs"):
-            s_src = os.path.join(shader_src_dir, shader)
-            s_dst = os.path.join(shader_dst_dir, shader)
-            if os.path.exists(s_dst):
-                shutil.copy2(s_dst, s_dst + ".bak")
-            if os.path.exists(s_src):
-                shutil.copy2(s_src, s_dst)
-
-        tex_count = 0
-        if os.path.isdir(texture_src_dir):
-            os.makedirs(texture_dst_dir, exist_ok=True)
-            for fn in os.listdir(texture_src_dir):
-                if not fn.endswith(".png"):
-                    continue
-                t_src = os.path.join(texture_src_dir, fn)
-                t_dst = os.path.join(texture_dst_dir, fn)
-                if os.path.exists(t_dst):
-                    shutil.copy2(t_dst, t_dst + ".bak")
-                shutil.copy2(t_src, t_dst)
-                tex_count += 1
-        print(f"  Readabletro applied ({tex_count} textures).")
 
-    else:
-        for rel in READABLETRO_LUA_PATCHES:
-            fp  = os.path.join(src_dir, rel)
-            bak = fp + ".bak"
-            if os.path.exists(bak):
-                shutil.copy2(bak, fp)
-                os.remove(bak)
-        if os.path.exists(font_dst):
-            os.remove(font_dst)
-        for shader in ("background.fs", "splash.fs"):
-            s_dst = os.path.join(shader_dst_dir, shader)
-            bak   = s_dst + ".bak"
-            if os.path.exists(bak):
-                shutil.copy2(bak, s_dst)
-                os.remove(bak)
-        if os.path.isdir(texture_dst_dir):
-            for fn in os.listdir(texture_dst_dir):
-                if fn.endswith(".bak"):
-                    orig = os.path.join(texture_dst_dir, fn[:-4])
-                    shutil.copy2(os.path.join(texture_dst_dir, fn), orig)
-                    os.remove(os.path.join(texture_dst_dir, fn))
+def _find_luajit(path=None):
+    return path or shutil.which("luajit")
+
+
+def _compile_lua_chunk(luajit, data):
+    """Return `data` compiled by `luajit -b -s` into stripped bytecode.
+
+    Raises RuntimeError with luajit's message when the chunk does not compile.
+    Files rather than pipes: a Windows console pipe would mangle the bytes.
+    """
+    fd, src = tempfile.mkstemp(suffix=".lua")
+    out = src[:-len(".lua")] + ".raw"
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        result = subprocess.run([luajit, "-b", "-s", "-t", "raw", src, out],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            lines = (result.stderr or result.stdout).strip().splitlines()
+            raise RuntimeError(lines[-1] if lines else f"luajit exited with {result.returncode}")
+        with open(out, "rb") as f:
+            dump = f.read()
+    finally:
+        for path in (src, out):
+            if os.path.exists(path):
+                os.remove(path)
+    if not dump.startswith(_LUAJIT_DUMP_HEAD):
+        raise RuntimeError("luajit did not write a bytecode dump")
+    return dump
+
+
+_LUAJIT_TARGETS = {}
+
+
+def _luajit_target(luajit):
+    """Check that `luajit` dumps bytecode arm64 LÖVE 11 can load and return its
+    version banner, which keys every cache the bytecode ends up in. The
+    answer is remembered per binary (path, size and mtime), so a LuaJIT
+    upgraded in place is probed again."""
+    try:
+        st = os.stat(luajit)
+        key = (os.path.realpath(luajit), st.st_size, st.st_mtime_ns)
+    except OSError:
+        key = None
+    if key in _LUAJIT_TARGETS:
+        return _LUAJIT_TARGETS[key]
+    try:
+        banner = subprocess.run([luajit, "-v"], capture_output=True, text=True,
+                                check=True).stdout.strip().splitlines()[0]
+    except (OSError, subprocess.CalledProcessError, IndexError) as exc:
+        raise RuntimeError(f"cannot run {luajit}: {exc}")
+    probe = _compile_lua_chunk(luajit, b"return 0\n")
+    version, flags = probe[3], probe[4]
+    if version != LUAJIT_DUMP_VERSION or not flags & _LUAJIT_DUMP_FR2:
+        layout = "GC64" if flags & _LUAJIT_DUMP_FR2 else "32-bit"
+        raise RuntimeError(f"{banner} writes dump version {version} ({layout}); LÖVE 11 on arm64 "
+                           f"loads version {LUAJIT_DUMP_VERSION} (GC64) only")
+    if key:
+        _LUAJIT_TARGETS[key] = banner
+    return banner
+
+
+def _lua_form(data):
+    return "bytecode" if data.startswith(_LUAJIT_DUMP_HEAD) else "source"
 
 
 STEAMODDED_REPO = "Steamodded/smods"
@@ -575,8 +1847,7 @@ def _patch_lovely_mod_dir(apk_out):
         if count != 1:
             print(f"  Warning: skipped mod-dir patch for {arch} (found {count} matches).")
             continue
-        with open(so, "wb") as f:
-            f.write(data.replace(old, new))
+        _write_unlinked(so, data.replace(old, new))
         patched += 1
     if not patched:
         raise RuntimeError("could not repoint Lovely mod directory (liblove.so unpatched)")
@@ -642,92 +1913,175 @@ def _resolve_steamodded(flag_value, interactive):
     return ("Steamodded", files)
 
 
-def build_game_love(apply_crt=False, apply_readabletro=False, force=False, import_saves=None, import_mods=None):
-    """Package src/ into Game.love."""
+def build_game_love(apply_crt=False, apply_readabletro=False, force=False, import_saves=None, import_mods=None,
+                    jobs=None, luajit=None, output_file="Game.love", cache_file=None, fingerprint=None):
+    """Package src/ plus the in-memory overlay into Game.love, deflating on
+    `jobs` threads (default: all cores). src/ itself is only read.
+
+    Matrix builds give each variant its own `output_file` and `cache_file`,
+    so variants built side by side each keep their own incremental state.
+
+    With `luajit` (path to a LuaJIT 2.1 binary) every src/ Lua file ships as
+    stripped bytecode, falling back to source for any file it fails to
+    compile; the build cache records which form each entry shipped in.
+
+    `fingerprint` is (indexed_at_ns, files, index) from a caller that already
+    fingerprinted src/ and the Readabletro tree against the same cache.
+    """
     src_dir     = "src"
-    output_file = "Game.love"
+    cache_file  = cache_file or CACHE_FILE
 
     if not os.path.exists(src_dir):
         print("  ERROR: src/ not found.")
         sys.exit(1)
 
-    if apply_crt:
-        _apply_crt_patch(src_dir, apply=True)
-    _apply_crt_slider_mask_patch(src_dir)
-    if apply_readabletro:
-        _apply_readabletro(src_dir, apply=True)
+    bytecode = None
+    if luajit:
+        try:
+            with _span("luajit check"):
+                bytecode = _luajit_target(luajit)
+        except RuntimeError as exc:
+            print(f"  ERROR: --bytecode: {exc}")
+            sys.exit(1)
 
-    changed, current_files = _sources_changed(src_dir, output_file)
+    jobs    = jobs or _default_jobs()
+    cache   = _load_build_cache(cache_file)
+    options = {"crt": bool(apply_crt), "readabletro": bool(apply_readabletro),
+               "transforms": _transform_revision(), "bytecode": bytecode,
+               "source_date": SOURCE_DATE,
+               "import_saves": _payload_digest(import_saves) if import_saves else None,
+               "import_mods": _payload_digest(import_mods) if import_mods else None}
+    indexed_at_ns = fingerprint[0] if fingerprint else int(time.time() * 1e9)
+    with _span("scan sources"):
+        changed, current_files, index = _sources_changed([src_dir, READABLETRO_DIR], output_file,
+                                                         cache, options, fingerprint and fingerprint[1:])
 
     if not force and not changed:
         print("  No source changes - skipping rebuild.")
-        if apply_crt:
-            _apply_crt_patch(src_dir, apply=False)
-        if apply_readabletro:
-            _apply_readabletro(src_dir, apply=False)
+        _save_build_index(cache, index, indexed_at_ns, cache_file)
         return
 
-    with open(CACHE_FILE, "w") as f:
-        json.dump({"files": current_files}, f, indent=2)
-
-    if os.path.exists(output_file):
-        os.remove(output_file)
-
     def _skip(path):
         return any(p in path for p in GAME_LOVE_EXCLUDE)
 
-    # Lovely-injector regex patches anchor on '\n' newlines. If a Lua source has
-    # CRLF (e.g. Windows autocrlf checkout), some SMODS regex patches fail to match
-    # and leave behind dangling original code that creates Lua syntax errors at runtime
-    # (observed: "ambiguous syntax (function call x new statement)" near the leftover
-    # `(k==6 or k ==16 ...)` block in create_UIBox_your_collection_blinds).
-    # Normalize all packaged Lua files to LF so patches apply correctly.
-    count = 0
-    with zipfile.ZipFile(output_file, "w", zipfile.ZIP_DEFLATED) as zf:
-        for root, dirs, files in os.walk(src_dir):
-            dirs[:] = [d for d in dirs if not _skip(os.path.join(root, d))]
-            for fn in files:
-                if _skip(fn):
-                    continue
+    sources = {}
+    for root, dirs, files in os.walk(src_dir):
+        dirs[:] = [d for d in dirs if not _skip(os.path.join(root, d))]
+        for fn in files:
+            if not _skip(fn):
                 fp = os.path.join(root, fn)
-                arc = os.path.relpath(fp, src_dir)
-                if fn.endswith(".lua"):
-                    with open(fp, "rb") as f:
-                        data = f.read()
-                    if b"\r\n" in data:
-                        data = data.replace(b"\r\n", b"\n")
-                    zf.writestr(arc.replace(os.sep, "/"), data)
-                else:
-                    zf.write(fp, arc)
-                count += 1
-
-        if import_saves:
-            for slot, kinds in import_saves.items():
-                for kind, data in kinds.items():
-                    if kind == "save":
-                        continue
-                    zf.writestr(f"import_save/{slot}/{kind}.jkr", data)
-                    count += 1
+                sources[os.path.relpath(fp, src_dir).replace(os.sep, "/")] = fp
+    if apply_readabletro:
+        overlay = _readabletro_overlay()
+        sources.update(overlay)
+        textures = sum(1 for arc in overlay if arc.startswith("resources/textures/"))
+        print(f"  Readabletro applied ({textures} textures).")
+    if apply_crt:
+        print("  CRT shader disabled for all portrait modes.")
 
-        if import_mods:
-            for modname, mfiles in import_mods.items():
-                for relpath, data in mfiles.items():
-                    zf.writestr(f"install_mods/{modname}/{relpath}", data)
-                    count += 1
+    forms, rejected = {}, {}
 
-    if apply_crt:
-        _apply_crt_patch(src_dir, apply=False)
-    if apply_readabletro:
-        _apply_readabletro(src_dir, apply=False)
+    def _read(arc, fp):
+        with open(fp, "rb") as f:
+            data = f.read()
+        if arc.endswith(".lua"):
+            data = _transform_lua(arc, data, apply_crt, apply_readabletro)
+            if bytecode:
+                try:
+                    data = _compile_lua_chunk(luajit, data)
+                except RuntimeError as exc:
+                    rejected[arc] = str(exc)
+            forms[arc] = _lua_form(data)
+            return data
+        if arc == "resources/shaders/CRT.fs":
+            return _transform_crt_shader(data)
+        return data
+
+    # Files with content patches are transformed up front so their manifest key
+    # is the hash of what actually ships; everything else is keyed by its
+    # source fingerprint and only read if it has to be recompressed.
+    # Entries go in name order, so the archive does not depend on the order
+    # os.walk happens to list directories in.
+    patched = set(READABLETRO_LUA_PATCHES) | {"game.lua", "resources/shaders/CRT.fs"}
+    plan = []
+    with _span("plan entries", files=len(sources)):
+        for arc, fp in sorted(sources.items()):
+            st = os.stat(fp)
+            dos, attr = _dos_datetime(st.st_mtime), _zip_attr(st)
+            if arc in patched:
+                data = _read(arc, fp)
+                plan.append((arc, _bytes_hash(data), lambda data=data: data, dos, attr))
+            else:
+                key = current_files.get(fp) or _file_hash(fp)
+                if bytecode and arc.endswith(".lua"):
+                    key = _bytes_hash(f"{key}:{bytecode}".encode("utf-8"))
+                plan.append((arc, key, lambda arc=arc, fp=fp: _read(arc, fp), dos, attr))
+
+    now = _dos_datetime(time.time())
+    if import_saves:
+        for slot, kinds in sorted(import_saves.items()):
+            for kind, data in sorted(kinds.items()):
+                if kind == "save":
+                    continue
+                plan.append((f"import_save/{slot}/{kind}.jkr", _bytes_hash(data),
+                             lambda data=data: data, now, 0o600 << 16))
+
+    if import_mods:
+        for modname, mfiles in sorted(import_mods.items()):
+            for relpath, data in sorted(mfiles.items()):
+                plan.append((f"install_mods/{modname}/{relpath}", _bytes_hash(data),
+                             lambda data=data: data, now, 0o600 << 16))
+
+    # Unchanged entries are copied as already-deflated bytes from the previous
+    # Game.love (located through the manifest kept in CACHE_FILE), so a one-line
+    # Lua edit only recompresses that one file instead of all of resources/.
+    manifest = _load_love_manifest(cache, output_file)
+    tmp_file = output_file + ".tmp"
+    old = open(output_file, "rb") if manifest else None
+    try:
+        # Transforms and bytecode compiles of unpatched files run in here, on
+        # the deflate threads.
+        with _span("pack entries", jobs=jobs), _ZipWriter(tmp_file) as zout:
+            entries, reused = _pack_love_entries(zout, plan, old, manifest, jobs)
+        if old is not None:
+            old.close()                 # Windows cannot replace a file still open
+        os.replace(tmp_file, output_file)
+    finally:
+        if old is not None:
+            old.close()
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)         # the build failed part-way through
+    count = len(entries)
+    for arc, record in entries.items():
+        if arc in forms:
+            record["form"] = forms[arc]
+        elif "form" in manifest.get(arc, {}):
+            record["form"] = manifest[arc]["form"]      # reused, so shipped as before
+
+    with open(cache_file, "w") as f:
+        json.dump({"indexed_at_ns": indexed_at_ns, "index": index, "options": options,
+                   "game_love": {"archive": _archive_stamp(output_file), "entries": entries},
+                   "legacy_restored": cache.get("legacy_restored", False)},
+                  f, indent=2)
 
     size_mb = os.path.getsize(output_file) / 1_048_576
-    print(f"  Game.love built  ({count} files, {size_mb:.2f} MB)")
+    note = f", {reused} reused" if reused else ""
+    print(f"  Game.love built  ({count} files{note}, {size_mb:.2f} MB)")
+    if bytecode:
+        compiled = sum(1 for record in entries.values() if record.get("form") == "bytecode")
+        print(f"  Bytecode: {compiled} Lua files compiled with {bytecode}.")
+        for arc, reason in sorted(rejected.items()):
+            print(f"  Warning: {arc} shipped as source ({reason}).")
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Step 3 — APK build
 # ─────────────────────────────────────────────────────────────────────────────
 
+def _jdk_archive():
+    return os.path.join(WORKDIR, "openjdk.zip" if os.name == "nt" else "openjdk.tar.gz")
+
+
 def _setup_jdk():
     global JAVA_BIN
     if IS_TERMUX:
@@ -743,10 +2097,9 @@ def _setup_jdk():
         print(f"  Java (Termux native): {JAVA_BIN}")
         return
 
-    archive = os.path.join(WORKDIR, "openjdk.zip" if os.name == "nt" else "openjdk.tar.gz")
-    _download(JDK_URL, archive)
-
+    archive = _jdk_archive()
     if not os.path.exists(JDK_DIR):
+        _download(JDK_URL, archive)
         print("  Extracting JDK ...")
         for item in os.listdir(WORKDIR):
             p = os.path.join(WORKDIR, item)
@@ -784,7 +2137,8 @@ def _termux_install_packages(packages):
         print(f"    pkg install {' '.join(packages)}")
         sys.exit(1)
     print(f"  Installing Termux packages: {' '.join(packages)}")
-    result = subprocess.run([pkg, "install", "-y"] + packages)
+    with _span("pkg install", packages=" ".join(packages)):
+        result = subprocess.run([pkg, "install", "-y"] + packages)
     if result.returncode != 0:
         print("  ERROR: Termux package install failed.")
         print(f"    command: {pkg} install -y {' '.join(packages)}")
@@ -804,7 +2158,8 @@ def _ensure_termux_command(command, package):
 
 
 def _run_checked(command, cwd, label):
-    result = subprocess.run(command, cwd=cwd, capture_output=True, text=True)
+    with _span(label):
+        result = subprocess.run(command, cwd=cwd, capture_output=True, text=True)
     if result.returncode != 0:
         print(f"  ERROR: {label} failed.")
         print(f"    command: {' '.join(command)}")
@@ -816,8 +2171,9 @@ def _run_checked(command, cwd, label):
 
 
 def _java(jar, args):
-    result = subprocess.run([JAVA_BIN, "-jar", jar] + args, cwd=WORKDIR,
-                            capture_output=True, text=True)
+    with _span(f"java {os.path.basename(jar)}", args=" ".join(args)):
+        result = subprocess.run([JAVA_BIN, "-jar", jar] + args, cwd=WORKDIR,
+                                capture_output=True, text=True)
     if result.returncode != 0:
         print(f"  ERROR:\n{result.stderr}")
         sys.exit(1)
@@ -862,21 +2218,56 @@ def _ensure_debug_keystore():
     return keystore
 
 
-def _sign_apk(signer):
+def _choose_signer(requested):
+    """Resolve --signer. Android only updates an installed app in place when
+    the new APK carries the same certificate, so "auto" keeps signing with the
+    legacy tools' key for a workspace that already produced an APK with it,
+    and uses the built-in signer everywhere else."""
+    if requested in ("builtin", "legacy"):
+        return requested
+    if os.path.exists(SIGNER_KEY) or not os.path.exists(SIGNED_APK):
+        return "builtin"
+    print("  Signing with the legacy tools to keep the key of the APK you already built.")
+    print("  Pass --signer builtin to switch to the faster built-in signer; the")
+    print("  installed app must then be uninstalled once (back up your saves first).")
+    return "legacy"
+
+
+def _builtin_signer():
+    """(key, cert) of the built-in signer, generating the key on first use."""
+    apksign = _load_tool("apksign")
+    if not os.path.exists(SIGNER_KEY):
+        print(f"  Generating a debug signing key: {SIGNER_KEY}")
+    try:
+        return apksign.load_signer(SIGNER_KEY)
+    except ValueError as exc:
+        print(f"  ERROR: {exc}")
+        print(f"  Delete {SIGNER_KEY} to generate a new debug key.")
+        sys.exit(1)
+
+
+def _sign_builtin(unsigned_apk, signed_apk):
+    key, cert = _builtin_signer()
+    _load_tool("apksign").sign(unsigned_apk, signed_apk, key, cert)
+
+
+def _sign_apk(method, signer_jar):
+    if method == "builtin":
+        _sign_builtin(os.path.join(WORKDIR, "balatro.apk"), SIGNED_APK)
+        return
+
     if not IS_TERMUX:
-        _java(signer, ["-a", "balatro.apk"])
+        _java(signer_jar, ["-a", "balatro.apk"])
         return
 
     apksigner = _ensure_termux_command("apksigner", "apksigner")
     _ensure_debug_keystore()
 
     aligned = os.path.join(WORKDIR, "balatro-aligned.apk")
-    signed = os.path.join(WORKDIR, "balatro-aligned-debugSigned.apk")
-    for path in (aligned, signed):
+    for path in (aligned, SIGNED_APK):
         if os.path.exists(path):
             os.remove(path)
 
-    sign_input = "balatro.apk"
     zipalign = shutil.which("zipalign")
     if zipalign:
         _run_checked([
@@ -887,9 +2278,10 @@ def _sign_apk(signer):
             "balatro.apk",
             "balatro-aligned.apk",
         ], WORKDIR, "zipalign")
-        sign_input = "balatro-aligned.apk"
     else:
-        print("  zipalign not found in Termux - signing APK without zipalign.")
+        # Termux's repo often lacks zipalign; align in Python rather than
+        # shipping an unaligned APK.
+        _load_tool("apksign").align(os.path.join(WORKDIR, "balatro.apk"), aligned)
 
     _run_checked([
         apksigner,
@@ -898,10 +2290,88 @@ def _sign_apk(signer):
         "--ks-pass", "pass:android",
         "--key-pass", "pass:android",
         "--out", "balatro-aligned-debugSigned.apk",
-        sign_input,
+        "balatro-aligned.apk",
     ], WORKDIR, "apksigner")
 
 
+def _write_unlinked(path, data):
+    """Replace `path` through a fresh inode. The APK workspace is hardlinked
+    from the pristine decode cache, so writing into an existing file in place
+    would patch the cache as well."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _copy_unlinked(src, dst):
+    if os.path.lexists(dst):
+        os.remove(dst)
+    shutil.copy(src, dst)
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _apktool_identity(jar):
+    """What decoded the APK: a native Termux apktool (setup A, see _apktool)
+    is identified by its resolved file, the bundled jar by its pinned hash."""
+    if IS_TERMUX:
+        tool = shutil.which("apktool")
+        if tool:
+            real = os.path.realpath(tool)
+            st = os.stat(real)
+            return f"native:{real}:{st.st_size}:{st.st_mtime_ns}"
+    return "jar:" + TOOL_SHA256[APKTOOL_URL]
+
+
+def _pristine_dir(apktool, base_sha):
+    key = _bytes_hash(f"{base_sha}|{_apktool_identity(apktool)}".encode("utf-8"))
+    return os.path.join(WORKDIR, "decoded", key)
+
+
+def _restore_pristine(pristine, apk_out, rels):
+    """Put the decoded originals of `rels` back into the workspace, so a patch
+    stage can re-run on its own without the others' files being touched."""
+    for rel in rels:
+        dst = os.path.join(apk_out, rel)
+        if os.path.exists(dst):
+            os.remove(dst)
+        _link_or_copy(os.path.join(pristine, rel), dst)
+
+
+def _decoded_workspace(apktool, apk_fn, base_sha, apk_out):
+    """Fill apk_out with a decoded copy of the base APK.
+
+    `apktool d` runs once per (base APK SHA-256, apktool) pair into a pristine
+    cache under WORKDIR/decoded; every build then clones that tree with
+    hardlinks (plain copies where the filesystem has none), which takes well
+    under a second instead of a full JVM decode. Patch steps must go through
+    _write_unlinked/_copy_unlinked so the shared inodes stay pristine.
+    """
+    pristine = _pristine_dir(apktool, base_sha)
+    cache_root = os.path.dirname(pristine)
+    if not os.path.isdir(pristine):
+        # Older decodes are ~100 MB each and will not be used again.
+        if os.path.isdir(cache_root):
+            shutil.rmtree(cache_root)
+        os.makedirs(cache_root)
+        print("  Unpacking APK ...")
+        staging = pristine + ".tmp"
+        _apktool(apktool, ["d", "-o", os.path.relpath(staging, WORKDIR), apk_fn])
+        os.replace(staging, pristine)
+    else:
+        print("  Reusing decoded APK (base APK and apktool unchanged).")
+
+    if os.path.exists(apk_out):
+        shutil.rmtree(apk_out)
+    shutil.copytree(pristine, apk_out, copy_function=_link_or_copy)
+
+
 def _apktool(jar, args):
     """Run apktool. The apktool jar's bundled aapt binaries are x86-64 only, so
     on Termux/Android one of two known-good setups is used:
@@ -912,30 +2382,31 @@ def _apktool(jar, args):
          Java, with ReVanced's ARM aapt2 (downloaded automatically) passed via
          --use-aapt2 -a. This needs no manual apktool install at all.
     """
-    if IS_TERMUX:
-        tool = shutil.which("apktool")
-        if tool:
-            # Setup A: native apktool brings its own ARM aapt; don't override it.
-            result = subprocess.run([tool] + list(args), cwd=WORKDIR,
-                                    capture_output=True, text=True)
-            if result.returncode != 0:
-                print("  ERROR: apktool failed.")
-                print(f"    command: {tool} {' '.join(args)}")
-                if result.stdout:
-                    print(f"  STDOUT:\n{result.stdout}")
-                if result.stderr:
-                    print(f"  STDERR:\n{result.stderr}")
-                sys.exit(1)
+    with _span(f"apktool {args[0]}"):
+        if IS_TERMUX:
+            tool = shutil.which("apktool")
+            if tool:
+                # Setup A: native apktool brings its own ARM aapt; don't override it.
+                result = subprocess.run([tool] + list(args), cwd=WORKDIR,
+                                        capture_output=True, text=True)
+                if result.returncode != 0:
+                    print("  ERROR: apktool failed.")
+                    print(f"    command: {tool} {' '.join(args)}")
+                    if result.stdout:
+                        print(f"  STDOUT:\n{result.stdout}")
+                    if result.stderr:
+                        print(f"  STDERR:\n{result.stderr}")
+                    sys.exit(1)
+                return
+
+            # Setup B: bundled apktool jar + downloaded ARM aapt2 (build step only).
+            termux_args = list(args)
+            if termux_args and termux_args[0] == "b":
+                aapt2 = _setup_termux_aapt2()
+                termux_args = ["b", "--use-aapt2", "-a", aapt2] + termux_args[1:]
+            _java(jar, termux_args)
             return
-
-        # Setup B: bundled apktool jar + downloaded ARM aapt2 (build step only).
-        termux_args = list(args)
-        if termux_args and termux_args[0] == "b":
-            aapt2 = _setup_termux_aapt2()
-            termux_args = ["b", "--use-aapt2", "-a", aapt2] + termux_args[1:]
-        _java(jar, termux_args)
-        return
-    _java(jar, args)
+        _java(jar, args)
 
 
 def _patch_sdl_portrait_orientation(apk_out):
@@ -973,99 +2444,192 @@ def _patch_sdl_portrait_orientation(apk_out):
         "    return-void\n"
     )
     smali = smali[:insert_at] + injected + smali[insert_at:]
-
-    with open(smali_path, "w", encoding="utf-8", newline="\n") as f:
-        f.write(smali)
-
-
-def build_apk(profiler=None):
-    """Download tools, package, and sign the always-Lovely Android APK."""
-    game_love_src = os.path.abspath("Game.love")
-    if not os.path.exists(game_love_src):
-        print("  ERROR: Game.love not found - run the build step first.")
-        sys.exit(1)
-
-    os.makedirs(WORKDIR, exist_ok=True)
-    p = profiler or BuildProfiler()
-
+    _write_unlinked(smali_path, smali.encode("utf-8"))
+
+
+def _patch_android_manifest(apk_out):
+    manifest_path = os.path.join(apk_out, "AndroidManifest.xml")
+
+    with open(manifest_path, encoding="utf-8") as f:
+        m = f.read()
+    m = m.replace("systems.shorty.lmm", "com.unofficial.balatro")
+    m = re.sub(r'android:label="[^"]+"',         'android:label="Balatro"',          m)
+    m = re.sub(r'android:versionCode="[^"]+"',   f'android:versionCode="{_version_code()}"', m)
+    m = re.sub(r'android:versionName="[^"]+"',   f'android:versionName="{MOD_VERSION}-lovely"', m)
+    m = re.sub(r'\sandroid:debuggable="[^"]+"',  "",                                  m)
+    m = re.sub(r'android:screenOrientation="[^"]+"', 'android:screenOrientation="portrait"', m)
+    m = re.sub(r'android:configChanges="[^"]+"',
+               'android:configChanges="orientation|screenSize|smallestScreenSize|screenLayout|uiMode|keyboard|keyboardHidden|navigation"', m)
+    _write_unlinked(manifest_path, m.encode("utf-8"))
+
+
+def _install_patch_icons(apk_out):
+    for density in ["hdpi","mdpi","xhdpi","xxhdpi","xxxhdpi"]:
+        src = os.path.join(WORKDIR, "res", f"drawable-{density}", "love.png")
+        dst = os.path.join(apk_out,  "res", f"drawable-{density}", "love.png")
+        if os.path.exists(src):
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            _copy_unlinked(src, dst)
+
+
+def _prepare_unsigned_apk(p, full, sign_method):
+    """Download the tools and bring APK_TEMPLATE up to date: the patched,
+    unsigned APK with an empty assets/game.love, which every build then swaps
+    its own Game.love into. Runs the decode, patch and repack stages of the
+    build graph, so a build that only changed Game.love never starts apktool.
+    Returns the signer jar path (legacy signing only)."""
     apk_fn  = "lovely-base.apk"
     apk_url = LOVELY_APK_URL
 
-    apktool   = os.path.join(WORKDIR, "apktool.jar")
-    signer    = os.path.join(WORKDIR, "uber-apk-signer.jar")
+    apktool    = os.path.join(WORKDIR, "apktool.jar")
+    signer_jar = os.path.join(WORKDIR, "uber-apk-signer.jar")
     patch_zip = os.path.join(WORKDIR, "Balatro-APK-Patch.zip")
     base_apk  = os.path.join(WORKDIR, apk_fn)
 
-    with p.step("JDK setup"):
-        _setup_jdk()
-
     with p.step("Download tools"):
         # apktool.jar is always fetched: on Termux it's the "setup B" fallback
         # (bundled jar + ReVanced aapt2) when no native apktool is in PATH, and
         # it's harmless if an in-PATH apktool ends up being used instead.
-        downloads = [(APKTOOL_URL, apktool), (SIGNER_URL, signer),
-                     (PATCH_URL, patch_zip), (apk_url, base_apk)]
-        for url, dest in downloads:
-            _download(url, dest)
-
-    apk_out = os.path.join(WORKDIR, "balatro-apk")
-    with p.step("Unpack APK"):
-        if os.path.exists(apk_out):
-            shutil.rmtree(apk_out)
-        print("  Unpacking APK ...")
-        _apktool(apktool, ["d", "-o", "balatro-apk", apk_fn])
-
-    with p.step("Patch manifest"):
-        patch_dir = os.path.join(WORKDIR, "Balatro-APK-Patch")
-        if os.path.exists(patch_dir):
-            shutil.rmtree(patch_dir)
-        with zipfile.ZipFile(patch_zip) as z:
-            z.extractall(WORKDIR)
-
-        manifest_path = os.path.join(apk_out, "AndroidManifest.xml")
-
-        with open(manifest_path) as f:
-            m = f.read()
-        m = m.replace("systems.shorty.lmm", "com.unofficial.balatro")
-        m = re.sub(r'android:label="[^"]+"',         'android:label="Balatro"',          m)
-        m = re.sub(r'android:versionCode="[^"]+"',   f'android:versionCode="{int(time.time())}"', m)
-        m = re.sub(r'android:versionName="[^"]+"',   f'android:versionName="{MOD_VERSION}-lovely"', m)
-        m = re.sub(r'\sandroid:debuggable="[^"]+"',  "",                                  m)
-        m = re.sub(r'android:screenOrientation="[^"]+"', 'android:screenOrientation="portrait"', m)
-        m = re.sub(r'android:configChanges="[^"]+"',
-                   'android:configChanges="orientation|screenSize|smallestScreenSize|screenLayout|uiMode|keyboard|keyboardHidden|navigation"', m)
-        with open(manifest_path, "w") as f:
-            f.write(m)
-        print("  [Lovely] Manifest patched.")
-
-        _patch_sdl_portrait_orientation(apk_out)
-        print("  [Lovely] SDL orientation patched.")
-
-        _patch_lovely_mod_dir(apk_out)
-        print("  [Lovely] Mod folder repointed to save/game/Mods.")
-
-        # Icons
-        for density in ["hdpi","mdpi","xhdpi","xxhdpi","xxxhdpi"]:
-            src = os.path.join(WORKDIR, "res", f"drawable-{density}", "love.png")
-            dst = os.path.join(apk_out,  "res", f"drawable-{density}", "love.png")
-            if os.path.exists(src):
-                os.makedirs(os.path.dirname(dst), exist_ok=True)
-                shutil.copy(src, dst)
-
-        # Game.love
-        game_dst = os.path.join(apk_out, "assets", "game.love")
-        os.makedirs(os.path.dirname(game_dst), exist_ok=True)
-        shutil.copy(game_love_src, game_dst)
-
-    with p.step("Repack APK"):
-        print("  Repacking APK ...")
-        _apktool(apktool, ["b", "-o", "balatro.apk", "balatro-apk"])
-
-    with p.step("Sign APK"):
-        print("  Signing APK ...")
-        _sign_apk(signer)
-
-    p.report()
+        downloads = [(APKTOOL_URL, apktool), (PATCH_URL, patch_zip), (apk_url, base_apk)]
+        if sign_method == "legacy" and not IS_TERMUX:
+            downloads.append((SIGNER_URL, signer_jar))
+        if not IS_TERMUX and not os.path.exists(JDK_DIR):
+            # Only a first build gets here, and that one needs Java for
+            # apktool; fetch the JDK alongside the rest.
+            downloads.append((JDK_URL, _jdk_archive()))
+        digests = _download_many(downloads)
+
+    # Java is only needed for apktool and the legacy signers, so a build that
+    # only swaps game.love and signs in Python never starts a JVM.
+    java_ready = []
+
+    def _java_setup():
+        if not java_ready:
+            with p.step("JDK setup"):
+                _setup_jdk()
+            java_ready.append(True)
+
+    base_sha = digests[base_apk]
+    identity = _apktool_identity(apktool)
+    pristine = _pristine_dir(apktool, base_sha)
+    apk_out  = os.path.join(WORKDIR, "balatro-apk")
+    full_reason = "forced (--full-apk)" if full else None
+
+    def _decode():
+        _java_setup()
+        with p.step("Unpack APK"):
+            _decoded_workspace(apktool, apk_fn, base_sha, apk_out)
+
+    _stage("decode", {"base apk": base_sha, "apktool": identity}, _decode,
+           outputs=[pristine, apk_out])
+
+    # Each patch stage owns a disjoint set of workspace files and restores
+    # them from the pristine decode before patching, so any one of them can
+    # re-run alone.
+    manifest_files = ["AndroidManifest.xml"] + [
+        rel for rel in (os.path.join("res", f"drawable-{d}", "love.png")
+                        for d in ("hdpi", "mdpi", "xhdpi", "xxhdpi", "xxxhdpi"))
+        if os.path.exists(os.path.join(pristine, rel))]
+    smali_files = [os.path.join("smali", "org", "libsdl", "app", "SDLActivity.smali")]
+    native_files = [rel for rel in (os.path.join("lib", arch, "liblove.so")
+                                    for arch in ("arm64-v8a", "armeabi-v7a"))
+                    if os.path.exists(os.path.join(pristine, rel))]
+
+    def _patch_manifest():
+        with p.step("Patch manifest"):
+            _restore_pristine(pristine, apk_out, manifest_files)
+            patch_dir = os.path.join(WORKDIR, "Balatro-APK-Patch")
+            if os.path.exists(patch_dir):
+                shutil.rmtree(patch_dir)
+            with zipfile.ZipFile(patch_zip) as z:
+                z.extractall(WORKDIR)
+            _patch_android_manifest(apk_out)
+            print("  [Lovely] Manifest patched.")
+            _install_patch_icons(apk_out)
+
+    def _patch_smali():
+        with p.step("Patch smali"):
+            _restore_pristine(pristine, apk_out, smali_files)
+            _patch_sdl_portrait_orientation(apk_out)
+            print("  [Lovely] SDL orientation patched.")
+
+    def _patch_native():
+        with p.step("Patch native libs"):
+            _restore_pristine(pristine, apk_out, native_files)
+            _patch_lovely_mod_dir(apk_out)
+            print("  [Lovely] Mod folder repointed to save/game/Mods.")
+
+    def _outputs(rels):
+        return [os.path.join(apk_out, rel) for rel in rels]
+
+    _stage("patch_manifest",
+           {"code": _code_digest(_patch_android_manifest, _install_patch_icons),
+            "version": f"{MOD_VERSION}|{_version_code()}", "patch zip": digests[patch_zip]},
+           _patch_manifest, deps=("decode",), outputs=_outputs(manifest_files), force=full_reason)
+    _stage("patch_smali", {"code": _code_digest(_patch_sdl_portrait_orientation)},
+           _patch_smali, deps=("decode",), outputs=_outputs(smali_files), force=full_reason)
+    _stage("patch_native", {"code": _code_digest(_patch_lovely_mod_dir)},
+           _patch_native, deps=("decode",), outputs=_outputs(native_files), force=full_reason)
+
+    def _repack():
+        _java_setup()
+        with p.step("Repack APK"):
+            print("  Repacking APK ...")
+            game_dst = os.path.join(apk_out, "assets", "game.love")
+            os.makedirs(os.path.dirname(game_dst), exist_ok=True)
+            _write_unlinked(game_dst, b"")
+            _apktool(apktool, ["b", "-o", os.path.basename(APK_TEMPLATE), "balatro-apk"])
+            if SOURCE_DATE is not None:
+                # apktool stamps entries with file mtimes, in directory order.
+                _normalize_zip(APK_TEMPLATE)
+
+    if not _stage("repack", {"apktool": identity, "source date": str(SOURCE_DATE)}, _repack,
+                  deps=("patch_manifest", "patch_smali", "patch_native"),
+                  outputs=[APK_TEMPLATE], force=full_reason):
+        print("  Base APK and patches unchanged - reusing the unsigned APK.")
+    if sign_method == "legacy":
+        _java_setup()
+    return signer_jar
+
+
+def build_apk(profiler=None, full=False, signer="auto", bytecode=False):
+    """Download tools, package, and sign the always-Lovely Android APK. With
+    `bytecode` (Game.love holds LuaJIT bytecode) it ships arm64 only."""
+    game_love_src = os.path.abspath("Game.love")
+    if not os.path.exists(game_love_src):
+        print("  ERROR: Game.love not found - run the build step first.")
+        sys.exit(1)
+
+    os.makedirs(WORKDIR, exist_ok=True)
+    p = profiler or BuildProfiler()       # a caller's profiler is reported by the caller
+    sign_method = _choose_signer(signer)
+    signer_jar = _prepare_unsigned_apk(p, full, sign_method)
+
+    if sign_method == "builtin":
+        with p.step("Signing key"):
+            _builtin_signer()           # the key is an input, so make sure it exists
+        signer_id = "builtin:" + _sha256_of(SIGNER_KEY)
+    else:
+        signer_id = "legacy"
+
+    drop = _BYTECODE_DROPPED_LIBS if bytecode else ()
+
+    def _sign():
+        with p.step("Swap game.love"):
+            with open(game_love_src, "rb") as f:
+                _swap_zip_entry(APK_TEMPLATE, "assets/game.love", f.read(),
+                                out=os.path.join(WORKDIR, "balatro.apk"), drop=drop)
+        with p.step("Sign APK"):
+            print("  Signing APK ...")
+            _sign_apk(sign_method, signer_jar)
+
+    if not _stage("sign", {"game.love": _sha256_of(game_love_src), "signer": signer_id,
+                           "dropped libs": ",".join(drop) or "none"}, _sign,
+                  deps=("repack",), outputs=[SIGNED_APK]):
+        print("  Game.love, APK and signer unchanged - keeping the signed APK.")
+
+    if profiler is None:
+        p.report()
     print(f"\n{'=' * 60}")
     print("  Build complete - MODDED (Lovely)")
     print(f"  APK: balatro-mobile-maker/balatro-aligned-debugSigned.apk")
@@ -1083,13 +2647,55 @@ def build_apk(profiler=None):
 # Step 4 — iOS IPA build (experimental)
 # ─────────────────────────────────────────────────────────────────────────────
 
+def _pack_ipa(base_ipa, game_love_src, out_ipa):
+    """Rewrite the base IPA into `out_ipa` with a portrait Info.plist and Game.love.
+
+    Every other member is copied raw: compressed bytes, attributes and host
+    system untouched, which keeps the unix permissions on the Balatro
+    executable inside the .app bundle and leaves nothing to inflate or
+    deflate but the two replaced entries."""
+    plist_arc = "Payload/Balatro.app/Info.plist"
+    love_arc  = "Payload/Balatro.app/game.love"
+    print("  Packing IPA (portrait-locked Info.plist + game.love) ...")
+    with zipfile.ZipFile(base_ipa, "r") as zin:
+        plist = plistlib.loads(zin.read(plist_arc))
+    plist["UISupportedInterfaceOrientations"] = ["UIInterfaceOrientationPortrait"]
+    plist["UISupportedInterfaceOrientations~ipad"] = ["UIInterfaceOrientationPortrait"]
+    plist["CFBundleShortVersionString"] = MOD_VERSION
+    plist["CFBundleVersion"] = MOD_VERSION
+
+    st = os.stat(game_love_src)
+    with open(game_love_src, "rb") as f:
+        game_love = f.read()
+
+    tmp_ipa = out_ipa + ".tmp"
+    love_written = False
+    with _ZipWriter(tmp_ipa) as zout:
+        for entry, payload in _zip_raw_members(base_ipa):
+            if entry.name == plist_arc:
+                zout.add_raw(*_compress_entry(plist_arc, plistlib.dumps(plist),
+                                              (entry.dostime, entry.dosdate),
+                                              entry.external_attr, zipfile.ZIP_DEFLATED,
+                                              entry.create_system))
+            elif entry.name == love_arc:
+                zout.add(love_arc, game_love, st.st_mtime, _zip_attr(st))
+                love_written = True
+            else:
+                zout.add_raw(entry, payload)
+        # The stock shell carries no game data; Game.love goes last.
+        if not love_written:
+            zout.add(love_arc, game_love, st.st_mtime, _zip_attr(st))
+    os.replace(tmp_ipa, out_ipa)
+
+
 def build_ipa(profiler=None):
     """Package Game.love into an unsigned, portrait-locked iOS .ipa.
 
     The base is a prebuilt LOVE iOS app shell (no game data). We rewrite the
-    archive instead of appending so Info.plist can be replaced: orientation is
-    locked to portrait and the bundle version is set to MOD_VERSION. The IPA is
-    unsigned by design — Sideloadly/AltStore re-sign it at install time.
+    archive (copying the shell's members raw) instead of appending so
+    Info.plist can be replaced: orientation is locked to portrait and the
+    bundle version is set to MOD_VERSION. The IPA is unsigned by design —
+    Sideloadly/AltStore re-sign it at install time.
     """
     game_love_src = os.path.abspath("Game.love")
     if not os.path.exists(game_love_src):
@@ -1101,35 +2707,32 @@ def build_ipa(profiler=None):
 
     base_ipa  = os.path.join(WORKDIR, "balatro-base.ipa")
     out_ipa   = "balatro-portrait.ipa"
-    plist_arc = "Payload/Balatro.app/Info.plist"
-    love_arc  = "Payload/Balatro.app/game.love"
 
     with p.step("Download iOS base"):
-        _download(IOS_BASE_URL, base_ipa)
-
-    with p.step("Pack IPA"):
-        print("  Packing IPA (portrait-locked Info.plist + game.love) ...")
-        if os.path.exists(out_ipa):
-            os.remove(out_ipa)
-        with zipfile.ZipFile(base_ipa, "r") as zin, \
-             zipfile.ZipFile(out_ipa, "w", zipfile.ZIP_DEFLATED) as zout:
-            for item in zin.infolist():
-                if item.filename in (plist_arc, love_arc):
-                    continue
-                # passing the original ZipInfo preserves unix permissions on
-                # the Balatro executable inside the .app bundle
-                zout.writestr(item, zin.read(item.filename))
-
-            plist = plistlib.loads(zin.read(plist_arc))
-            plist["UISupportedInterfaceOrientations"] = ["UIInterfaceOrientationPortrait"]
-            plist["UISupportedInterfaceOrientations~ipad"] = ["UIInterfaceOrientationPortrait"]
-            plist["CFBundleShortVersionString"] = MOD_VERSION
-            plist["CFBundleVersion"] = MOD_VERSION
-            zout.writestr(plist_arc, plistlib.dumps(plist))
+        base_sha = _download(IOS_BASE_URL, base_ipa)
+
+    inputs = {"base ipa": base_sha, "game.love": _sha256_of(game_love_src), "packer": _code_digest(_pack_ipa),
+              "version": MOD_VERSION, "source date": str(SOURCE_DATE)}
+
+    def _pack():
+        # The IPA is a pure function of its inputs, so a build another
+        # checkout (or CI job) already packed is linked from the shared
+        # cache instead.
+        ipa_key = "ipa:" + "|".join(inputs[label] for label in sorted(inputs))
+        cached = _store_ref(ipa_key)
+        if cached and _store_link(cached, out_ipa):
+            print("  IPA inputs unchanged - reusing the cached build.")
+            return
+        with p.step("Pack IPA"):
+            _pack_ipa(base_ipa, game_love_src, out_ipa)
+        _store_put(out_ipa, _sha256_of(out_ipa), ipa_key)
+        _store_evict()
 
-            zout.write(game_love_src, love_arc)
+    if not _stage("ipa", inputs, _pack, outputs=[os.path.abspath(out_ipa)]):
+        print("  IPA inputs unchanged - keeping balatro-portrait.ipa.")
 
-    p.report()
+    if profiler is None:
+        p.report()
     size_mb = os.path.getsize(out_ipa) / 1_048_576
     print(f"\n{'=' * 60}")
     print("  iOS build complete - EXPERIMENTAL (untested by maintainer)")
@@ -1141,6 +2744,240 @@ def build_ipa(profiler=None):
     print("  See docs/IOS.md for instructions - and please report results!")
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# Concurrent packaging
+# ─────────────────────────────────────────────────────────────────────────────
+#
+# The APK and the IPA share nothing but the finished Game.love, and the APK
+# side mostly waits on apktool and the JVM. Each target runs in its own worker
+# process: its prints (and its download progress bar, drawn from helper
+# threads) are captured whole, and a sys.exit() deep inside one target ends
+# that job only. Both write their outputs through temp files and os.replace,
+# so a failed job leaves the other's artifacts intact.
+
+def _packaging_job(fn, kwargs, settings):
+    """Run one packaging target with its output captured. `settings` carries
+    the globals main() set from the command line into the worker process.
+    Returns (output, profiler spans, succeeded)."""
+    globals().update(settings)
+    profiler = BuildProfiler()
+    out = io.StringIO()
+    ok = True
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+        try:
+            fn(profiler=profiler, **kwargs)
+        except SystemExit as exc:
+            ok = exc.code in (None, 0)
+        except Exception:
+            traceback.print_exc()
+            ok = False
+    return out.getvalue(), profiler.spans, ok
+
+
+def _run_jobs(jobs, max_workers=None):
+    """Run [(label, fn, kwargs)] in worker processes (default: one each),
+    printing each job's output as one block, in job order.
+    Returns [(label, profiler spans, succeeded)]."""
+    settings = {"SOURCE_DATE": SOURCE_DATE, "STORE_DIR": STORE_DIR, "EXPLAIN": EXPLAIN}
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers or len(jobs)) as pool:
+        futures = [pool.submit(_packaging_job, fn, kwargs, settings) for _label, fn, kwargs in jobs]
+        for (label, _fn, _kwargs), future in zip(jobs, futures):
+            try:
+                output, spans, ok = future.result()
+            except Exception as exc:
+                output, spans, ok = f"  ERROR: the {label} job died: {exc!r}\n", [], False
+            print(f"\n── {label} {'─' * (56 - len(label))}")
+            sys.stdout.write(output)
+            results.append((label, spans, ok))
+    return results
+
+
+def _package_concurrently(jobs, profiler=None):
+    """Run [(label, fn, kwargs)] packaging targets side by side. Each job's
+    output is printed as one block, in job order. Every job's spans are
+    merged into `profiler`; without one, a timing report covering every job
+    follows. Exits non-zero after all jobs finish if any of them failed."""
+    merged = profiler or BuildProfiler()
+    results = _run_jobs(jobs)
+    for label, spans, _ok in results:
+        merged.absorb(label, spans)
+    if profiler is None:
+        merged.report()
+    failed = [label for label, _spans, ok in results if not ok]
+    if failed:
+        print(f"  ERROR: {' and '.join(failed)} packaging failed; see the log above.")
+        sys.exit(1)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Matrix builds
+# ─────────────────────────────────────────────────────────────────────────────
+#
+# A release ships several variants (CRT on/off, Readabletro, Steamodded), and
+# they differ only in Game.love. --matrix runs the shared stages once: the
+# tool downloads, the patched unsigned APK (at most one apktool round trip),
+# the signing key, Steamodded and the iOS base. Each variant then builds its
+# own Game.love, swaps it into the unsigned APK template and signs it, side
+# by side in worker processes, into dist/balatro-portrait-<variant>.apk.
+
+MATRIX_DIR = "dist"
+MATRIX_KEYS = ("name", "disable_crt", "readabletro", "steamodded", "ios")
+
+
+def _variant_name(variant):
+    name = (f"readabletro-{'on' if variant['readabletro'] else 'off'}"
+            f"_crt-{'off' if variant['disable_crt'] else 'on'}")
+    return name + "_steamodded" if variant["steamodded"] else name
+
+
+def _load_matrix(path):
+    """Parse a --matrix file: a JSON list of variants, each an object with
+    any of MATRIX_KEYS ("steamodded" takes a tag, "latest" or true). Missing
+    keys take the single-build defaults; a missing name is derived from the
+    options, in the form zygisk/gen_assets.py uses."""
+    try:
+        with open(path) as f:
+            raw = json.load(f)
+    except (OSError, ValueError) as exc:
+        print(f"  ERROR: --matrix {path}: {exc}")
+        sys.exit(1)
+    if not isinstance(raw, list) or not raw:
+        print(f"  ERROR: --matrix {path}: expected a non-empty JSON list of variants.")
+        sys.exit(1)
+
+    variants, names = [], set()
+    for i, entry in enumerate(raw, 1):
+        if not isinstance(entry, dict) or set(entry) - set(MATRIX_KEYS):
+            print(f"  ERROR: --matrix variant {i}: expected an object with keys from "
+                  f"{', '.join(MATRIX_KEYS)}.")
+            sys.exit(1)
+        steamodded = entry.get("steamodded") or None
+        variant = {
+            "disable_crt": bool(entry.get("disable_crt", DEFAULT_BUILD_CONFIG["crt"])),
+            "readabletro": bool(entry.get("readabletro", DEFAULT_BUILD_CONFIG["readabletro"])),
+            "steamodded":  "latest" if steamodded is True else steamodded,
+            "ios":         bool(entry.get("ios", DEFAULT_BUILD_CONFIG["ios"])),
+        }
+        variant["name"] = str(entry.get("name") or _variant_name(variant))
+        if not re.fullmatch(r"[A-Za-z0-9._-]+", variant["name"]):
+            print(f"  ERROR: --matrix variant {i}: name {variant['name']!r} may only use "
+                  "letters, digits, '.', '_' and '-'.")
+            sys.exit(1)
+        if variant["name"] in names:
+            print(f"  ERROR: --matrix variant {i}: duplicate name {variant['name']!r}.")
+            sys.exit(1)
+        names.add(variant["name"])
+        variants.append(variant)
+    return variants
+
+
+def _matrix_artifact(name, ext):
+    return os.path.join(MATRIX_DIR, f"balatro-portrait-{name}{ext}")
+
+
+def _build_variant(profiler, variant, unsigned_apk, base_ipa, import_saves, import_mods, luajit, jobs):
+    """One matrix variant: Game.love in dist/<name>/ (with its own build cache),
+    then the signed APK and, if asked for, the IPA next to it."""
+    name = variant["name"]
+    work = os.path.join(MATRIX_DIR, name)
+    os.makedirs(work, exist_ok=True)
+    game_love = os.path.join(work, "Game.love")
+
+    with profiler.step("Game.love"):
+        build_game_love(apply_crt=variant["disable_crt"], apply_readabletro=variant["readabletro"],
+                        import_saves=import_saves, import_mods=import_mods, jobs=jobs, luajit=luajit,
+                        output_file=game_love, cache_file=os.path.join(work, CACHE_FILE))
+
+    if unsigned_apk:
+        unsigned = os.path.join(work, "balatro.apk")
+        with profiler.step("Swap game.love"):
+            with open(game_love, "rb") as f:
+                _swap_zip_entry(unsigned_apk, "assets/game.love", f.read(), out=unsigned,
+                                drop=_BYTECODE_DROPPED_LIBS if luajit else ())
+        with profiler.step("Sign APK"):
+            _sign_builtin(unsigned, _matrix_artifact(name, ".apk"))
+            os.remove(unsigned)
+        print(f"  APK: {_matrix_artifact(name, '.apk')}")
+
+    if variant["ios"]:
+        with profiler.step("Pack IPA"):
+            _pack_ipa(base_ipa, game_love, _matrix_artifact(name, ".ipa"))
+        print(f"  IPA: {_matrix_artifact(name, '.ipa')}")
+
+
+def _matrix_summary(variants, results):
+    def _size(path):
+        return f"{os.path.getsize(path) / 1_048_576:.2f} MB" if os.path.exists(path) else "-"
+
+    width = max(len("Variant"), *(len(v["name"]) for v in variants))
+    print()
+    print(f"  {'Variant':<{width}}  {'Game.love':>10}  {'APK':>10}  {'IPA':>10}  {'Time':>7}")
+    for variant, (_label, spans, ok) in zip(variants, results):
+        name = variant["name"]
+        if not ok:
+            print(f"  {name:<{width}}  FAILED")
+            continue
+        love = _size(os.path.join(MATRIX_DIR, name, "Game.love"))
+        apk = _size(_matrix_artifact(name, ".apk"))
+        ipa = _size(_matrix_artifact(name, ".ipa")) if variant["ios"] else "-"
+        took = sum(span["dur"] for span in spans if span["parent"] is None)
+        print(f"  {name:<{width}}  {love:>10}  {apk:>10}  {ipa:>10}  {took:>6.1f}s")
+
+
+def build_matrix(variants, skip_apk=False, full=False, import_saves=None, luajit=None, jobs=None,
+                 profiler=None):
+    """Build every variant of a --matrix file into MATRIX_DIR. The shared
+    stages run here, once; the variants run on up to `jobs` worker processes.
+    Timed into `profiler`, or reported here without one. Exits non-zero
+    after the summary if any variant failed."""
+    p = profiler or BuildProfiler()
+    jobs = jobs or _default_jobs()
+    os.makedirs(WORKDIR, exist_ok=True)
+    os.makedirs(MATRIX_DIR, exist_ok=True)
+
+    mods = {}
+    tags = sorted({v["steamodded"] for v in variants if v["steamodded"]})
+    if tags:
+        with p.step("Steamodded"):
+            for tag in tags:
+                resolved = _resolve_steamodded(tag, interactive=False)
+                if not resolved:
+                    print(f"  ERROR: could not fetch Steamodded {tag}.")
+                    sys.exit(1)
+                mods[tag] = dict([resolved])
+
+    unsigned_apk = None
+    if not skip_apk:
+        _prepare_unsigned_apk(p, full, "builtin")
+        unsigned_apk = APK_TEMPLATE
+        with p.step("Signing key"):
+            _builtin_signer()           # generated once, not by racing workers
+
+    base_ipa = None
+    if any(v["ios"] for v in variants):
+        base_ipa = os.path.join(WORKDIR, "balatro-base.ipa")
+        with p.step("Download iOS base"):
+            _download(IOS_BASE_URL, base_ipa)
+
+    workers = max(1, min(len(variants), jobs))
+    results = _run_jobs([(v["name"], _build_variant,
+                          {"variant": v, "unsigned_apk": unsigned_apk, "base_ipa": base_ipa,
+                           "import_saves": import_saves, "import_mods": mods.get(v["steamodded"]),
+                           "luajit": luajit, "jobs": max(1, jobs // workers)})
+                         for v in variants], workers)
+    for label, spans, _ok in results:
+        p.absorb(label, spans)
+
+    _matrix_summary(variants, results)
+    if profiler is None:
+        p.report()
+    failed = [label for label, _spans, ok in results if not ok]
+    if failed:
+        print(f"  ERROR: {len(failed)} of {len(variants)} variants failed: {', '.join(failed)}.")
+        sys.exit(1)
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # CLI flag parser
 # ─────────────────────────────────────────────────────────────────────────────
@@ -1180,10 +3017,40 @@ def _parse_args():
                         help="only build Game.love, skip APK packaging")
     parser.add_argument("--force", action="store_true",
                         help="force Game.love rebuild even if sources are unchanged")
+    parser.add_argument("--full-apk", dest="full_apk", action="store_true",
+                        help="always rebuild the APK with apktool instead of swapping game.love "
+                             "into the last one")
     parser.add_argument("--import-save", dest="import_save", metavar="PATH",
                         help="bake a desktop Balatro save folder or Takeout zip into the APK")
     parser.add_argument("--steamodded", dest="steamodded", metavar="VERSION", nargs="?", const="latest",
                         help="bundle Steamodded into the APK (optional version tag; default latest)")
+    parser.add_argument("--bytecode", action="store_true",
+                        help="ship Game.love's Lua as stripped LuaJIT bytecode (64-bit devices only; "
+                             "not with --steamodded)")
+    parser.add_argument("--luajit", dest="luajit", metavar="PATH",
+                        help="LuaJIT 2.1 binary used by --bytecode (default: luajit on PATH)")
+    parser.add_argument("--reproducible", action="store_true",
+                        help="byte-identical output for identical inputs: entries dated "
+                             "SOURCE_DATE_EPOCH or the git commit time (implied by SOURCE_DATE_EPOCH)")
+    parser.add_argument("--explain", action="store_true",
+                        help="print why each build stage ran or was skipped")
+    parser.add_argument("--matrix", dest="matrix", metavar="FILE",
+                        help="build every variant listed in a JSON file into dist/, sharing the "
+                             "tool setup and the unsigned APK")
+    parser.add_argument("--concurrent", action="store_true",
+                        help="with --ios, package the APK and the IPA side by side")
+    parser.add_argument("--profile-out", dest="profile_out", metavar="FILE",
+                        help="write the build's timing spans to FILE as JSON, and a Chrome trace "
+                             "(chrome://tracing, Perfetto) to FILE's name with .trace.json")
+    parser.add_argument("--jobs", "-j", dest="jobs", metavar="N", type=int,
+                        help="threads used to compress Game.love (default: all cores)")
+    parser.add_argument("--cache-dir", dest="cache_dir", metavar="DIR",
+                        help="shared download/artifact cache (default: ~/.cache/balatro-portrait, "
+                             "or $BALATRO_PORTRAIT_CACHE); 'off' disables it")
+    parser.add_argument("--signer", choices=("auto", "builtin", "legacy"),
+                        help="APK signer: builtin (Python, no JVM), legacy (uber-apk-signer / "
+                             "Termux apksigner), or auto (default: builtin unless an APK was "
+                             "already signed the legacy way)")
     parser.add_argument("--version", action="version", version=f"%(prog)s {MOD_VERSION}")
 
     ns = parser.parse_args()
@@ -1191,13 +3058,18 @@ def _parse_args():
     return flags
 
 
-def _load_collect_saves():
+def _load_tool(name):
+    """Import tools/<name>.py (tools/ is not a package)."""
     import importlib.util
-    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tools", "import_save.py")
-    spec = importlib.util.spec_from_file_location("import_save", path)
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tools", name + ".py")
+    spec = importlib.util.spec_from_file_location(name, path)
     module = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(module)
-    return module.collect_saves
+    return module
+
+
+def _load_collect_saves():
+    return _load_tool("import_save").collect_saves
 
 
 def _resolve_import_save(flag_path, interactive):
@@ -1238,10 +3110,134 @@ def _resolve_import_save(flag_path, interactive):
     return cleaned
 
 
+def _source_date_epoch():
+    """SOURCE_DATE_EPOCH if set, else the commit time of this checkout's HEAD,
+    else 1980-01-01 (the earliest time a zip entry can carry). Exits on a
+    SOURCE_DATE_EPOCH that is not a whole number of seconds."""
+    value = os.environ.get("SOURCE_DATE_EPOCH", "").strip()
+    if value:
+        if not value.isdigit():
+            print(f"  ERROR: SOURCE_DATE_EPOCH must be a Unix time in whole seconds, not {value!r}.")
+            sys.exit(1)
+        return int(value)
+    try:
+        result = subprocess.run(["git", "log", "-1", "--format=%ct"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        return int(result.stdout.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return 315532800
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Main
 # ─────────────────────────────────────────────────────────────────────────────
 
+def _ensure_resources(cli, step):
+    """The extract stage. With --balatro pointing at a game file, that file is
+    its input, so a game update re-extracts; without one, only missing
+    resources trigger the (interactive) extraction."""
+    print()
+    if cli.get("skip_setup"):
+        print(f"{step} Skipping resource setup (--skip-setup).")
+        return
+    balatro_path = cli.get("balatro_path")
+    inputs = None
+    if balatro_path and os.path.isfile(os.path.expanduser(balatro_path)):
+        game_file = os.path.abspath(os.path.expanduser(balatro_path))
+        st = os.stat(game_file)
+        inputs = {"game file": f"{game_file}|{st.st_size}|{st.st_mtime_ns}",
+                  "code": _code_digest(_extract_resources, _resource_members)}
+    src_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+
+    def _extract():
+        print(f"{step} Extracting game resources ...")
+        setup_resources(balatro_path)
+
+    if not _stage("extract", inputs, _extract,
+                  outputs=[os.path.join(src_dir, folder) for folder in RESOURCE_FOLDERS]):
+        print(f"{step} Resources already present.")
+
+
+def _game_love_stage(apply_crt, apply_readabletro, force, import_saves, import_mods, jobs, luajit):
+    """The overlay and Game.love stages. src/ and the Readabletro tree are
+    fingerprinted once, through the build cache's stat index, so unchanged
+    files are not re-read; build_game_love reuses that fingerprint."""
+    banner = "off"
+    if luajit:
+        try:
+            banner = _luajit_target(luajit)
+        except RuntimeError as exc:
+            print(f"  ERROR: --bytecode: {exc}")
+            sys.exit(1)
+    cache = _load_build_cache()
+    indexed_at_ns = int(time.time() * 1e9)
+    with _span("fingerprint sources"):
+        current, index = _fingerprint_files(["src", READABLETRO_DIR], cache)
+
+    def _tree(root):
+        items = sorted((path, digest) for path, digest in current.items() if path.startswith(root))
+        return _bytes_hash(json.dumps(items).encode("utf-8"))
+
+    _stage("overlay", {"readabletro": _tree(READABLETRO_DIR) if apply_readabletro else "off"})
+
+    inputs = {
+        "src": _tree("src"),
+        "options": f"crt={bool(apply_crt)}|transforms={_transform_revision()}|source_date={SOURCE_DATE}",
+        "luajit": banner,
+        "import saves": _payload_digest(import_saves) if import_saves else "none",
+        "mods": _payload_digest(import_mods) if import_mods else "none",
+        "code": _code_digest(build_game_love, _transform_lua, _transform_crt_shader),
+    }
+
+    def _build():
+        build_game_love(apply_crt=apply_crt, apply_readabletro=apply_readabletro, force=True,
+                        import_saves=import_saves, import_mods=import_mods, jobs=jobs, luajit=luajit,
+                        fingerprint=(indexed_at_ns, current, index))
+
+    if not _stage("game_love", inputs, _build, deps=("extract", "overlay"),
+                  outputs=[os.path.abspath("Game.love")],
+                  force="forced (--force)" if force else None):
+        print("  No source changes - skipping rebuild.")
+        _save_build_index(cache, index, indexed_at_ns)
+
+
+def _finish_profile(profiler, cli):
+    """Print the run's timing report and write --profile-out, if given."""
+    profiler.report()
+    if cli.get("profile_out"):
+        trace = profiler.export(cli["profile_out"])
+        print(f"  Profile written to {cli['profile_out']} (Chrome trace: {trace}).")
+
+
+def _main_matrix(cli):
+    variants = _load_matrix(cli["matrix"])
+    luajit = None
+    if cli.get("bytecode"):
+        if any(v["steamodded"] for v in variants):
+            print("  ERROR: --bytecode cannot be combined with Steamodded variants: Lovely")
+            print("         patches the game's Lua source as it loads, and bytecode has none.")
+            sys.exit(1)
+        luajit = _find_luajit(cli.get("luajit"))
+        if not luajit:
+            print("  ERROR: --bytecode needs LuaJIT 2.1; install luajit or pass --luajit PATH.")
+            sys.exit(1)
+    if cli.get("signer") == "legacy":
+        print("  ERROR: --matrix signs with the built-in signer; drop --signer legacy.")
+        sys.exit(1)
+    import_saves = _resolve_import_save(cli.get("import_save"), interactive=False)
+
+    print(f"  Matrix: {len(variants)} variants from {cli['matrix']}.")
+    profiler = BuildProfiler()
+    with profiler.step("Resources"):
+        _ensure_resources(cli, "[1/2]")
+    print()
+    print("[2/2] Building variants ...")
+    build_matrix(variants, skip_apk=cli.get("skip_apk", False), full=cli.get("full_apk", False),
+                 import_saves=import_saves, luajit=luajit, jobs=max(cli.get("jobs", _default_jobs()), 1),
+                 profiler=profiler)
+    _finish_profile(profiler, cli)
+
+
 def main():
     print("=" * 60)
     print("  BALATRO PORTRAIT MOBILE - BUILD")
@@ -1249,6 +3245,22 @@ def main():
 
     cli = _parse_args()
     all_cli_set = all(k in cli for k in ("crt", "readabletro", "ios"))
+    if "cache_dir" in cli:
+        global STORE_DIR
+        off = cli["cache_dir"].lower() in ("", "0", "off", "none")
+        STORE_DIR = None if off else os.path.abspath(cli["cache_dir"])
+    if cli.get("reproducible") or os.environ.get("SOURCE_DATE_EPOCH"):
+        global SOURCE_DATE
+        SOURCE_DATE = _source_date_epoch()
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(SOURCE_DATE))
+        print(f"  Reproducible build: every archive entry dated {stamp} UTC.")
+    if cli.get("explain"):
+        global EXPLAIN
+        EXPLAIN = True
+    _restore_legacy_once()
+    if "matrix" in cli:
+        _main_matrix(cli)
+        return
 
     # ── Load or collect config ──────────────────────────────────────────────
     config = {}
@@ -1298,8 +3310,8 @@ def main():
     apply_crt         = cli.get("crt",          config.get("crt",         DEFAULT_BUILD_CONFIG["crt"]))
     apply_readabletro = cli.get("readabletro",   config.get("readabletro", DEFAULT_BUILD_CONFIG["readabletro"]))
     build_ios         = cli.get("ios",           config.get("ios",         DEFAULT_BUILD_CONFIG["ios"]))
-    balatro_path      = cli.get("balatro_path",  None)
     force             = cli.get("force",         False)
+    jobs              = max(cli.get("jobs", _default_jobs()), 1)
     import_saves      = _resolve_import_save(
         cli.get("import_save"),
         interactive=("import_save" not in cli and not all_cli_set),
@@ -1309,26 +3321,51 @@ def main():
         interactive=("steamodded" not in cli and not all_cli_set),
     )
     import_mods       = dict([steamodded]) if steamodded else None
+    luajit            = None
+    if cli.get("bytecode"):
+        if import_mods:
+            print("  ERROR: --bytecode cannot be combined with --steamodded: Lovely patches")
+            print("         the game's Lua source as it loads, and bytecode has none.")
+            sys.exit(1)
+        luajit = _find_luajit(cli.get("luajit"))
+        if not luajit:
+            print("  ERROR: --bytecode needs LuaJIT 2.1; install luajit or pass --luajit PATH.")
+            sys.exit(1)
+        print("  Bytecode: Lua ships precompiled and the APK is arm64 only. 32-bit ARM")
+        print("  devices and Lovely mods that patch game code need a source build.")
 
     total = 4 if build_ios else 3
+    profiler = BuildProfiler()
 
     # ── Step 1 — Resources ──────────────────────────────────────────────────
-    needs_setup = not os.path.exists(os.path.join("src", "resources"))
-    print()
-    if cli.get("skip_setup"):
-        print(f"[1/{total}] Skipping resource setup (--skip-setup).")
-    elif needs_setup:
-        print(f"[1/{total}] Game resources not found - extracting from Balatro.exe ...")
-        setup_resources(balatro_path)
-    else:
-        print(f"[1/{total}] Resources already present.")
+    with profiler.step("Resources"):
+        _ensure_resources(cli, f"[1/{total}]")
 
     # ── Step 2 — Game.love ─────────────────────────────────────────────────
     print()
     print(f"[2/{total}] Building Game.love ...")
-    build_game_love(apply_crt=apply_crt, apply_readabletro=apply_readabletro,
-                    force=force or bool(import_saves) or bool(import_mods),
-                    import_saves=import_saves, import_mods=import_mods)
+    with profiler.step("Game.love"):
+        _game_love_stage(apply_crt, apply_readabletro, force, import_saves, import_mods, jobs, luajit)
+
+    # One set of APK options for the side-by-side job and the sequential call.
+    apk_options = {"full": cli.get("full_apk", False), "signer": cli.get("signer", "auto"),
+                   "bytecode": bool(luajit)}
+
+    # ── Steps 3+4 — APK and iOS IPA side by side ───────────────────────────
+    if cli.get("concurrent") and build_ios and not cli.get("skip_apk"):
+        print()
+        print(f"[3-4/{total}] Building APK and iOS IPA (experimental) side by side ...")
+        with profiler.step("APK + IPA"):
+            _package_concurrently([
+                ("APK", build_apk, apk_options),
+                ("IPA", build_ipa, {}),
+            ], profiler)
+        _finish_profile(profiler, cli)
+
+        print()
+        print("  Install on device:")
+        print("    adb install balatro-mobile-maker/balatro-aligned-debugSigned.apk")
+        return
 
     # ── Step 3 — APK ───────────────────────────────────────────────────────
     if cli.get("skip_apk"):
@@ -1337,7 +3374,8 @@ def main():
     else:
         print()
         print(f"[3/{total}] Building APK ...")
-        build_apk(profiler=BuildProfiler())
+        with profiler.step("APK"):
+            build_apk(profiler=profiler, **apk_options)
 
         print()
         print("  Install on device:")
@@ -1347,7 +3385,10 @@ def main():
     if build_ios:
         print()
         print(f"[4/{total}] Building iOS IPA (experimental) ...")
-        build_ipa(profiler=BuildProfiler())
+        with profiler.step("IPA"):
+            build_ipa(profiler=profiler)
+
+    _finish_profile(profiler, cli)
 
 
 if __name__ == "__main__":
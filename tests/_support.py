@@ -0,0 +1,80 @@
+"""Shared pieces of the Python tests: build.py on the import path, loading
+the scripts under tools/ and zygisk/, a throwaway checkout to run in, and
+the runner behind each test file's __main__."""
+
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from contextlib import contextmanager
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+import build  # noqa: E402
+
+# A src/ just big enough for build_game_love.
+MINIMAL_SRC = {"main.lua": b"print('hi')\n" * 40, "conf.lua": b"function love.conf(t) end\n"}
+
+
+def load_module(name, *path):
+    """Import the script at REPO_ROOT/<path> (its folder is not a package)."""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(REPO_ROOT, *path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@contextmanager
+def checkout(prefix, files=None, mtime=None, explain=False):
+    """A throwaway checkout, made the working directory while it is in use,
+    with its own build graph state. `files` ({src/-relative path: bytes})
+    are written under src/; with `mtime`, each of them gets that
+    modification time. `explain` sets build.EXPLAIN meanwhile."""
+    old_cwd = os.getcwd()
+    root = tempfile.mkdtemp(prefix=prefix)
+    saved = (build.GRAPH_FILE, build.EXPLAIN)
+    build.GRAPH_FILE = os.path.join(root, "work", "build_graph.json")
+    build.EXPLAIN = explain
+    for rel, data in (files or {}).items():
+        path = os.path.join(root, "src", *rel.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+    os.chdir(root)
+    try:
+        yield root
+    finally:
+        os.chdir(old_cwd)
+        build.GRAPH_FILE, build.EXPLAIN = saved
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def skip(reason):
+    """End the running test as skipped (an external tool is missing, say).
+    pytest reports unittest.SkipTest as a skip too."""
+    raise unittest.SkipTest(reason)
+
+
+def run_tests(namespace):
+    """Run every test_* function in `namespace` (a test file's globals()) in
+    name order, print "ok - name", "skip - name: why" or "FAIL - name: why"
+    for each, and exit non-zero if any failed."""
+    failures = 0
+    for name, fn in sorted(namespace.items()):
+        if name.startswith("test_") and callable(fn):
+            try:
+                fn()
+                print(f"ok - {name}")
+            except unittest.SkipTest as exc:
+                print(f"skip - {name}: {exc}")
+            except AssertionError as exc:
+                failures += 1
+                print(f"FAIL - {name}: {exc}")
+            except Exception as exc:
+                failures += 1
+                print(f"FAIL - {name}: {type(exc).__name__}: {exc}")
+    sys.exit(1 if failures else 0)
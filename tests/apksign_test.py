@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Tests for tools/apksign.py, the JVM-free zipalign + APK signer.
+Run from the repo root: python tests/apksign_test.py  (or: python -m pytest tests)
+
+Signatures are checked by the module's own verifier, by `openssl cms` for the
+v1 PKCS#7 block, and by `apksigner verify` when the Android build tools are on
+PATH. The external checks are skipped when the tools are missing.
+"""
+
+import atexit
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import tracemalloc
+import zipfile
+
+from _support import load_module, run_tests, skip
+
+apksign = load_module("apksign", "tools", "apksign.py")
+
+_WORK = tempfile.mkdtemp(prefix="apksign_test_")
+_KEY = os.path.join(_WORK, "debug-signer.pem")
+atexit.register(shutil.rmtree, _WORK, ignore_errors=True)
+
+
+def _fixture_apk(path):
+    """An apktool-shaped archive: stored resources.arsc and native library at
+    odd offsets, deflated assets, and a stale signature to be replaced."""
+    rng = random.Random(99)
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("META-INF/OLD.SF", b"stale")
+        z.writestr(zipfile.ZipInfo("AndroidManifest.xml"), b"\x03\x00\x08\x00" + bytes(997))
+        z.writestr(zipfile.ZipInfo("resources.arsc"), bytes(rng.getrandbits(8) for _ in range(333)))
+        z.writestr(zipfile.ZipInfo("lib/arm64-v8a/liblove.so"), bytes(rng.getrandbits(8) for _ in range(5000)))
+        z.writestr("assets/game.love", bytes(rng.getrandbits(8) for _ in range(1_500_000)),
+                   compress_type=zipfile.ZIP_DEFLATED)
+        z.writestr("res/drawable/" + "a_rather_long_resource_name_" * 4 + ".png", b"png",
+                   compress_type=zipfile.ZIP_DEFLATED)
+
+
+def _signed():
+    src = os.path.join(_WORK, "in.apk")
+    dst = os.path.join(_WORK, "out.apk")
+    if not os.path.exists(dst):
+        _fixture_apk(src)
+        key, cert = apksign.load_signer(_KEY)
+        apksign.sign(src, dst, key, cert)
+    return src, dst
+
+
+def test_sign_and_verify():
+    _src, dst = _signed()
+    assert apksign.verify(dst) == {"aligned": True, "v1": True, "v2": True, "v3": True}
+
+
+def test_contents_preserved():
+    src, dst = _signed()
+    with zipfile.ZipFile(src) as a, zipfile.ZipFile(dst) as b:
+        assert b.testzip() is None
+        for name in a.namelist():
+            if name == "META-INF/OLD.SF":
+                assert name not in b.namelist()
+            else:
+                assert a.read(name) == b.read(name)
+                assert a.getinfo(name).compress_type == b.getinfo(name).compress_type
+
+
+def test_alignment():
+    _src, dst = _signed()
+    with open(dst, "rb") as f:
+        for entry in apksign._read_entries(f):
+            if entry.name == b"lib/arm64-v8a/liblove.so":
+                assert entry.offset % 4096 == 0
+            elif entry.method == 0:
+                assert entry.offset % 4 == 0
+
+
+def test_tampering_detected():
+    _src, dst = _signed()
+    tampered = os.path.join(_WORK, "tampered.apk")
+    with open(dst, "rb") as f:
+        data = bytearray(f.read())
+    with open(dst, "rb") as f:
+        entry = [e for e in apksign._read_entries(f) if e.name == b"resources.arsc"][0]
+    data[entry.offset] ^= 0xFF
+    with open(tampered, "wb") as f:
+        f.write(data)
+    result = apksign.verify(tampered)
+    assert not result["v2"] and not result["v3"] and not result["v1"]
+
+
+def test_key_reloads():
+    key, cert = apksign.load_signer(_KEY)
+    again, cert_again = apksign.load_signer(_KEY)
+    assert (key.n, key.d) == (again.n, again.d) and cert == cert_again
+
+
+def test_signing_streams_entries():
+    """A 24 MB native library is copied through, not held in memory."""
+    src = os.path.join(_WORK, "big.apk")
+    dst = os.path.join(_WORK, "big-signed.apk")
+    with zipfile.ZipFile(src, "w") as z:
+        z.writestr("AndroidManifest.xml", b"\x03\x00\x08\x00" + bytes(997))
+        z.writestr("lib/arm64-v8a/liblove.so", random.Random(7).getrandbits(24 * 8 << 20).to_bytes(24 << 20, "little"))
+    key, cert = apksign.load_signer(_KEY)
+    tracemalloc.start()
+    try:
+        apksign.sign(src, dst, key, cert)
+        _size, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < 8 * 1024 * 1024, peak
+    assert apksign.verify(dst) == {"aligned": True, "v1": True, "v2": True, "v3": True}
+    assert not os.path.exists(dst + ".tmp")
+
+
+def test_openssl_accepts_v1_block():
+    openssl = shutil.which("openssl")
+    if not openssl:
+        skip("openssl not on PATH")
+    _src, dst = _signed()
+    sf, rsa = os.path.join(_WORK, "CERT.SF"), os.path.join(_WORK, "CERT.RSA")
+    with zipfile.ZipFile(dst) as z:
+        for name, path in (("META-INF/CERT.SF", sf), ("META-INF/CERT.RSA", rsa)):
+            with open(path, "wb") as f:
+                f.write(z.read(name))
+    result = subprocess.run([openssl, "cms", "-verify", "-inform", "DER", "-in", rsa, "-content", sf,
+                             "-binary", "-noverify", "-out", os.devnull], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_apksigner_accepts():
+    apksigner = shutil.which("apksigner")
+    if not apksigner:
+        skip("apksigner not on PATH")
+    _src, dst = _signed()
+    result = subprocess.run([apksigner, "verify", "--verbose", "--min-sdk-version", "21", dst],
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+    lines = result.stdout.splitlines()
+    for scheme in ("v1", "v2", "v3"):
+        assert any(line.startswith(f"Verified using {scheme} scheme") and line.endswith("true")
+                   for line in lines), result.stdout
+
+
+if __name__ == "__main__":
+    run_tests(globals())
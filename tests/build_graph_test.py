@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""Tests for build.py's build graph: stages keyed by the hash of their inputs.
+Run from the repo root: python tests/build_graph_test.py  (or: python -m pytest tests)
+
+A stage must run the first time, be skipped while its inputs, upstream
+stage keys and outputs are unchanged, and run again (saying why) as soon as
+any of them differs. The Game.love stage is checked end to end on a fixture
+checkout, including the case that used to force a rebuild on every run:
+baked-in saves.
+"""
+
+import concurrent.futures
+import os
+import sys
+import zipfile
+from contextlib import contextmanager, redirect_stdout
+from io import BytesIO, StringIO
+
+from _support import MINIMAL_SRC, checkout, run_tests, skip
+import build
+
+
+def _workspace():
+    """A throwaway checkout that explains every stage."""
+    return checkout("build_graph_test_", MINIMAL_SRC, explain=True)
+
+
+def _run(name, inputs, runs, deps=(), outputs=(), force=None):
+    """Declare a stage that writes its outputs; return (ran, explain line)."""
+    def _work():
+        runs.append(name)
+        for path in outputs:
+            with open(path, "w") as f:
+                f.write(f"{name}:{sorted((inputs or {}).items())}")
+    out = StringIO()
+    with redirect_stdout(out):
+        ran = build._stage(name, inputs, _work, deps=deps, outputs=outputs, force=force)
+    return ran, out.getvalue().strip()
+
+
+def test_stage_runs_only_when_stale():
+    with _workspace():
+        runs = []
+        ran, why = _run("a", {"x": "1"}, runs, outputs=["a.out"])
+        assert ran and why == "[explain] a: ran - no previous run"
+        ran, why = _run("a", {"x": "1"}, runs, outputs=["a.out"])
+        assert not ran and why == "[explain] a: skipped - inputs unchanged"
+        ran, why = _run("a", {"x": "2"}, runs, outputs=["a.out"])
+        assert ran and why == "[explain] a: ran - changed: x"
+        os.remove("a.out")
+        ran, why = _run("a", {"x": "2"}, runs, outputs=["a.out"])
+        assert ran and why == "[explain] a: ran - output missing: a.out"
+        with open("a.out", "a") as f:
+            f.write("edited by hand")
+        os.utime("a.out", (1_700_000_000, 1_700_000_000))
+        ran, why = _run("a", {"x": "2"}, runs, outputs=["a.out"])
+        assert ran and why == "[explain] a: ran - output modified: a.out"
+        ran, why = _run("a", {"x": "2"}, runs, outputs=["a.out"], force="forced (--force)")
+        assert ran and why == "[explain] a: ran - forced (--force)"
+        assert runs == ["a"] * 5
+
+
+def test_upstream_change_propagates():
+    with _workspace():
+        runs = []
+        _run("a", {"x": "1"}, runs, outputs=["a.out"])
+        _run("b", {"y": "1"}, runs, deps=("a",), outputs=["b.out"])
+        _run("c", {"z": "1"}, runs, outputs=["c.out"])
+        assert runs == ["a", "b", "c"]
+        _run("a", {"x": "2"}, runs, outputs=["a.out"])
+        ran, why = _run("b", {"y": "1"}, runs, deps=("a",), outputs=["b.out"])
+        assert ran and why == "[explain] b: ran - changed: a stage"
+        ran, _why = _run("c", {"z": "1"}, runs, outputs=["c.out"])
+        assert not ran
+
+
+def test_untracked_inputs_only_need_outputs():
+    with _workspace():
+        runs = []
+        ran, why = _run("extract", None, runs, outputs=["res.out"])
+        assert ran and why == "[explain] extract: ran - output missing: res.out"
+        ran, why = _run("extract", None, runs, outputs=["res.out"])
+        assert not ran and why == "[explain] extract: skipped - outputs present"
+
+
+def _record_stages(graph_file, job):
+    build.GRAPH_FILE = graph_file
+    for i in range(25):
+        build._save_graph_record(f"{job}-{i}", {"key": str(i), "inputs": {}, "outputs": {}})
+
+
+def test_concurrent_records_all_kept():
+    with _workspace():
+        with concurrent.futures.ProcessPoolExecutor(max_workers=4) as pool:
+            list(pool.map(_record_stages, [build.GRAPH_FILE] * 4, range(4)))
+        state = build._load_graph_state()
+        assert set(state) == {f"{job}-{i}" for job in range(4) for i in range(25)}
+
+
+def _game_love(**kwargs):
+    out = StringIO()
+    with redirect_stdout(out):
+        build._game_love_stage(False, False, False, kwargs.get("saves"), None, 1, kwargs.get("luajit"))
+    return out.getvalue()
+
+
+def test_game_love_stage_with_import_saves():
+    with _workspace():
+        saves = {"1": {"profile": b"profile-data", "meta": b"meta-data"}}
+        assert "[explain] game_love: ran - no previous run" in _game_love(saves=saves)
+        assert "[explain] game_love: skipped - inputs unchanged" in _game_love(saves=saves)
+        with open(os.path.join("src", "main.lua"), "ab") as f:
+            f.write(b"-- edit\n")
+        assert "[explain] game_love: ran - changed: src" in _game_love(saves=saves)
+        saves["1"]["profile"] = b"newer-profile"
+        assert "[explain] game_love: ran - changed: import saves" in _game_love(saves=saves)
+        assert "[explain] game_love: skipped - inputs unchanged" in _game_love(saves=saves)
+
+
+def _luajit_wrapper(path, real, banner):
+    """A luajit that reports `banner` for -v and runs `real` otherwise."""
+    with open(path, "w") as f:
+        f.write(f'#!/bin/sh\nif [ "$1" = "-v" ]; then echo "{banner}"; exit 0; fi\nexec "{real}" "$@"\n')
+    os.chmod(path, 0o755)
+
+
+def test_luajit_upgrade_rebuilds_bytecode():
+    real = build._find_luajit()
+    if os.name == "nt" or not real:
+        skip("needs luajit on PATH and a POSIX shell")
+    with _workspace() as root:
+        luajit = os.path.join(root, "luajit")
+        _luajit_wrapper(luajit, real, "LuaJIT 2.1.1700000000")
+        try:
+            build._luajit_target(luajit)
+        except RuntimeError:
+            skip("luajit is not a GC64 LuaJIT 2.1")
+        assert "[explain] game_love: ran - no previous run" in _game_love(luajit=luajit)
+        assert "[explain] game_love: skipped - inputs unchanged" in _game_love(luajit=luajit)
+        # Upgraded in place: same path, new version.
+        _luajit_wrapper(luajit, real, "LuaJIT 2.1.1730000000 (upgraded)")
+        os.utime(luajit, (1_800_000_000, 1_800_000_000))
+        assert "[explain] game_love: ran - changed: luajit" in _game_love(luajit=luajit)
+
+
+@contextmanager
+def _apk_workspace():
+    """A WORKDIR whose downloads, JDK and apktool are stand-ins: apktool `d`
+    writes a minimal decoded tree and `b` zips it back up, recording each
+    call, so the APK stages run without Java or the network."""
+    names = ("WORKDIR", "GRAPH_FILE", "APK_TEMPLATE", "SIGNER_KEY", "SIGNED_APK", "STORE_DIR",
+             "_download_many", "_setup_jdk", "_apktool")
+    saved = {name: getattr(build, name) for name in names}
+    saved_pins = dict(build.TOOL_SHA256)
+    with _workspace() as root:
+        work = os.path.join(root, "work")
+        os.makedirs(work, exist_ok=True)
+        build.WORKDIR, build.STORE_DIR = work, None
+        build.GRAPH_FILE = os.path.join(work, "build_graph.json")
+        build.APK_TEMPLATE = os.path.join(work, "balatro-template.apk")
+        build.SIGNER_KEY = os.path.join(work, "debug-signer.pem")
+        build.SIGNED_APK = os.path.join(work, "signed.apk")
+        build.EXPLAIN = False
+        build.TOOL_SHA256[build.PATCH_URL] = "pinned"
+        with zipfile.ZipFile(os.path.join(work, "Balatro-APK-Patch.zip"), "w") as z:
+            z.writestr("res/drawable-hdpi/love.png", b"icon")
+        calls = []
+
+        def _apktool(jar, args):
+            calls.append(args[0])
+            if args[0] == "d":
+                decoded = {
+                    "AndroidManifest.xml": b'android:versionCode="1" android:label="x"',
+                    "smali/org/libsdl/app/SDLActivity.smali":
+                        b".method public setOrientationBis(IIZLjava/lang/String;)V\n"
+                        b"    .locals 1\n.end method\n",
+                    "lib/arm64-v8a/liblove.so": b"xx/save/ASET/Modsxx",
+                    "lib/armeabi-v7a/liblove.so": b"yy/save/ASET/Modsyy",
+                }
+                for rel, data in decoded.items():
+                    path = os.path.join(work, args[2], *rel.split("/"))
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, "wb") as f:
+                        f.write(data)
+                return
+            tree = os.path.join(work, args[-1])
+            with zipfile.ZipFile(os.path.join(work, args[2]), "w") as z:
+                for folder, _dirs, files in os.walk(tree):
+                    for fn in sorted(files):
+                        path = os.path.join(folder, fn)
+                        z.write(path, os.path.relpath(path, tree).replace(os.sep, "/"))
+
+        build._download_many = lambda items, jobs=None: {dest: "sha-" + os.path.basename(dest)
+                                                         for _url, dest in items}
+        build._setup_jdk = lambda: None
+        build._apktool = _apktool
+        try:
+            yield calls
+        finally:
+            for name, value in saved.items():
+                setattr(build, name, value)
+            build.TOOL_SHA256.clear()
+            build.TOOL_SHA256.update(saved_pins)
+
+
+def test_apk_fast_path_survives_repeated_builds():
+    """Only the first build runs apktool; every later build that changes
+    nothing but Game.love swaps it in and re-signs, however many follow."""
+    with _apk_workspace() as calls:
+        for i in range(3):
+            with zipfile.ZipFile("Game.love", "w") as z:
+                z.writestr("main.lua", f"print({i})\n")
+            with redirect_stdout(StringIO()):
+                build.build_apk(signer="builtin")
+            with zipfile.ZipFile(build.SIGNED_APK) as z:
+                assert z.read("lib/arm64-v8a/liblove.so") == b"xx/save/game/Modsxx"
+                with zipfile.ZipFile(BytesIO(z.read("assets/game.love"))) as love:
+                    assert love.read("main.lua") == f"print({i})\n".encode()
+        assert calls == ["d", "b"], calls
+
+
+def test_bytecode_apk_is_arm64_only():
+    """A bytecode Game.love ships without the 32-bit libraries; the shared
+    unsigned APK keeps them, so a source build re-signs with them again."""
+    with _apk_workspace() as calls:
+        with zipfile.ZipFile("Game.love", "w") as z:
+            z.writestr("main.lua", b"\x1bLJ\x02\x0a")
+        for bytecode in (True, False, True):
+            out = StringIO()
+            with redirect_stdout(out):
+                build.build_apk(signer="builtin", bytecode=bytecode)
+            assert "keeping the signed APK" not in out.getvalue()
+            with zipfile.ZipFile(build.SIGNED_APK) as z:
+                names = z.namelist()
+            assert "lib/arm64-v8a/liblove.so" in names
+            assert ("lib/armeabi-v7a/liblove.so" in names) is not bytecode, names
+        with zipfile.ZipFile(build.APK_TEMPLATE) as z:
+            assert "lib/armeabi-v7a/liblove.so" in z.namelist()
+        assert calls == ["d", "b"], calls
+
+
+
+def _no_ipa(profiler=None):
+    pass
+
+
+def test_concurrent_bytecode_apk_is_arm64_only():
+    """main() --concurrent hands the APK job the same bytecode flag as a
+    sequential build, so its APK leaves out the 32-bit libraries too."""
+    names = ("_ensure_resources", "_game_love_stage", "build_ipa", "_restore_legacy_once")
+    saved = {name: getattr(build, name) for name in names}
+    saved_argv = sys.argv
+
+    def _game_love_stage(*args):
+        with zipfile.ZipFile("Game.love", "w") as z:
+            z.writestr("main.lua", b"\x1bLJ\x02\x0a")
+    with _apk_workspace():
+        build._ensure_resources = lambda cli, label: None
+        build._game_love_stage = _game_love_stage
+        build.build_ipa = _no_ipa
+        build._restore_legacy_once = lambda: None
+        sys.argv = ["build.py", "--keep-crt", "--no-readabletro", "--ios", "--concurrent",
+                    "--signer", "builtin", "--bytecode", "--luajit", sys.executable]
+        try:
+            with redirect_stdout(StringIO()):
+                build.main()
+        finally:
+            sys.argv = saved_argv
+            for name, value in saved.items():
+                setattr(build, name, value)
+        with zipfile.ZipFile(build.SIGNED_APK) as z:
+            names = z.namelist()
+        assert "lib/arm64-v8a/liblove.so" in names
+        assert not any(name.startswith("lib/armeabi-v7a/") for name in names), names
+
+
+if __name__ == "__main__":
+    run_tests(globals())
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""Tests for build.py's download manager and shared cache, against a local
+HTTP server.
+Run from the repo root: python tests/download_test.py  (or: python -m pytest tests)
+
+The server stands in for GitHub/aka.ms. It honours Range requests, and can be
+told to ignore them or to drop a connection halfway through a response, which
+covers resume, retry and verification without touching the network.
+"""
+
+import concurrent.futures
+import hashlib
+import os
+import random
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager, redirect_stdout
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import StringIO
+from socketserver import ThreadingMixIn
+
+from _support import run_tests
+import build
+
+_rng = random.Random(7)
+FILES = {
+    "/jdk.tar.gz":  bytes(_rng.getrandbits(8) for _ in range(3 * 1024 * 1024 + 17)),
+    "/apktool.jar": bytes(_rng.getrandbits(8) for _ in range(700 * 1024)),
+    "/base.apk":    bytes(_rng.getrandbits(8) for _ in range(1024 * 1024)),
+}
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.headers.get("Range")))
+            drop = self.path in server.drop_once
+            server.drop_once.discard(self.path)
+        data = FILES.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+        start = 0
+        rng = self.headers.get("Range")
+        if rng and self.path not in server.ignore_range:
+            start = int(rng[len("bytes="):].rstrip("-"))
+            if start >= len(data):
+                self.send_error(416)
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        else:
+            self.send_response(200)
+        body = data[start:]
+        self.send_header("Content-Length", "garbled" if self.path in server.bad_length else str(len(body)))
+        self.end_headers()
+        if drop:
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.connection.shutdown(2)
+            return
+        self.wfile.write(body)
+
+
+@contextmanager
+def _server(ignore_range=(), drop_once=(), bad_length=()):
+    server = _Server(("127.0.0.1", 0), _Handler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.ignore_range = set(ignore_range)
+    server.drop_once = set(drop_once)
+    server.bad_length = set(bad_length)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    work = tempfile.mkdtemp(prefix="download_test_")
+    saved = (build.DOWNLOAD_STAMP_FILE, build.DOWNLOAD_BACKOFF, build.STORE_DIR, dict(build.TOOL_SHA256))
+    build.DOWNLOAD_STAMP_FILE = os.path.join(work, "downloads.json")
+    build.DOWNLOAD_BACKOFF = 0
+    build.STORE_DIR = os.path.join(work, "store")
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    for path in ("/jdk.tar.gz", "/apktool.jar"):
+        build.TOOL_SHA256[base + path] = hashlib.sha256(FILES[path]).hexdigest()
+    try:
+        yield server, base, work
+    finally:
+        build.DOWNLOAD_STAMP_FILE, build.DOWNLOAD_BACKOFF, build.STORE_DIR = saved[:3]
+        build.TOOL_SHA256.clear()
+        build.TOOL_SHA256.update(saved[3])
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_concurrent_download():
+    with _server() as (server, base, work):
+        items = [(base + p, os.path.join(work, p[1:])) for p in FILES]
+        with redirect_stdout(StringIO()):
+            digests = build._download_many(items)
+        for url, dest in items:
+            data = FILES[url[len(base):]]
+            assert _read(dest) == data
+            assert digests[dest] == hashlib.sha256(data).hexdigest()
+            assert not os.path.exists(dest + ".part")
+
+
+def test_already_downloaded_not_refetched():
+    with _server() as (server, base, work):
+        items = [(base + p, os.path.join(work, p[1:])) for p in FILES]
+        with redirect_stdout(StringIO()):
+            first = build._download_many(items)
+            count = len(server.requests)
+            second = build._download_many(items)
+        assert first == second
+        assert len(server.requests) == count
+
+
+def test_download_spans():
+    with _server() as (server, base, work):
+        items = [(base + p, os.path.join(work, p[1:])) for p in FILES]
+        profiler = build.BuildProfiler()
+        with redirect_stdout(StringIO()):
+            with profiler.step("Download tools"):
+                build._download_many(items)
+            with profiler.step("Download again"):
+                build._download_many(items)
+        spans = {span["name"]: span for span in profiler.spans}
+        first, again = spans["Download tools"], spans["Download again"]
+        for path, data in FILES.items():
+            fetch = spans[f"download {path[1:]}"]
+            assert fetch["parent"] == first["id"] and fetch["args"] == {"url": base + path}
+            if fetch["written"] is not None:
+                assert fetch["written"] >= len(data)
+            assert spans[f"verify {path[1:]}"]["parent"] == again["id"]
+
+
+def _stamp_files(stamp_file, work, job):
+    build.DOWNLOAD_STAMP_FILE = stamp_file
+    for i in range(25):
+        path = os.path.join(work, f"{job}-{i}")
+        with open(path, "w") as f:
+            f.write(path)
+        build._save_download_stamps({path: ["url", 0, 0, "sha"]})
+
+
+def test_concurrent_stamp_writers_all_kept():
+    with _server() as (server, base, work):
+        with concurrent.futures.ProcessPoolExecutor(max_workers=4) as pool:
+            list(pool.map(_stamp_files, [build.DOWNLOAD_STAMP_FILE] * 4, [work] * 4, range(4)))
+        stamps = build._load_download_stamps()
+        assert len(stamps) == 100
+
+
+def test_resume_partial_file():
+    with _server() as (server, base, work):
+        dest = os.path.join(work, "jdk.tar.gz")
+        data = FILES["/jdk.tar.gz"]
+        with open(dest + ".part", "wb") as f:
+            f.write(data[:1000000])
+        with redirect_stdout(StringIO()):
+            build._download(base + "/jdk.tar.gz", dest)
+        assert _read(dest) == data
+        assert server.requests == [("/jdk.tar.gz", "bytes=1000000-")]
+
+
+def test_unpinned_part_file_restarts():
+    # base.apk has no pinned hash, so a .part from an older upstream build
+    # could be spliced onto a newer file with nothing to catch it.
+    with _server() as (server, base, work):
+        dest = os.path.join(work, "base.apk")
+        with open(dest + ".part", "wb") as f:
+            f.write(b"left over from an older build" * 100)
+        with redirect_stdout(StringIO()):
+            build._download(base + "/base.apk", dest)
+        assert _read(dest) == FILES["/base.apk"]
+        assert server.requests == [("/base.apk", None)]
+
+
+def test_malformed_response_fails_cleanly():
+    with _server(bad_length={"/base.apk"}) as (server, base, work):
+        out = StringIO()
+        with redirect_stdout(out):
+            try:
+                build._download(base + "/base.apk", os.path.join(work, "base.apk"))
+            except SystemExit as exc:
+                assert exc.code == 1
+            else:
+                raise AssertionError("a malformed response was accepted")
+        assert "could not download" in out.getvalue()
+
+
+def test_complete_part_file_is_kept():
+    # An earlier run finished the transfer but died before the rename; the
+    # server answers 416 and the .part verifies as the whole file.
+    with _server() as (server, base, work):
+        dest = os.path.join(work, "apktool.jar")
+        with open(dest + ".part", "wb") as f:
+            f.write(FILES["/apktool.jar"])
+        with redirect_stdout(StringIO()):
+            build._download(base + "/apktool.jar", dest)
+        assert _read(dest) == FILES["/apktool.jar"]
+        assert len(server.requests) == 1
+
+
+def test_range_ignored_restarts():
+    with _server(ignore_range={"/apktool.jar"}) as (server, base, work):
+        dest = os.path.join(work, "apktool.jar")
+        with open(dest + ".part", "wb") as f:
+            f.write(FILES["/apktool.jar"][:5000])
+        with redirect_stdout(StringIO()):
+            build._download(base + "/apktool.jar", dest)
+        assert _read(dest) == FILES["/apktool.jar"]
+
+
+def test_dropped_connection_resumes():
+    with _server(drop_once={"/jdk.tar.gz"}) as (server, base, work):
+        dest = os.path.join(work, "jdk.tar.gz")
+        digest = build._fetch(base + "/jdk.tar.gz", dest, build.TOOL_SHA256[base + "/jdk.tar.gz"])
+        assert _read(dest) == FILES["/jdk.tar.gz"]
+        assert digest == hashlib.sha256(FILES["/jdk.tar.gz"]).hexdigest()
+        assert len(server.requests) == 2 and server.requests[1][1] is not None
+
+
+def test_hash_mismatch_rejected():
+    with _server() as (server, base, work):
+        dest = os.path.join(work, "base.apk")
+        try:
+            build._fetch(base + "/base.apk", dest, "0" * 64)
+        except build.DownloadError as exc:
+            assert "SHA-256 mismatch" in str(exc)
+        else:
+            raise AssertionError("mismatch was accepted")
+        assert not os.path.exists(dest) and not os.path.exists(dest + ".part")
+
+
+def test_missing_file_is_not_retried():
+    with _server() as (server, base, work):
+        try:
+            build._fetch(base + "/nope.zip", os.path.join(work, "nope.zip"))
+        except build.DownloadError as exc:
+            assert "404" in str(exc)
+        else:
+            raise AssertionError("404 was accepted")
+        assert len(server.requests) == 1
+
+
+def test_second_checkout_served_from_cache():
+    with _server() as (server, base, work):
+        items = [(base + p, os.path.join(work, "a", p[1:])) for p in FILES]
+        os.makedirs(os.path.join(work, "a"))
+        with redirect_stdout(StringIO()):
+            first = build._download_many(items)
+        count = len(server.requests)
+
+        # Another checkout: empty workdir, own stamp file, same store.
+        os.makedirs(os.path.join(work, "b"))
+        build.DOWNLOAD_STAMP_FILE = os.path.join(work, "b", "downloads.json")
+        other = [(url, dest.replace(os.sep + "a" + os.sep, os.sep + "b" + os.sep)) for url, dest in items]
+        with redirect_stdout(StringIO()):
+            second = build._download_many(other)
+        assert len(server.requests) == count
+        for (_url, a), (_url2, b) in zip(items, other):
+            assert first[a] == second[b] and _read(a) == _read(b)
+            if hasattr(os, "link"):
+                assert os.stat(b).st_ino == os.stat(build._store_object(second[b])).st_ino
+
+
+def test_corrupt_cache_object_refetched():
+    with _server() as (server, base, work):
+        url, data = base + "/apktool.jar", FILES["/apktool.jar"]
+        with redirect_stdout(StringIO()):
+            sha = build._download(url, os.path.join(work, "a.jar"))
+        obj = build._store_object(sha)
+        os.remove(os.path.join(work, "a.jar"))       # drop the link so only the object changes
+        with open(obj, "r+b") as f:
+            f.write(b"tampered")
+        out = StringIO()
+        with redirect_stdout(out):
+            build._download(url, os.path.join(work, "b.jar"))
+        assert "corrupt" in out.getvalue()
+        assert _read(os.path.join(work, "b.jar")) == data
+        assert len(server.requests) == 2
+        assert _read(obj) == data
+
+
+def test_bad_cache_max_falls_back():
+    saved = os.environ.get("BALATRO_PORTRAIT_CACHE_MAX")
+    os.environ["BALATRO_PORTRAIT_CACHE_MAX"] = "lots"
+    try:
+        with redirect_stdout(StringIO()) as out:
+            assert build._store_max_bytes() == 4 << 30
+        assert "BALATRO_PORTRAIT_CACHE_MAX" in out.getvalue()
+    finally:
+        if saved is None:
+            del os.environ["BALATRO_PORTRAIT_CACHE_MAX"]
+        else:
+            os.environ["BALATRO_PORTRAIT_CACHE_MAX"] = saved
+
+
+def test_unpinned_ref_expires():
+    with _server() as (server, base, work):
+        dest = os.path.join(work, "base.apk")
+        with redirect_stdout(StringIO()):
+            build._download(base + "/base.apk", dest)
+            os.remove(dest)
+            build._download(base + "/base.apk", dest)
+            assert len(server.requests) == 1
+            ttl, build.UNPINNED_URL_TTL = build.UNPINNED_URL_TTL, -1
+            try:
+                os.remove(dest)
+                build._download(base + "/base.apk", dest)
+            finally:
+                build.UNPINNED_URL_TTL = ttl
+        assert len(server.requests) == 2
+
+
+def test_eviction_is_lru_and_capped():
+    with _server() as (server, base, work):
+        blobs = {}
+        for i, name in enumerate(("old", "mid", "new")):
+            path = os.path.join(work, name)
+            with open(path, "wb") as f:
+                f.write(bytes([i]) * 1000)
+            blobs[name] = hashlib.sha256(bytes([i]) * 1000).hexdigest()
+            build._store_put(path, blobs[name])
+            used = build._store_object(blobs[name]) + ".used"
+            os.utime(used, (1_700_000_000 + i, 1_700_000_000 + i))
+        build._store_get(blobs["old"])          # touching it makes "mid" the oldest
+        build._store_evict(limit=2000)
+        assert build._store_get(blobs["mid"]) is None
+        assert build._store_get(blobs["old"]) and build._store_get(blobs["new"])
+
+
+def test_concurrent_inserts():
+    with _server() as (server, base, work):
+        path = os.path.join(work, "blob")
+        with open(path, "wb") as f:
+            f.write(FILES["/base.apk"])
+        sha = hashlib.sha256(FILES["/base.apk"]).hexdigest()
+        threads = [threading.Thread(target=build._store_put, args=(path, sha, "k")) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert _read(build._store_object(sha)) == FILES["/base.apk"]
+        assert build._store_ref("k") == sha
+        leftovers = [n for n in os.listdir(os.path.dirname(build._store_object(sha))) if n.endswith(".tmp")]
+        assert not leftovers
+
+
+if __name__ == "__main__":
+    run_tests(globals())
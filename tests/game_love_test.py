@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""Packaging tests for build.py's Game.love writer.
+Run from the repo root: python tests/game_love_test.py  (or: python -m pytest tests)
+
+The invariants under test: the archive is a valid zip, compressing on a
+thread pool yields the same bytes as a serial run, and an incremental
+rebuild (unchanged entries copied raw from the previous Game.love) yields
+the same bytes as a full rebuild from scratch, and a reproducible build
+depends only on file contents, not on mtimes, modes or creation order.
+When luajit is on PATH, the bytecode stage is checked too, and its
+cold-start load time is measured against source on the repo's own src/ Lua.
+"""
+
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import zipfile
+from contextlib import contextmanager, redirect_stdout
+from io import BytesIO, StringIO
+
+from _support import REPO_ROOT, checkout, run_tests, skip
+import build
+
+
+def _fixture_tree():
+    """A throwaway checkout: src/ with Lua, a CRLF file, and binary assets."""
+    rng = random.Random(1234)
+    files = {
+        "main.lua": b"-- main\nprint('hi')\n" * 200,
+        "conf.lua": b"function love.conf(t)\r\n  t.window = nil\r\nend\r\n",
+        "functions/misc.lua": b"return {}\n" * 50,
+        "resources/textures/2x/blob.png": bytes(rng.getrandbits(8) for _ in range(64 * 1024)),
+        "resources/sounds/quiet.ogg": bytes(48 * 1024),
+    }
+    return checkout("game_love_test_", files, mtime=1_700_000_000)
+
+
+def _build(**kwargs):
+    with redirect_stdout(StringIO()):
+        build.build_game_love(force=True, **kwargs)
+    with open("Game.love", "rb") as f:
+        return f.read()
+
+
+def _luajit():
+    """luajit from PATH if it dumps bytecode the target loads, else None."""
+    luajit = build._find_luajit()
+    try:
+        return luajit and build._luajit_target(luajit) and luajit
+    except RuntimeError:
+        return None
+
+
+def _clean():
+    for path in ("Game.love", build.CACHE_FILE):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def test_archive_is_valid():
+    with _fixture_tree():
+        _build(jobs=2)
+        with zipfile.ZipFile("Game.love") as z:
+            assert z.testzip() is None
+            assert z.read("conf.lua") == b"function love.conf(t)\n  t.window = nil\nend\n"
+            assert z.read("resources/sounds/quiet.ogg") == bytes(48 * 1024)
+
+
+def test_parallel_matches_serial():
+    with _fixture_tree():
+        serial = _build(jobs=1)
+        _clean()
+        parallel = _build(jobs=4)
+        assert serial == parallel
+
+
+def test_incremental_matches_full_rebuild():
+    with _fixture_tree():
+        _build(jobs=2)
+        with open(os.path.join("src", "main.lua"), "ab") as f:
+            f.write(b"-- edited\n")
+        os.utime(os.path.join("src", "main.lua"), (1_700_000_100, 1_700_000_100))
+        incremental = _build(jobs=2)
+        _clean()
+        full = _build(jobs=2)
+        assert incremental == full
+        with zipfile.ZipFile("Game.love") as z:
+            assert z.read("main.lua").endswith(b"-- edited\n")
+
+
+def test_failed_build_leaves_no_temp_file():
+    with _fixture_tree():
+        before = _build()
+        pack = build._pack_love_entries
+
+        def _fail(*args):
+            raise OSError("disk full")
+        build._pack_love_entries = _fail
+        try:
+            _build()
+        except OSError:
+            pass
+        else:
+            raise AssertionError("the failing build succeeded")
+        finally:
+            build._pack_love_entries = pack
+        assert not os.path.exists("Game.love.tmp")
+        with open("Game.love", "rb") as f:
+            assert f.read() == before
+
+
+def test_unreadable_source_never_indexed():
+    with _fixture_tree():
+        gone = os.path.join("src", "main.lua")
+        locked = os.path.join("src", "conf.lua")
+        real = build._file_hash
+
+        def _file_hash(path):
+            if path == gone:
+                raise FileNotFoundError(path)
+            if path == locked:
+                raise PermissionError(path)
+            return real(path)
+        build._file_hash = _file_hash
+        try:
+            try:
+                build._fingerprint_files(["src"], {})
+            except PermissionError:
+                pass
+            else:
+                raise AssertionError("an unreadable file was fingerprinted")
+            os.remove(locked)
+            current, index = build._fingerprint_files(["src"], {})
+        finally:
+            build._file_hash = real
+        assert gone not in current and gone not in index
+        assert all(digest for digest in current.values())
+
+
+def test_legacy_backups_restored_once():
+    with _fixture_tree():
+        with open(os.path.join("src", "main.lua"), "rb") as f:
+            main = f.read()
+        backups = {"game.lua": b"-- original game\n", "functions/misc_functions.lua": b"-- original misc\n"}
+        for rel, data in backups.items():
+            with open(os.path.join("src", *rel.split("/")) + ".bak", "wb") as f:
+                f.write(data)
+        with open(os.path.join("src", "main.lua.bak"), "wb") as f:
+            f.write(b"-- the user's own backup\n")
+        with redirect_stdout(StringIO()):
+            build._restore_legacy_once()
+        with open(os.path.join("src", "game.lua"), "rb") as f:
+            assert f.read() == backups["game.lua"]
+        with open(os.path.join("src", "functions", "misc_functions.lua"), "rb") as f:
+            assert f.read() == backups["functions/misc_functions.lua"]
+        assert os.path.exists(os.path.join("src", "main.lua.bak"))
+        with open(os.path.join("src", "main.lua"), "rb") as f:
+            assert f.read() == main
+        # Recorded in the build cache, and kept there by later builds.
+        _build()
+        with open(os.path.join("src", "game.lua.bak"), "wb") as f:
+            f.write(b"-- left by something else\n")
+        with redirect_stdout(StringIO()):
+            build._restore_legacy_once()
+        assert os.path.exists(os.path.join("src", "game.lua.bak"))
+
+
+def test_bytecode_falls_back_per_file():
+    luajit = _luajit()
+    if not luajit:
+        skip("no luajit on PATH that dumps loadable bytecode")
+    with _fixture_tree():
+        with open(os.path.join("src", "broken.lua"), "wb") as f:
+            f.write(b"return 1 +\n")
+        for _ in range(2):      # the second, forced build reuses every entry
+            _build(jobs=2, luajit=luajit)
+            with zipfile.ZipFile("Game.love") as z:
+                assert z.read("main.lua").startswith(b"\x1bLJ")
+                assert z.read("conf.lua").startswith(b"\x1bLJ")
+                assert z.read("broken.lua") == b"return 1 +\n"
+            with open(build.CACHE_FILE) as f:
+                entries = json.load(f)["game_love"]["entries"]
+            assert entries["main.lua"]["form"] == "bytecode"
+            assert entries["broken.lua"]["form"] == "source"
+            assert "form" not in entries["resources/sounds/quiet.ogg"]
+
+
+@contextmanager
+def _source_date(epoch):
+    saved, build.SOURCE_DATE = build.SOURCE_DATE, epoch
+    try:
+        yield
+    finally:
+        build.SOURCE_DATE = saved
+
+
+def test_reproducible_game_love():
+    with _source_date(1_650_000_000):
+        with _fixture_tree() as root:
+            first = _build(jobs=2)
+        with _fixture_tree() as root:
+            # Same contents, different checkout: new mtimes, modes and order.
+            extra = os.path.join(root, "src", "aaa.lua")
+            for rel in ("main.lua", "resources/sounds/quiet.ogg"):
+                path = os.path.join(root, "src", *rel.split("/"))
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.remove(path)
+                with open(path, "wb") as f:
+                    f.write(data)
+                os.chmod(path, 0o755)
+            with open(extra, "wb") as f:
+                f.write(b"-- scratch\n")
+            os.remove(extra)
+            second = _build(jobs=1)
+    assert first == second
+    with zipfile.ZipFile(BytesIO(first)) as z:
+        names = z.namelist()
+        assert names == sorted(names)
+        assert {info.date_time for info in z.infolist()} == {(2022, 4, 15, 5, 20, 0)}
+
+
+def test_malformed_source_date_epoch_rejected():
+    saved = os.environ.get("SOURCE_DATE_EPOCH")
+    try:
+        os.environ["SOURCE_DATE_EPOCH"] = " 1650000000\n"
+        assert build._source_date_epoch() == 1_650_000_000
+        for value in ("yesterday", "1.5e9", "-1"):
+            os.environ["SOURCE_DATE_EPOCH"] = value
+            out = StringIO()
+            try:
+                with redirect_stdout(out):
+                    build._source_date_epoch()
+            except SystemExit as exc:
+                assert exc.code == 1
+            else:
+                raise AssertionError(f"SOURCE_DATE_EPOCH={value!r} was accepted")
+            assert "ERROR: SOURCE_DATE_EPOCH" in out.getvalue(), out.getvalue()
+    finally:
+        if saved is None:
+            os.environ.pop("SOURCE_DATE_EPOCH", None)
+        else:
+            os.environ["SOURCE_DATE_EPOCH"] = saved
+
+
+def _apktool_output(path, order, timestamp):
+    """What `apktool b` leaves behind: entry order and dates vary per run."""
+    members = {
+        "AndroidManifest.xml": b"\x03\x00\x08\x00" + bytes(300),
+        "classes.dex": bytes(range(256)) * 8,
+        "resources.arsc": b"\x02\x00\x0c\x00" + bytes(500),
+        "assets/game.love": b"placeholder",
+        "lib/arm64-v8a/liblove.so": bytes(4096),
+    }
+    with zipfile.ZipFile(path, "w") as z:
+        for name in order:
+            info = zipfile.ZipInfo(name, time.localtime(timestamp)[:6])
+            info.compress_type = zipfile.ZIP_STORED if name.endswith(".so") else zipfile.ZIP_DEFLATED
+            z.writestr(info, members[name])
+    return sorted(members)
+
+
+def test_reproducible_unsigned_apk():
+    work = tempfile.mkdtemp(prefix="game_love_test_")
+    try:
+        with _source_date(1_650_000_000):
+            with _fixture_tree():
+                game_love = _build(jobs=2)
+            outputs = []
+            for i, timestamp in enumerate((1_700_000_000, 1_710_000_000)):
+                path = os.path.join(work, f"unsigned{i}.apk")
+                order = ["classes.dex", "AndroidManifest.xml", "assets/game.love",
+                         "resources.arsc", "lib/arm64-v8a/liblove.so"]
+                names = _apktool_output(path, order[::-1] if i else order, timestamp)
+                build._normalize_zip(path)
+                build._swap_zip_entry(path, "assets/game.love", game_love)
+                with open(path, "rb") as f:
+                    outputs.append(f.read())
+        assert outputs[0] == outputs[1]
+        with zipfile.ZipFile(BytesIO(outputs[0])) as z:
+            assert z.testzip() is None and z.namelist() == names
+            assert z.read("assets/game.love") == game_love
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def test_version_code_is_stable():
+    assert build._version_code("1.0.1o-FULL") == 2_001_000_001
+    assert build._version_code("2.7") == 2_002_007_000
+    assert build._version_code() == build._version_code()
+    try:
+        build._version_code("1.1000.0")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("an out-of-range minor was accepted")
+
+
+_REQUIRE_BENCH = r"""
+-- Cold start: what require's loader does for each module, minus running it
+-- (the modules need LÖVE). The bytes are read first, so only parsing or
+-- undumping is timed.
+local dir, list = arg[1], arg[2]
+local chunks = {}
+for name in io.lines(list) do
+  local f = assert(io.open(dir .. "/" .. name, "rb"))
+  chunks[#chunks + 1] = {name, f:read("*a")}
+  f:close()
+end
+local start = os.clock()
+for _, chunk in ipairs(chunks) do
+  assert(loadstring(chunk[2], "@" .. chunk[1]))
+end
+print(string.format("%.3f", (os.clock() - start) * 1000))
+"""
+
+
+def test_bytecode_require_benchmark():
+    luajit = _luajit()
+    if not luajit:
+        skip("no luajit on PATH that dumps loadable bytecode")
+    old_cwd = os.getcwd()
+    root = tempfile.mkdtemp(prefix="game_love_bench_")
+    try:
+        shutil.copytree(os.path.join(REPO_ROOT, "src"), os.path.join(root, "src"),
+                        ignore=lambda d, names: [n for n in names if n == "smali" or n.endswith(".jkr")])
+        os.chdir(root)
+        driver = os.path.join(root, "bench.lua")
+        with open(driver, "w") as f:
+            f.write(_REQUIRE_BENCH)
+        results = {}
+        for label, compiler in (("source", None), ("bytecode", luajit)):
+            _clean()
+            _build(jobs=4, luajit=compiler)
+            out = os.path.join(root, label)
+            with zipfile.ZipFile("Game.love") as z:
+                names = sorted(n for n in z.namelist() if n.endswith(".lua"))
+                z.extractall(out, names)
+            listing = os.path.join(root, label + ".txt")
+            with open(listing, "w") as f:
+                f.write("\n".join(names) + "\n")
+            size = sum(os.path.getsize(os.path.join(out, n)) for n in names)
+            runs = []
+            for _ in range(5):      # a fresh VM per run keeps every load cold
+                result = subprocess.run([luajit, driver, out, listing], capture_output=True, text=True)
+                assert result.returncode == 0, result.stderr
+                runs.append(float(result.stdout.split()[-1]))
+            results[label] = (len(names), size, statistics.median(runs))
+        (count, src_size, src_ms), (_, bc_size, bc_ms) = results["source"], results["bytecode"]
+        print(f"# require, {count} modules: source {src_ms:.1f} ms ({src_size} bytes), "
+              f"bytecode {bc_ms:.1f} ms ({bc_size} bytes)")
+    finally:
+        os.chdir(old_cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_tests(globals())
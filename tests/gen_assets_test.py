@@ -0,0 +1,612 @@
+#!/usr/bin/env python3
+"""Tests for zygisk/gen_assets.py's header writers.
+Run from the repo root: python tests/gen_assets_test.py  (or: python -m pytest tests)
+
+The generated tables are checked against the chunks they were built from,
+and, when a host C++ compiler and zlib are available, the blob header and its
+.incbin stub are compiled, linked and inflated the way module.cpp does it.
+test_lookup_microbenchmark prints find_asset() hit/miss lookups per second
+next to the linear strcmp scan it replaced, and, when luajit is on PATH,
+test_resource_install_benchmark reports the launch cost (parse time and Lua
+heap) of the resource index against the old monolithic preload, and the
+first-install time of raw-byte chunks against base64 ones.
+"""
+
+import atexit
+import base64
+import hashlib
+import json
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+from _support import load_module, run_tests, skip
+
+gen_assets = load_module("gen_assets", "zygisk", "gen_assets.py")
+
+_WORK = Path(tempfile.mkdtemp(prefix="gen_assets_test_"))
+atexit.register(shutil.rmtree, _WORK, ignore_errors=True)
+
+_rng = random.Random(5)
+FILES = {
+    "main.lua": b"-- main\nprint('hi')\n" * 40,
+    "conf.lua": b'package.preload["x"] = function(...) return "\\0\\r\\n" end\n',
+    "functions/misc.lua": bytes(range(256)) * 3,
+    "empty.lua": b"",
+    "noise.lua": bytes(_rng.getrandbits(8) for _ in range(4000)),
+}
+
+_PROBE = r"""
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <zlib.h>
+#include "assets_gen.h"
+
+int main(int argc, char **argv) {
+  FILE *f = fopen(argv[1], "rb");
+  static unsigned char expected[1 << 24];
+  size_t n = fread(expected, 1, sizeof expected, f);
+  fclose(f);
+  size_t total = 0;
+  int inflated = 0;
+  if (find_asset("nope.lua") != nullptr || find_asset("") != nullptr) return 4;
+  for (int i = 0; i < kAssetCount; i++) {
+    const LuaAsset &asset = kAssets[i];
+    if (find_asset(asset.name) != &asset) return 5;
+    const unsigned char *data = asset.data;
+    unsigned char *out = nullptr;
+    if (asset.zlen != 0) {
+      out = (unsigned char *)malloc(asset.len);
+      z_stream zs;
+      memset(&zs, 0, sizeof zs);
+      inflateInit2(&zs, -15);
+      zs.next_in = (Bytef *)asset.data;
+      zs.avail_in = (uInt)asset.zlen;
+      zs.next_out = out;
+      zs.avail_out = (uInt)asset.len;
+      if (inflate(&zs, Z_FINISH) != Z_STREAM_END || zs.total_out != asset.len) return 3;
+      inflateEnd(&zs);
+      data = out;
+      inflated++;
+    }
+    if (memcmp(data, expected + total, asset.len) != 0) return 1;
+    free(out);
+    total += asset.len;
+  }
+  printf("%d %d %zu\n", kAssetCount, inflated, total);
+  return total == n ? 0 : 2;
+}
+"""
+
+_BENCH = r"""
+#include <chrono>
+#include <cstdio>
+#include "assets_gen.h"
+
+static const LuaAsset *linear(const char *name) {
+  for (int i = 0; i < kAssetCount; i++)
+    if (strcmp(name, kAssets[i].name) == 0) return &kAssets[i];
+  return nullptr;
+}
+
+template <typename F>
+static double rate(F find, const char *const *names, int count, int expect_hit) {
+  const int rounds = 20000;
+  volatile int hits = 0;
+  auto start = std::chrono::steady_clock::now();
+  for (int r = 0; r < rounds; r++)
+    for (int i = 0; i < count; i++) hits = hits + (find(names[i]) != nullptr);
+  double secs = std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+  if (hits != (expect_hit ? rounds * count : 0)) return -1;
+  return rounds * (double)count / secs;
+}
+
+int main() {
+  const char *hit[kAssetCount];
+  for (int i = 0; i < kAssetCount; i++) hit[i] = kAssets[i].name;
+  const char *miss[] = {MISSES};
+  int misses = sizeof miss / sizeof miss[0];
+  printf("%.0f %.0f %.0f %.0f\n",
+         rate(find_asset, hit, kAssetCount, 1), rate(linear, hit, kAssetCount, 1),
+         rate(find_asset, miss, misses, 0), rate(linear, miss, misses, 0));
+  return 0;
+}
+"""
+
+
+def _table(header):
+    return [tuple([name] + [int(v) for v in values])
+            for name, *values in re.findall(r'\{"([^"]+)", kAssetBlob \+ (\d+), (\d+), (\d+)\}', header)]
+
+
+_INSTALL_DRIVER = r"""
+local index_path, chunk_dir, install_path, dump_path = ...
+local function slurp(path)
+    local f = assert(io.open(path, "rb"))
+    local data = f:read("*a")
+    f:close()
+    return data
+end
+-- The save directory: whatever the previous launch left in dump_path.
+local written, writes = {}, {}
+local previous = io.open(dump_path, "rb") and slurp(dump_path) or ""
+local pos = 1
+while pos <= #previous do
+    local path, size, body = previous:match("^([^\n]*)\n(%d+)\n()", pos)
+    written[path] = previous:sub(body, body + tonumber(size) - 1)
+    pos = body + tonumber(size)
+end
+love = {filesystem = {
+    getInfo = function(path) return written[path] and {size = #written[path]} end,
+    read = function(path) return written[path] end,
+    write = function(path, data) written[path] = data; writes[#writes + 1] = path; return true end,
+    createDirectory = function() return true end,
+    remove = function(path) written[path] = nil; return true end,
+}}
+-- Stand-in for the module's luaL_loadbufferx hook.
+local lua_loadstring = loadstring
+loadstring = function(source, name)
+    local path = name and name:match("^=portrait_embedded/(.+)$")
+    if path then source = slurp(chunk_dir .. "/" .. path) end
+    return lua_loadstring(source, name)
+end
+local index_src, install_src = slurp(index_path), slurp(install_path)
+
+-- What every launch pays: parse the preloaded index and build its table.
+-- Each full cycle halves LuaJIT's scratch buffer, so settle it before
+-- reading the heap size.
+local function settled_heap()
+    for _ = 1, 32 do collectgarbage("collect") end
+    return collectgarbage("count")
+end
+local heap = settled_heap()
+local start = os.clock()
+assert(lua_loadstring(index_src, "=conf.lua"))()
+require("portrait_embedded_files")
+local parse = os.clock() - start
+heap = settled_heap() - heap
+
+start = os.clock()
+assert(lua_loadstring(install_src, "=install"))()
+local install = os.clock() - start
+
+local out = assert(io.open(dump_path, "wb"))
+for path, data in pairs(written) do
+    out:write(path, "\n", #data, "\n", data)
+end
+out:close()
+print(string.format("%.6f %.1f %.6f", parse, heap, install))
+for _, path in ipairs(writes) do print(path) end
+"""
+
+# The decoder the generator shipped before resources were embedded as raw
+# bytes; kept only as the benchmark baseline.
+_BASE64_DECODER = r"""
+local function decode_portrait_base64(data)
+    local alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+    local values = {}
+    for i = 1, #alphabet do values[alphabet:sub(i, i)] = i - 1 end
+    data = data:gsub("%s+", "")
+    local chunks, chunk, chunk_len = {}, {}, 0
+    local function emit(byte)
+        chunk_len = chunk_len + 1
+        chunk[chunk_len] = string.char(byte)
+        if chunk_len >= 4096 then
+            chunks[#chunks + 1] = table.concat(chunk)
+            chunk, chunk_len = {}, 0
+        end
+    end
+    for i = 1, #data, 4 do
+        local c1, c2, c3, c4 = data:sub(i, i), data:sub(i + 1, i + 1), data:sub(i + 2, i + 2), data:sub(i + 3, i + 3)
+        local v1 = assert(values[c1], "invalid base64 byte 1")
+        local v2 = assert(values[c2], "invalid base64 byte 2")
+        local v3 = c3 == "=" and 0 or assert(values[c3], "invalid base64 byte 3")
+        local v4 = c4 == "=" and 0 or assert(values[c4], "invalid base64 byte 4")
+        local triple = v1 * 262144 + v2 * 4096 + v3 * 64 + v4
+        emit(math.floor(triple / 65536) % 256)
+        if c3 ~= "=" then emit(math.floor(triple / 256) % 256) end
+        if c4 ~= "=" then emit(triple % 256) end
+    end
+    if chunk_len > 0 then chunks[#chunks + 1] = table.concat(chunk) end
+    return table.concat(chunks)
+end
+"""
+
+
+def _monolithic_resource_module(name, entries):
+    """The single preload every launch parsed before the per-file chunks."""
+    parts = [f'package.preload["{name}"] = function(...)\nreturn {{\n'.encode()]
+    for key in sorted(entries):
+        data = entries[key]
+        parts.append(b'["' + key.encode() + b'"]={size=' + str(len(data)).encode()
+                     + b",magic=" + gen_assets._lua_byte_string(gen_assets._resource_magic(key, data))
+                     + b",data=" + gen_assets._lua_byte_string(data) + b"},\n")
+    parts.append(b"}\nend\n")
+    return b"".join(parts)
+
+
+def _read_dump(path):
+    data = path.read_bytes()
+    files, pos = {}, 0
+    while pos < len(data):
+        name_end = data.index(b"\n", pos)
+        size_end = data.index(b"\n", name_end + 1)
+        size = int(data[name_end + 1:size_end])
+        files[data[pos:name_end].decode()] = data[size_end + 1:size_end + 1 + size]
+        pos = size_end + 1 + size
+    return files
+
+
+def _lookup(slots, displace, name):
+    """Python mirror of the generated find_asset()."""
+    n = len(slots)
+    d = displace[gen_assets._reduce(gen_assets._fnv1a(name), n)]
+    slot = -d - 1 if d < 0 else gen_assets._reduce(gen_assets._fnv1a(name, d), n)
+    return slot if slots[slot] == name else None
+
+
+def _compiler():
+    if sys.platform == "win32":
+        return None
+    return shutil.which("c++") or shutil.which("clang++") or shutil.which("g++")
+
+
+def _unpack(blob, offset, length, zlen):
+    if zlen == 0:
+        return blob[offset:offset + length]
+    return zlib.decompress(blob[offset:offset + zlen], -15)
+
+
+def test_blob_table_matches_chunks():
+    out = _WORK / "blob" / "assets_gen.h"
+    gen_assets._write_blob(gen_assets._encode_chunks(FILES, compress=False), out)
+    blob = out.with_suffix(".bin").read_bytes()
+    table = _table(out.read_text())
+    assert sorted(row[0] for row in table) == sorted(FILES)
+    for name, offset, length, zlen in table:
+        assert zlen == 0 and blob[offset:offset + length] == FILES[name]
+    assert len(blob) == sum(len(data) for data in FILES.values())
+    assert f"kAssetCount = {len(FILES)};" in out.read_text()
+
+
+def test_compressed_chunks_round_trip():
+    out = _WORK / "deflate" / "assets_gen.h"
+    gen_assets._write_blob(gen_assets._encode_chunks(FILES, compress=True), out)
+    blob = out.with_suffix(".bin").read_bytes()
+    table = {row[0]: row[1:] for row in _table(out.read_text())}
+    for name, data in FILES.items():
+        assert table[name][1] == len(data)
+        assert _unpack(blob, *table[name]) == data
+    # Lua text shrinks; random bytes and the empty chunk are stored raw.
+    assert 0 < table["main.lua"][2] < len(FILES["main.lua"])
+    assert table["noise.lua"][2] == 0 and table["empty.lua"][2] == 0
+    assert len(blob) < sum(len(data) for data in FILES.values())
+
+
+def test_perfect_hash_places_every_name():
+    rng = random.Random(13)
+    for count in (1, 2, 3, 32, 33, 64, 257):
+        names = sorted({f"functions/{rng.getrandbits(40):x}.lua" for _ in range(count)})
+        slots, displace = gen_assets._perfect_hash(names)
+        assert sorted(slots) == names
+        for name in names:
+            assert slots[_lookup(slots, displace, name)] == name
+        assert _lookup(slots, displace, "Mods/lovely/dump/main.lua") is None
+
+
+def test_array_mode_removes_stale_blob():
+    out = _WORK / "switch" / "assets_gen.h"
+    chunks = gen_assets._encode_chunks(FILES, compress=True)
+    gen_assets._write_blob(chunks, out)
+    changed = gen_assets._write_header(chunks, out)
+    assert not out.with_suffix(".bin").exists()
+    assert set(changed) == {out, out.with_suffix(".bin"), out.with_suffix(".S")}
+    # CMake always links the stub; in array mode it defines nothing.
+    stub = out.with_suffix(".S").read_text()
+    assert ".incbin" not in stub and ".globl" not in stub
+    assert "static const unsigned char asset_0[]" in out.read_text()
+    assert gen_assets._write_header(chunks, out) == []
+    cxx = _compiler()
+    if cxx:
+        obj = out.with_suffix(".o")
+        result = subprocess.run([cxx, "-c", str(out.with_suffix(".S")), "-o", str(obj)],
+                                capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+
+
+def test_blob_links_with_host_compiler():
+    cxx = _compiler()
+    if not cxx:
+        skip("no C++ compiler on PATH")
+    out = _WORK / "link dir" / "assets_gen.h"
+    chunks = gen_assets._encode_chunks(FILES, compress=True)
+    gen_assets._write_blob(chunks, out)
+    probe = out.parent / "probe.cpp"
+    probe.write_text(_PROBE)
+    expected = out.parent / "expected.bin"
+    expected.write_bytes(b"".join(FILES[row[0]] for row in _table(out.read_text())))
+    exe = out.parent / "probe"
+    result = subprocess.run([cxx, "-I", str(out.parent), str(probe), str(out.with_suffix(".S")),
+                             "-o", str(exe), "-lz"], capture_output=True, text=True)
+    if result.returncode != 0 and "zlib.h" in result.stderr:
+        skip("zlib headers not installed")
+    assert result.returncode == 0, result.stderr
+    result = subprocess.run([str(exe), str(expected)], capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout
+    inflated = sum(1 for chunk in chunks if chunk[3])
+    assert result.stdout.split() == [str(len(FILES)), str(inflated), str(sum(len(d) for d in FILES.values()))]
+
+
+def test_lookup_microbenchmark():
+    cxx = _compiler()
+    if not cxx:
+        skip("no C++ compiler on PATH")
+    # The real chunk names, and the kind of paths Lovely loads that miss.
+    names = sorted(gen_assets._rel_of(path) for path in gen_assets.SRC_DIR.rglob("*.lua")
+                   if not gen_assets._rel_of(path).startswith("localization/"))
+    misses = [f"Mods/Steamodded/src/{stem}.lua" for stem in ("utils", "loader", "ui", "overrides")]
+    misses += ["main2.lua", "functions/button_callbacks.luac", "engine/sprite.lua.bak", "=[C]"]
+    out = _WORK / "bench" / "assets_gen.h"
+    gen_assets._write_blob(gen_assets._encode_chunks({name: b"--" for name in names}, compress=False), out)
+    source = out.parent / "bench.cpp"
+    source.write_text(_BENCH.replace("MISSES", ", ".join(f'"{name}"' for name in misses)))
+    exe = out.parent / "bench"
+    result = subprocess.run([cxx, "-O2", "-I", str(out.parent), str(source), str(out.with_suffix(".S")),
+                             "-o", str(exe)], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    started = time.perf_counter()
+    result = subprocess.run([str(exe)], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    hit, hit_linear, miss, miss_linear = (float(value) for value in result.stdout.split())
+    assert min(hit, hit_linear, miss, miss_linear) > 0, "a lookup returned the wrong asset"
+    print(f"# {len(names)} chunks, {time.perf_counter() - started:.2f}s: "
+          f"hit {hit / 1e6:.1f}M/s (linear {hit_linear / 1e6:.1f}M/s), "
+          f"miss {miss / 1e6:.1f}M/s (linear {miss_linear / 1e6:.1f}M/s)")
+
+
+def test_resource_module_round_trips_bytes():
+    data = bytes(range(256)) + b"\r\n\r\r\n\\\"\0009]]==]"
+    quoted = gen_assets._lua_byte_string(data)
+    assert b"\n" not in quoted and b"\r" not in quoted and b"\0" not in quoted
+    # Undo the escapes the way the Lua lexer does: \ddd is a decimal byte.
+    assert re.sub(rb"\\(\d{3})", lambda m: bytes([int(m.group(1))]), quoted[1:-1]) == data
+
+
+def test_resource_chunks_round_trip():
+    files = {"resources/textures/2x/a.png": b"\x89PNG\r\n\x1a\n" + bytes(range(256)),
+             "resources/fonts/b.ttf": b"OTTO\0\0\r\n"}
+    index = gen_assets._lua_resource_index("portrait_embedded_files", files)
+    chunks = gen_assets._lua_resource_chunks(files)
+    assert sorted(chunks) == sorted(gen_assets.EMBEDDED_CHUNK_PREFIX + path for path in files)
+    for path, data in files.items():
+        assert b'"' + hashlib.sha256(data).hexdigest().encode() + b'"' in index
+        chunk = chunks[gen_assets.EMBEDDED_CHUNK_PREFIX + path]
+        assert chunk.startswith(b'return "') and gen_assets._lua_byte_string(data) in chunk
+        assert gen_assets._lua_byte_string(data) not in index
+
+
+def test_resource_install_benchmark():
+    luajit = shutil.which("luajit")
+    if not luajit:
+        skip("luajit not on PATH")
+    files = gen_assets._collect_readabletro_files(True)
+    work = _WORK / "install"
+    work.mkdir()
+    install = work / "install.lua"
+    install.write_bytes(gen_assets._install_embedded_files_lua(gen_assets._resource_version(files), sorted(files)))
+    driver = work / "driver.lua"
+    driver.write_text(_INSTALL_DRIVER)
+    index = gen_assets._lua_resource_index("portrait_embedded_files", files)
+    raw_chunks = {path[len(gen_assets.EMBEDDED_CHUNK_PREFIX):]: chunk
+                  for path, chunk in gen_assets._lua_resource_chunks(files).items()}
+    b64_chunks = {path: _BASE64_DECODER.encode() + b'return decode_portrait_base64("'
+                  + base64.b64encode(data) + b'")\n' for path, data in files.items()}
+    runs = {
+        "monolithic": (_monolithic_resource_module("portrait_embedded_files", files), raw_chunks),
+        "base64": (index, b64_chunks),
+        "raw": (index, raw_chunks),
+    }
+    results = {}
+    for label, (module, chunks) in runs.items():
+        for path, chunk in chunks.items():
+            target = work / label / "chunks" / path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(chunk)
+        (work / label / "index.lua").write_bytes(module)
+        dump = work / label / "installed.dump"
+        result = subprocess.run([luajit, str(driver), str(work / label / "index.lua"), str(work / label / "chunks"),
+                                 str(install), str(dump)], capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        results[label] = [float(value) for value in result.stdout.splitlines()[0].split()]
+        installed = _read_dump(dump)
+        assert {path: data for path, data in installed.items() if path in files} == files
+    size = sum(len(data) for data in files.values())
+    print(f"# launch: monolithic preload {results['monolithic'][0] * 1000:.2f} ms, "
+          f"+{results['monolithic'][1] / 1024:.2f} MB heap; index {results['raw'][0] * 1000:.2f} ms, "
+          f"+{results['raw'][1] / 1024:.2f} MB heap")
+    print(f"# first install of {len(files)} files, {size / 1e6:.1f} MB: "
+          f"raw {results['raw'][2] * 1000:.0f} ms, base64 {results['base64'][2] * 1000:.0f} ms")
+
+def _generate(*argv):
+    saved = sys.argv
+    sys.argv = ["gen_assets.py", *argv]
+    try:
+        with redirect_stdout(StringIO()) as out:
+            gen_assets.main()
+    finally:
+        sys.argv = saved
+    return out.getvalue()
+
+
+def _mtimes(directory):
+    return {path.name: path.stat().st_mtime_ns for path in directory.iterdir()}
+
+
+def test_regeneration_leaves_outputs_alone():
+    out = _WORK / "incremental" / "assets_gen.h"
+    _generate("--out", str(out))
+    assert sorted(path.name for path in out.parent.iterdir()) == [
+        "assets_gen.S", "assets_gen.bin", "assets_gen.cache.json", "assets_gen.h", "assets_gen.stamp"]
+    before = _mtimes(out.parent)
+    assert "up to date" in _generate("--out", str(out))
+    # A forced run regenerates everything but writes nothing identical.
+    assert "(unchanged)" in _generate("--out", str(out), "--force")
+    assert _mtimes(out.parent) == before
+    # A different flag is a different input set.
+    assert "up to date" not in _generate("--out", str(out), "--compress", "off")
+    after = _mtimes(out.parent)
+    assert after["assets_gen.bin"] != before["assets_gen.bin"]
+    assert after["assets_gen.stamp"] != before["assets_gen.stamp"]
+    assert not [path for path in out.parent.iterdir() if path.name.endswith(".tmp")]
+
+
+def test_missing_output_forces_regeneration():
+    out = _WORK / "repair" / "assets_gen.h"
+    _generate("--out", str(out))
+    out.with_suffix(".bin").unlink()
+    assert "up to date" not in _generate("--out", str(out))
+    assert out.with_suffix(".bin").exists()
+
+
+def test_bytecode_chunks_fall_back_per_file():
+    luajit = shutil.which("luajit")
+    try:
+        if not luajit or not gen_assets.portrait_build._luajit_target(luajit):
+            skip("luajit not on PATH")
+    except RuntimeError:
+        skip("luajit bytecode would not load in the arm64 module")
+    work = _WORK / "bytecode"
+    work.mkdir()
+    payload = bytes(range(256)) * 4
+    files = {"main.lua": FILES["main.lua"], "broken.lua": b"return 1 +\n"}
+    files.update(gen_assets._lua_resource_chunks({"resources/blob.bin": payload}))
+    forms, rejected = gen_assets._compile_chunks(files, luajit)
+    assert forms == {"main.lua": "bytecode", "broken.lua": "source",
+                     "portrait_embedded/resources/blob.bin": "bytecode"}
+    assert list(rejected) == ["broken.lua"] and files["broken.lua"] == b"return 1 +\n"
+    # The compiled resource chunk still returns the exact bytes.
+    (work / "chunk").write_bytes(files["portrait_embedded/resources/blob.bin"])
+    (work / "expected").write_bytes(payload)
+    (work / "check.lua").write_text(
+        'local function slurp(p) local f = assert(io.open(p, "rb")) local d = f:read("*a") f:close() return d end\n'
+        'assert(assert(loadstring(slurp(arg[1])))() == slurp(arg[2]), "payload differs")\n')
+    result = subprocess.run([luajit, str(work / "check.lua"), str(work / "chunk"), str(work / "expected")],
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+    out = work / "assets_gen.h"
+    assert "as bytecode" in _generate("--out", str(out), "--bytecode", "on")
+    cache = json.loads((out.parent / "assets_gen.cache.json").read_text())
+    assert cache["forms"]["main.lua"] == "bytecode" and cache["forms"]["conf.lua"] == "bytecode"
+
+
+def _decoded(header):
+    """{name: bytes} of every chunk a generated header points at, read back
+    from the blobs its comments name."""
+    text = header.read_text()
+    blobs = {symbol: (header.parent / path).read_bytes() for path, symbol in re.findall(
+        r'// (\S+), linked by assets_gen\.S: \d+ bytes\.\nextern "C" const unsigned char (\w+)\[\]', text)}
+    return {name: _unpack(blobs[symbol], int(offset), int(length), int(zlen)) for name, symbol, offset, length, zlen
+            in re.findall(r'\{"([^"]+)", (kAssetBlob\d*) \+ (\d+), (\d+), (\d+)\}', text)}
+
+
+def test_matrix_matches_single_runs():
+    matrix = _WORK / "matrix"
+    start = time.perf_counter()
+    assert _generate("--matrix", str(matrix)).count("embedded ") == 4
+    matrix_time = time.perf_counter() - start
+    start = time.perf_counter()
+    separate = 0
+    for name, readabletro, crt_disable in gen_assets.MATRIX_VARIANTS:
+        single = _WORK / "single" / name / "assets_gen.h"
+        _generate("--readabletro", "on" if readabletro else "off", "--disable-crt", "on" if crt_disable else "off",
+                  "--out", str(single))
+        separate += single.with_suffix(".bin").stat().st_size
+    singles_time = time.perf_counter() - start
+    for name, _readabletro, _crt_disable in gen_assets.MATRIX_VARIANTS:
+        assert _decoded(matrix / name / "assets_gen.h") == _decoded(_WORK / "single" / name / "assets_gen.h")
+    on_disk = sum(path.stat().st_size for path in (matrix / "shared").iterdir())
+    on_disk += sum((matrix / name / "assets_gen.bin").stat().st_size for name, *_ in gen_assets.MATRIX_VARIANTS)
+    assert on_disk < separate
+    assert "up to date" in _generate("--matrix", str(matrix))
+    print(f"# 4 variants: matrix {matrix_time:.2f}s, separate runs {singles_time:.2f}s; "
+          f"blobs {on_disk} bytes, {separate} separately")
+
+    # A variant that links shared blobs still links and inflates like module.cpp.
+    cxx = _compiler()
+    if not cxx:
+        skip("no C++ compiler on PATH")
+    variant = matrix / "readabletro-off_crt-on"
+    (variant / "probe.cpp").write_text(_PROBE)
+    expected = variant / "expected.bin"
+    chunks = _decoded(variant / "assets_gen.h")
+    order = re.findall(r'\{"([^"]+)", kAssetBlob', (variant / "assets_gen.h").read_text())
+    expected.write_bytes(b"".join(chunks[name] for name in order))
+    result = subprocess.run([cxx, "-I", str(variant), str(variant / "probe.cpp"), str(variant / "assets_gen.S"),
+                             "-o", str(variant / "probe"), "-lz"], capture_output=True, text=True)
+    if result.returncode != 0 and "zlib.h" in result.stderr:
+        skip("zlib headers not installed")
+    assert result.returncode == 0, result.stderr
+    result = subprocess.run([str(variant / "probe"), str(expected)], capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout
+
+
+def _launch(luajit, work, files, legacy_version=None):
+    """Run one game launch's install against the save directory in work."""
+    for path, chunk in gen_assets._lua_resource_chunks(files).items():
+        target = work / "chunks" / path[len(gen_assets.EMBEDDED_CHUNK_PREFIX):]
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(chunk)
+    (work / "index.lua").write_bytes(gen_assets._lua_resource_index("portrait_embedded_files", files))
+    (work / "install.lua").write_bytes(gen_assets._install_embedded_files_lua(
+        legacy_version or gen_assets._resource_version(files), sorted(files)))
+    (work / "driver.lua").write_text(_INSTALL_DRIVER)
+    result = subprocess.run([luajit, str(work / "driver.lua"), str(work / "index.lua"), str(work / "chunks"),
+                             str(work / "install.lua"), str(work / "save.dump")], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.splitlines()[1:]
+
+
+def test_delta_install_rewrites_only_changed_files():
+    luajit = shutil.which("luajit")
+    if not luajit:
+        skip("luajit not on PATH")
+    work = _WORK / "delta"
+    work.mkdir()
+    files = {f"resources/textures/2x/t{i}.png": b"\x89PNG\r\n\x1a\n" + bytes([i]) * 500 for i in range(5)}
+    assert sorted(_launch(luajit, work, files)) == sorted([*files, "portrait_embedded_files.manifest"])
+    assert _launch(luajit, work, files) == []
+    retouched = dict(files)
+    retouched["resources/textures/2x/t3.png"] = files["resources/textures/2x/t3.png"] + b"!"
+    assert sorted(_launch(luajit, work, retouched)) == ["portrait_embedded_files.manifest",
+                                                        "resources/textures/2x/t3.png"]
+    assert _read_dump(work / "save.dump")["resources/textures/2x/t3.png"].endswith(b"!")
+
+
+def test_legacy_version_file_is_trusted_once():
+    luajit = shutil.which("luajit")
+    if not luajit:
+        skip("luajit not on PATH")
+    work = _WORK / "legacy"
+    work.mkdir()
+    files = {"resources/fonts/f.ttf": b"OTTO" + bytes(300), "resources/textures/2x/a.png": b"\x89PNG\r\n\x1a\n"}
+    # A save directory as the whole-set-version installer left it.
+    state = dict(files, **{"portrait_embedded_files.version": gen_assets._resource_version(files).encode()})
+    (work / "save.dump").write_bytes(b"".join(path.encode() + b"\n" + str(len(data)).encode() + b"\n" + data
+                                              for path, data in state.items()))
+    assert _launch(luajit, work, files) == ["portrait_embedded_files.manifest"]
+    assert "portrait_embedded_files.version" not in _read_dump(work / "save.dump")
+    assert _launch(luajit, work, files) == []
+
+
+if __name__ == "__main__":
+    run_tests(globals())
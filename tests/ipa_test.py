@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Packaging tests for build.py's IPA packer and concurrent packaging.
+Run from the repo root: python tests/ipa_test.py  (or: python -m pytest tests)
+
+The base IPA is a synthetic LOVE iOS shell. Every member other than
+Info.plist and game.love must come out with the exact compressed bytes,
+attributes and host system it went in with; the two replaced entries must
+carry the portrait orientation and the new Game.love. Concurrent packaging
+is run on two stand-in targets, one of which fails halfway.
+"""
+
+import atexit
+import os
+import plistlib
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from contextlib import redirect_stdout
+from io import StringIO
+
+from _support import run_tests
+import build
+
+_WORK = tempfile.mkdtemp(prefix="ipa_test_")
+atexit.register(shutil.rmtree, _WORK, ignore_errors=True)
+
+PLIST_ARC = "Payload/Balatro.app/Info.plist"
+LOVE_ARC  = "Payload/Balatro.app/game.love"
+
+
+def _fixture_ipa(path, with_love=False, scale=1):
+    """A LOVE shell: an executable with unix permissions, a framework, stored
+    and deflated resources, and an Info.plist to be rewritten."""
+    rng = random.Random(5)
+    members = [
+        ("Payload/Balatro.app/Balatro", bytes(rng.getrandbits(8) for _ in range(200_000 * scale)) * 2, 0o755),
+        ("Payload/Balatro.app/Frameworks/liblove.dylib", bytes(range(256)) * 2000 * scale, 0o644),
+        ("Payload/Balatro.app/Assets.car", bytes(rng.getrandbits(8) for _ in range(30_000)), 0o644),
+        (PLIST_ARC, plistlib.dumps({"CFBundleIdentifier": "org.love2d.love",
+                                    "UISupportedInterfaceOrientations": ["UIInterfaceOrientationLandscapeLeft"]}),
+         0o644),
+    ]
+    if with_love:
+        members.insert(2, (LOVE_ARC, b"stale game", 0o644))
+    with zipfile.ZipFile(path, "w") as z:
+        for name, data, mode in members:
+            info = zipfile.ZipInfo(name, (2021, 3, 4, 5, 6, 8))
+            info.create_system = 3
+            info.external_attr = (0o100000 | mode) << 16
+            info.compress_type = zipfile.ZIP_STORED if name.endswith(".car") else zipfile.ZIP_DEFLATED
+            z.writestr(info, data)
+
+
+def _game_love():
+    path = os.path.join(_WORK, "Game.love")
+    if not os.path.exists(path):
+        with zipfile.ZipFile(path, "w") as z:
+            z.writestr("main.lua", "print('portrait')\n" * 100)
+    return path
+
+
+def _pack(with_love=False):
+    base = os.path.join(_WORK, f"base{int(with_love)}.ipa")
+    out = os.path.join(_WORK, f"out{int(with_love)}.ipa")
+    _fixture_ipa(base, with_love)
+    with redirect_stdout(StringIO()):
+        build._pack_ipa(base, _game_love(), out)
+    return base, out
+
+
+def _raw(path):
+    return {entry.name: (entry.method, entry.crc, entry.external_attr, entry.create_system,
+                         entry.dostime, entry.dosdate, payload)
+            for entry, payload in build._zip_raw_members(path)}
+
+
+def test_unchanged_members_copied_raw():
+    for with_love in (False, True):
+        base, out = _pack(with_love)
+        before, after = _raw(base), _raw(out)
+        for name in before:
+            if name not in (PLIST_ARC, LOVE_ARC):
+                assert before[name] == after[name], name
+        assert after["Payload/Balatro.app/Balatro"][2] >> 16 == 0o100755
+
+
+def test_replaced_members():
+    for with_love in (False, True):
+        base, out = _pack(with_love)
+        with zipfile.ZipFile(out) as z:
+            assert z.testzip() is None
+            plist = plistlib.loads(z.read(PLIST_ARC))
+            assert plist["UISupportedInterfaceOrientations"] == ["UIInterfaceOrientationPortrait"]
+            assert plist["CFBundleVersion"] == build.MOD_VERSION
+            with open(_game_love(), "rb") as f:
+                assert z.read(LOVE_ARC) == f.read()
+            names = z.namelist()
+        with zipfile.ZipFile(base) as z:
+            expected = z.namelist() if with_love else z.namelist() + [LOVE_ARC]
+        assert names == expected
+
+
+def test_pack_benchmark():
+    """Raw copy against the old inflate/re-deflate repack of the same shell."""
+    base = os.path.join(_WORK, "bench.ipa")
+    _fixture_ipa(base, scale=8)
+    size = os.path.getsize(base)
+
+    def recompress():
+        with zipfile.ZipFile(base) as zin, build._ZipWriter(os.path.join(_WORK, "bench_old.ipa")) as zout:
+            for item in zin.infolist():
+                zout.add_raw(*build._compress_entry(item.filename, zin.read(item.filename),
+                                                    build._dos_from_tuple(item.date_time),
+                                                    item.external_attr, item.compress_type,
+                                                    item.create_system))
+
+    def raw_copy():
+        with redirect_stdout(StringIO()):
+            build._pack_ipa(base, _game_love(), os.path.join(_WORK, "bench_new.ipa"))
+
+    timings = {}
+    for name, fn in (("recompress", recompress), ("raw copy", raw_copy)):
+        best = None
+        for _ in range(3):
+            t0 = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best
+    print(f"# IPA pack, {size / 1_048_576:.1f} MB shell: recompress {timings['recompress'] * 1000:.0f} ms, "
+          f"raw copy {timings['raw copy'] * 1000:.0f} ms")
+    assert timings["raw copy"] < timings["recompress"]
+
+
+def _target_ok(profiler, path):
+    with profiler.step("Pack"):
+        for i in range(20):
+            print(f"  ok {i}")
+            time.sleep(0.002)
+        with open(path + ".tmp", "wb") as f:
+            f.write(b"complete" * 1000)
+        os.replace(path + ".tmp", path)
+
+
+def _target_broken(profiler, path):
+    with profiler.step("Unpack"):
+        for i in range(20):
+            print(f"  broken {i}")
+            time.sleep(0.002)
+        with open(path + ".tmp", "wb") as f:
+            f.write(b"half")
+        print("  ERROR: apktool failed.")
+        sys.exit(1)
+
+
+def test_concurrent_jobs_isolated():
+    good, bad = os.path.join(_WORK, "good.out"), os.path.join(_WORK, "bad.out")
+    out = StringIO()
+    with redirect_stdout(out):
+        try:
+            build._package_concurrently([("OK", _target_ok, {"path": good}),
+                                         ("BAD", _target_broken, {"path": bad})])
+        except SystemExit as exc:
+            assert exc.code == 1
+        else:
+            raise AssertionError("a failed job did not fail the build")
+    lines = out.getvalue().splitlines()
+    ok_at = lines.index(next(line for line in lines if line.startswith("── OK ")))
+    bad_at = lines.index(next(line for line in lines if line.startswith("── BAD ")))
+    assert lines[ok_at + 1:bad_at] == [f"  ok {i}" for i in range(20)] + [""]
+    assert lines[bad_at + 1:bad_at + 22] == [f"  broken {i}" for i in range(20)] + ["  ERROR: apktool failed."]
+    assert any(line.lstrip().startswith("OK: Pack") for line in lines)
+    assert any(line.lstrip().startswith("BAD: Unpack") for line in lines)
+    assert "BAD packaging failed" in out.getvalue()
+    with open(good, "rb") as f:
+        assert f.read() == b"complete" * 1000
+    assert not os.path.exists(bad)
+
+
+if __name__ == "__main__":
+    run_tests(globals())
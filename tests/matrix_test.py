@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Packaging tests for build.py's --matrix mode.
+Run from the repo root: python tests/matrix_test.py  (or: python -m pytest tests)
+
+The shared stages that need the network and apktool are not run; the tests
+start from a prepared unsigned APK instead. What is checked: matrix files
+are validated and named, each variant's Game.love is byte-identical to a
+single build with the same options, and each variant ends up as its own
+signed APK carrying its own Game.love.
+"""
+
+import atexit
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from contextlib import redirect_stdout
+from io import StringIO
+
+from _support import checkout, load_module, run_tests
+import build
+
+apksign = load_module("apksign", "tools", "apksign.py")
+
+_KEYS = tempfile.mkdtemp(prefix="matrix_test_keys_")
+atexit.register(shutil.rmtree, _KEYS, ignore_errors=True)
+
+
+def _fixture_tree():
+    """A throwaway checkout whose CRT shader and game.lua carry the patch
+    targets, so CRT on and off produce different archives."""
+    files = {
+        "main.lua": b"-- main\nprint('hi')\n" * 50,
+        "game.lua": f"function Game:draw()\n  {build.CRT_PATCH_ORIGINAL}\n  end\nend\n".encode(),
+        "resources/shaders/CRT.fs": build.CRT_MASK_ORIGINAL.encode(),
+        "resources/sounds/quiet.ogg": bytes(8 * 1024),
+    }
+    return checkout("matrix_test_", files, mtime=1_700_000_000)
+
+
+def _load(variants):
+    with open("matrix.json", "w") as f:
+        json.dump(variants, f)
+    with redirect_stdout(StringIO()):
+        return build._load_matrix("matrix.json")
+
+
+def _rejected(variants):
+    try:
+        _load(variants)
+    except SystemExit as exc:
+        return exc.code == 1
+    return False
+
+
+def test_matrix_file_validated():
+    with _fixture_tree():
+        variants = _load([{"disable_crt": True}, {"readabletro": False, "steamodded": True, "name": "mods"}])
+        assert [v["name"] for v in variants] == ["readabletro-on_crt-off", "mods"]
+        assert variants[1]["steamodded"] == "latest" and not variants[1]["readabletro"]
+        assert _load([{}])[0]["name"] == "readabletro-on_crt-on"
+        assert _rejected([])
+        assert _rejected([{"disable_crt": True}, {"disable_crt": True}])
+        assert _rejected([{"name": "../escape"}])
+        assert _rejected([{"crt": True}])
+
+
+def test_variants_match_single_builds():
+    with _fixture_tree():
+        variants = _load([{"disable_crt": False, "readabletro": False},
+                          {"disable_crt": True, "readabletro": False}])
+        out = StringIO()
+        with redirect_stdout(out):
+            build.build_matrix(variants, skip_apk=True, jobs=2)
+        built = {}
+        for variant in variants:
+            with open(os.path.join(build.MATRIX_DIR, variant["name"], "Game.love"), "rb") as f:
+                built[variant["name"]] = f.read()
+            with redirect_stdout(StringIO()):
+                build.build_game_love(apply_crt=variant["disable_crt"], force=True)
+            with open("Game.love", "rb") as f:
+                assert f.read() == built[variant["name"]], variant["name"]
+        assert len(set(built.values())) == 2
+        summary = out.getvalue()
+        assert "Variant" in summary and all(v["name"] in summary for v in variants)
+
+
+def test_variant_apks_signed_separately():
+    with _fixture_tree() as root:
+        template = os.path.join(root, "balatro.apk")
+        with zipfile.ZipFile(template, "w") as z:
+            z.writestr("AndroidManifest.xml", b"\x03\x00\x08\x00" + bytes(200))
+            z.writestr("classes.dex", bytes(range(256)) * 4, compress_type=zipfile.ZIP_DEFLATED)
+            z.writestr("assets/game.love", b"")
+        variants = _load([{"disable_crt": False, "readabletro": False},
+                          {"disable_crt": True, "readabletro": False}])
+        saved, build.SIGNER_KEY = build.SIGNER_KEY, os.path.join(_KEYS, "debug-signer.pem")
+        try:
+            with redirect_stdout(StringIO()):
+                for variant in variants:
+                    build._build_variant(build.BuildProfiler(), variant, template, None,
+                                         None, None, None, 1)
+        finally:
+            build.SIGNER_KEY = saved
+        for variant in variants:
+            apk = build._matrix_artifact(variant["name"], ".apk")
+            assert apksign.verify(apk)["v2"]
+            with open(os.path.join(build.MATRIX_DIR, variant["name"], "Game.love"), "rb") as f:
+                game_love = f.read()
+            with zipfile.ZipFile(apk) as z:
+                assert z.read("assets/game.love") == game_love
+            assert not os.path.exists(os.path.join(build.MATRIX_DIR, variant["name"], "balatro.apk"))
+        with zipfile.ZipFile(template) as z:
+            assert z.read("assets/game.love") == b""
+
+
+if __name__ == "__main__":
+    run_tests(globals())
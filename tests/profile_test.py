@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Tests for build.py's span profiler and its --profile-out export.
+Run from the repo root: python tests/profile_test.py  (or: python -m pytest tests)
+
+Spans must nest under the step that was open when a helper opened them, on
+any thread and across worker processes, and carry the CPU time, peak RSS
+and I/O of the subprocesses they waited for. The export must load as JSON
+and as a Chrome trace_event file whose events nest the same way.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from contextlib import redirect_stdout
+from io import StringIO
+
+from _support import MINIMAL_SRC, checkout, run_tests
+import build
+
+
+def _by_name(profiler):
+    return {span["name"]: span for span in profiler.spans}
+
+
+def test_spans_nest_across_helpers():
+    with build._span("outside any step"):
+        pass
+    p = build.BuildProfiler()
+    with p.step("outer"):
+        with build._span("helper", detail="x") as helper:
+            parent = build._open_spans()[-1]
+
+            def _worker():
+                with build._span("on a thread", parent):
+                    pass
+            thread = threading.Thread(target=_worker)
+            thread.start()
+            thread.join()
+            helper.args["late"] = 1
+        with p.step("inner"):
+            pass
+    spans = _by_name(p)
+    assert set(spans) == {"outer", "helper", "on a thread", "inner"}
+    assert spans["outer"]["parent"] is None
+    assert spans["helper"]["parent"] == spans["outer"]["id"]
+    assert spans["inner"]["parent"] == spans["outer"]["id"]
+    assert spans["on a thread"]["parent"] == spans["helper"]["id"]
+    assert spans["on a thread"]["tid"] != spans["helper"]["tid"]
+    assert spans["helper"]["args"] == {"detail": "x", "late": 1}
+    assert p.steps == [("outer", spans["outer"]["dur"])]
+    assert not build._open_spans()
+
+
+def test_subprocess_counters():
+    """A child that burns CPU, grows to 200 MB and writes 8 MB is charged to
+    the span that waited for it."""
+    work = tempfile.mkdtemp(prefix="profile_test_io_")
+    script = ("import time\n"
+              "block = bytearray(200 * 1024 * 1024)\n"
+              "for i in range(0, len(block), 4096): block[i] = 1\n"
+              "end = time.process_time() + 0.3\n"
+              "while time.process_time() < end: pass\n"
+              "open('out.bin', 'wb').write(bytes(8 * 1024 * 1024))\n")
+    p = build.BuildProfiler()
+    try:
+        with p.step("build"):
+            build._run_checked([sys.executable, "-c", script], work, "child")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    child = _by_name(p)["child"]
+    assert child["cpu"] >= 0.25, child
+    if build.resource is not None:
+        assert child["rss"] >= 200 * 1024 * 1024, child
+    if child["written"] is not None:
+        assert child["written"] >= 8 * 1024 * 1024, child
+
+
+def _target_spans(profiler, name):
+    with profiler.step("Pack"):
+        with build._span(f"{name} helper"):
+            pass
+
+
+def test_worker_spans_absorbed():
+    p = build.BuildProfiler()
+    with redirect_stdout(StringIO()):
+        with p.step("APK + IPA"):
+            build._package_concurrently([("A", _target_spans, {"name": "a"}),
+                                         ("B", _target_spans, {"name": "b"})], p)
+    spans = _by_name(p)
+    assert len({span["id"] for span in p.spans}) == len(p.spans)
+    group = spans["APK + IPA"]
+    for label, name in (("A", "a"), ("B", "b")):
+        pack = spans[f"{label}: Pack"]
+        assert pack["parent"] == group["id"]
+        assert pack["pid"] != group["pid"]
+        assert spans[f"{name} helper"]["parent"] == pack["id"]
+    assert p.steps == [("APK + IPA", group["dur"])]
+
+
+def test_export_chrome_trace():
+    with checkout("profile_test_", MINIMAL_SRC) as root:
+        p = build.BuildProfiler()
+        with p.step("Game.love"):
+            with redirect_stdout(StringIO()):
+                build._game_love_stage(False, False, False, None, None, 1, None)
+        out = StringIO()
+        with redirect_stdout(out):
+            p.report()
+        trace_path = p.export(os.path.join(root, "out", "profile.json"))
+        assert trace_path == os.path.join(root, "out", "profile.trace.json")
+        with open(os.path.join(root, "out", "profile.json")) as f:
+            profile = json.load(f)
+        with open(trace_path) as f:
+            trace = json.load(f)
+
+    names = [span["name"] for span in profile["spans"]]
+    for name in ("Game.love", "fingerprint sources", "stage overlay", "stage game_love",
+                 "scan sources", "plan entries", "pack entries"):
+        assert name in names, name
+        assert name in out.getvalue(), name
+    spans = {span["name"]: span for span in profile["spans"]}
+    assert spans["stage game_love"]["args"] == {"verdict": "ran", "reason": "no previous run"}
+    assert spans["pack entries"]["parent"] == spans["stage game_love"]["id"]
+
+    events = {e["name"]: e for e in trace["traceEvents"] if e["ph"] == "X"}
+    assert set(events) == set(names)
+    assert any(e["ph"] == "M" and e["name"] == "process_name" for e in trace["traceEvents"])
+    outer, inner = events["Game.love"], events["pack entries"]
+    assert outer["ts"] <= inner["ts"] and inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"] + 1
+    assert "cpu_s" in inner["args"] and "peak_rss" in inner["args"]
+
+
+if __name__ == "__main__":
+    run_tests(globals())
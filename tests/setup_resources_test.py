@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Tests for build.py's resource extraction (step 1).
+Run from the repo root: python tests/setup_resources_test.py  (or: python -m pytest tests)
+
+Only resources/ and localization/ may be written, a re-run must leave
+unchanged files alone (mtime included), and files the game no longer ships
+must disappear.
+"""
+
+import os
+import zipfile
+
+from _support import checkout, run_tests
+import build
+
+
+def _game(path, files, prefix=""):
+    # Balatro.exe is a PE with the game zip appended; zipfile copes with the stub.
+    with open(path, "wb") as f:
+        f.write(b"MZ" + bytes(4094))
+    with zipfile.ZipFile(path, "a", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("main.lua", b"-- not extracted\n")
+        z.writestr("lib/arm64-v8a/liblove.so", b"\x7fELF")
+        for rel, data in files.items():
+            z.writestr(prefix + rel, data)
+
+
+FILES = {
+    "resources/textures/1x/jokers.png": b"\x89PNG" + bytes(5000),
+    "resources/sounds/chip.ogg": b"OggS" + bytes(3000),
+    "localization/en-us.lua": b"return {}\n",
+}
+
+
+def test_only_resource_folders_extracted():
+    with checkout("setup_resources_test_") as root:
+        game = os.path.join(root, "Balatro.exe")
+        _game(game, FILES)
+        src = os.path.join(root, "src")
+        written, written_bytes, skipped, _sb, removed = build._extract_resources(game, src)
+        assert (written, skipped, removed) == (3, 0, 0)
+        assert written_bytes == sum(len(d) for d in FILES.values())
+        assert sorted(os.listdir(src)) == ["localization", "resources"]
+        with open(os.path.join(src, "resources", "sounds", "chip.ogg"), "rb") as f:
+            assert f.read() == FILES["resources/sounds/chip.ogg"]
+
+
+def test_rerun_touches_only_changed_files():
+    with checkout("setup_resources_test_") as root:
+        game = os.path.join(root, "Balatro.exe")
+        src = os.path.join(root, "src")
+        _game(game, FILES)
+        build._extract_resources(game, src)
+        keep = os.path.join(src, "localization", "en-us.lua")
+        os.utime(keep, (1_700_000_000, 1_700_000_000))
+
+        updated = dict(FILES)
+        updated["resources/sounds/chip.ogg"] = b"OggS" + bytes(2999) + b"!"
+        del updated["resources/textures/1x/jokers.png"]
+        _game(game, updated)
+        written, _wb, skipped, _sb, removed = build._extract_resources(game, src)
+        assert (written, skipped, removed) == (1, 1, 1)
+        assert os.stat(keep).st_mtime == 1_700_000_000
+        assert not os.path.exists(os.path.join(src, "resources", "textures", "1x", "jokers.png"))
+
+
+def test_android_layout():
+    with checkout("setup_resources_test_") as root:
+        game = os.path.join(root, "base.apk")
+        _game(game, FILES, prefix="assets/")
+        src = os.path.join(root, "src")
+        written, _wb, _s, _sb, _r = build._extract_resources(game, src)
+        assert written == 3
+        assert os.path.isfile(os.path.join(src, "localization", "en-us.lua"))
+
+
+def test_missing_folder():
+    with checkout("setup_resources_test_") as root:
+        game = os.path.join(root, "Balatro.exe")
+        _game(game, {"resources/a.png": b"x"})
+        try:
+            build._extract_resources(game, os.path.join(root, "src"))
+        except KeyError as exc:
+            assert exc.args[0] == "localization"
+        else:
+            raise AssertionError("missing localization/ was accepted")
+
+
+if __name__ == "__main__":
+    run_tests(globals())
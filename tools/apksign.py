@@ -0,0 +1,843 @@
+#!/usr/bin/env python3
+"""
+apksign.py - zipalign and sign an APK without a JVM.
+
+build.py used to sign through uber-apk-signer (desktop) or Termux's apksigner,
+which costs a JVM launch per build and, on Termux, silently dropped alignment
+whenever zipalign was missing from the repo. This does both jobs in plain
+Python:
+
+  * zipalign: every stored entry's data starts on a 4-byte boundary, and stored
+    native libraries (lib/*.so) on a 4096-byte page boundary, the same as
+    `zipalign -p 4`. Padding goes into a 0xd935 extra field, as apksigner does.
+  * v1 (JAR), v2 and v3 APK signatures with an RSA-2048 / SHA-256 debug key.
+    v1 covers Android 5-6, v2 covers 7-8.1, v3 covers 9+.
+
+The key lives in a PEM file holding an unencrypted RSA private key (PKCS#1 or
+PKCS#8) and its certificate. If the file does not exist, a self-signed
+"CN=Android Debug" key is generated and saved there.
+
+Usage:
+    python tools/apksign.py sign IN.apk OUT.apk [--key debug-signer.pem]
+    python tools/apksign.py align IN.apk OUT.apk
+    python tools/apksign.py verify APK
+"""
+
+import argparse
+import base64
+import datetime
+import hashlib
+import os
+import secrets
+import struct
+import sys
+import zlib
+from contextlib import contextmanager
+
+# ─────────────────────────────────────────────────────────────────────────────
+# DER
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _der_len(n):
+    if n < 0x80:
+        return bytes([n])
+    raw = n.to_bytes((n.bit_length() + 7) // 8, "big")
+    return bytes([0x80 | len(raw)]) + raw
+
+
+def _tlv(tag, body):
+    return bytes([tag]) + _der_len(len(body)) + body
+
+
+def _seq(*items):
+    return _tlv(0x30, b"".join(items))
+
+
+def _set(*items):
+    return _tlv(0x31, b"".join(sorted(items)))
+
+
+def _int(n):
+    raw = n.to_bytes(n.bit_length() // 8 + 1, "big")
+    return _tlv(0x02, raw)
+
+
+def _oid(dotted):
+    parts = [int(p) for p in dotted.split(".")]
+    body = bytearray([parts[0] * 40 + parts[1]])
+    for part in parts[2:]:
+        chunk = [part & 0x7F]
+        part >>= 7
+        while part:
+            chunk.append(0x80 | (part & 0x7F))
+            part >>= 7
+        body.extend(reversed(chunk))
+    return _tlv(0x06, bytes(body))
+
+
+def _null():
+    return b"\x05\x00"
+
+
+def _octets(data):
+    return _tlv(0x04, data)
+
+
+def _bits(data):
+    return _tlv(0x03, b"\x00" + data)
+
+
+def _explicit(n, body):
+    return _tlv(0xA0 | n, body)
+
+
+def _time(when):
+    if when.year < 2050:
+        return _tlv(0x17, when.strftime("%y%m%d%H%M%SZ").encode())
+    return _tlv(0x18, when.strftime("%Y%m%d%H%M%SZ").encode())
+
+
+def _der_read(data, pos=0):
+    """Return (tag, body_start, body_end) of the element at `pos`."""
+    tag = data[pos]
+    length = data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        count = length & 0x7F
+        length = int.from_bytes(data[pos:pos + count], "big")
+        pos += count
+    if pos + length > len(data):
+        raise ValueError("truncated DER element")
+    return tag, pos, pos + length
+
+
+def _der_children(data, start, end):
+    children = []
+    while start < end:
+        tag, body, stop = _der_read(data, start)
+        children.append((tag, start, body, stop))
+        start = stop
+    return children
+
+
+def _der_ints(data, start, end):
+    return [int.from_bytes(data[b:e], "big") for tag, _s, b, e in _der_children(data, start, end)
+            if tag == 0x02]
+
+
+OID_RSA        = _oid("1.2.840.113549.1.1.1")
+OID_SHA256_RSA = _oid("1.2.840.113549.1.1.11")
+OID_SHA256     = _oid("2.16.840.1.101.3.4.2.1")
+OID_DATA       = _oid("1.2.840.113549.1.7.1")
+OID_SIGNED     = _oid("1.2.840.113549.1.7.2")
+
+# DigestInfo prefix for SHA-256 (RFC 8017 section 9.2, note 1).
+_SHA256_DIGEST_INFO = bytes.fromhex("3031300d060960864801650304020105000420")
+
+# ─────────────────────────────────────────────────────────────────────────────
+# RSA
+# ─────────────────────────────────────────────────────────────────────────────
+
+_SMALL_PRIMES = [p for p in range(3, 2000) if all(p % d for d in range(2, int(p ** 0.5) + 1))]
+
+
+def _modinv(a, m):
+    # pow(a, -1, m) needs Python 3.8.
+    x0, x1, r0, r1 = 0, 1, m, a % m
+    while r1:
+        q = r0 // r1
+        r0, r1 = r1, r0 - q * r1
+        x0, x1 = x1, x0 - q * x1
+    if r0 != 1:
+        raise ValueError("not invertible")
+    return x0 % m
+
+
+def _is_probable_prime(n, rounds=40):
+    if any(n % p == 0 for p in _SMALL_PRIMES):
+        return n in _SMALL_PRIMES
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for _ in range(rounds):
+        a = secrets.randbelow(n - 3) + 2
+        x = pow(a, d, n)
+        if x in (1, n - 1):
+            continue
+        for _ in range(s - 1):
+            x = pow(x, 2, n)
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def _random_prime(bits, e):
+    while True:
+        candidate = secrets.randbits(bits) | (3 << (bits - 2)) | 1
+        if candidate % e != 1 and _is_probable_prime(candidate):
+            return candidate
+
+
+class RsaKey:
+    """An RSA private key. Signing uses the CRT form."""
+
+    def __init__(self, n, e, d, p, q):
+        self.n, self.e, self.d, self.p, self.q = n, e, d, p, q
+        self.dp = d % (p - 1)
+        self.dq = d % (q - 1)
+        self.qinv = _modinv(q, p)
+
+    @classmethod
+    def generate(cls, bits=2048, e=65537):
+        while True:
+            p = _random_prime(bits // 2, e)
+            q = _random_prime(bits // 2, e)
+            if p != q and (p * q).bit_length() == bits:
+                break
+        if p < q:
+            p, q = q, p
+        d = _modinv(e, (p - 1) * (q - 1))
+        return cls(p * q, e, d, p, q)
+
+    @property
+    def size(self):
+        return (self.n.bit_length() + 7) // 8
+
+    def public_key_info(self):
+        """SubjectPublicKeyInfo, DER."""
+        return _seq(_seq(OID_RSA, _null()), _bits(_seq(_int(self.n), _int(self.e))))
+
+    def to_der(self):
+        """RSAPrivateKey (PKCS#1), DER."""
+        return _seq(_int(0), _int(self.n), _int(self.e), _int(self.d), _int(self.p),
+                    _int(self.q), _int(self.dp), _int(self.dq), _int(self.qinv))
+
+    def sign_sha256(self, message):
+        """RSASSA-PKCS1-v1_5 with SHA-256."""
+        digest_info = _SHA256_DIGEST_INFO + hashlib.sha256(message).digest()
+        padded = b"\x00\x01" + b"\xff" * (self.size - len(digest_info) - 3) + b"\x00" + digest_info
+        m = int.from_bytes(padded, "big")
+        m1 = pow(m, self.dp, self.p)
+        m2 = pow(m, self.dq, self.q)
+        s = m2 + (self.qinv * (m1 - m2) % self.p) * self.q
+        return s.to_bytes(self.size, "big")
+
+
+def _rsa_verify_sha256(public_key_info, message, signature):
+    """Check an RSASSA-PKCS1-v1_5/SHA-256 signature against a DER
+    SubjectPublicKeyInfo."""
+    _tag, body, end = _der_read(public_key_info)
+    (_t, _s, alg_body, alg_end), (bit_tag, _s2, bit_body, bit_end) = _der_children(public_key_info, body, end)
+    if public_key_info[alg_body:alg_end][:len(OID_RSA)] != OID_RSA or bit_tag != 0x03:
+        return False
+    rsa = public_key_info[bit_body + 1:bit_end]
+    _tag, rbody, rend = _der_read(rsa)
+    n, e = _der_ints(rsa, rbody, rend)
+    size = (n.bit_length() + 7) // 8
+    if len(signature) != size:
+        return False
+    digest_info = _SHA256_DIGEST_INFO + hashlib.sha256(message).digest()
+    expected = b"\x00\x01" + b"\xff" * (size - len(digest_info) - 3) + b"\x00" + digest_info
+    return pow(int.from_bytes(signature, "big"), e, n).to_bytes(size, "big") == expected
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Key and certificate
+# ─────────────────────────────────────────────────────────────────────────────
+
+DEBUG_DN = (("2.5.4.6", "US"), ("2.5.4.10", "Android"), ("2.5.4.3", "Android Debug"))
+
+
+def _name(dn):
+    return _seq(*(_set(_seq(_oid(oid), _tlv(0x13, value.encode()))) for oid, value in dn))
+
+
+def self_signed_certificate(key, dn=DEBUG_DN, days=10000):
+    """A v3 X.509 certificate for `key`, self-signed with SHA256withRSA."""
+    now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    algorithm = _seq(OID_SHA256_RSA, _null())
+    tbs = _seq(
+        _explicit(0, _int(2)),
+        _int(secrets.randbits(63) | 1),
+        algorithm,
+        _name(dn),
+        _seq(_time(now), _time(now + datetime.timedelta(days=days))),
+        _name(dn),
+        key.public_key_info(),
+    )
+    return _seq(tbs, algorithm, _bits(key.sign_sha256(tbs)))
+
+
+def _cert_parts(cert):
+    """(issuer DER, serial DER, SubjectPublicKeyInfo DER) of a certificate."""
+    _tag, body, end = _der_read(cert)
+    _tag, tbs_body, tbs_end = _der_read(cert, body)
+    fields = _der_children(cert, tbs_body, tbs_end)
+    if fields[0][0] == 0xA0:
+        fields = fields[1:]
+    serial, issuer, spki = fields[0], fields[2], fields[5]
+    return (cert[issuer[1]:issuer[3]], cert[serial[1]:serial[3]], cert[spki[1]:spki[3]])
+
+
+def _pem(label, der):
+    body = base64.encodebytes(der).decode("ascii").replace("\n", "")
+    lines = [body[i:i + 64] for i in range(0, len(body), 64)]
+    return "-----BEGIN %s-----\n%s\n-----END %s-----\n" % (label, "\n".join(lines), label)
+
+
+def _pem_blocks(text):
+    blocks = {}
+    label = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("-----BEGIN "):
+            label, body = line[11:-5], []
+        elif line.startswith("-----END ") and label:
+            blocks.setdefault(label, base64.b64decode("".join(body)))
+            label = None
+        elif label:
+            body.append(line)
+    return blocks
+
+
+def _key_from_der(der, pkcs8):
+    if pkcs8:
+        _tag, body, end = _der_read(der)
+        octets = [c for c in _der_children(der, body, end) if c[0] == 0x04][0]
+        der = der[octets[2]:octets[3]]
+    _tag, body, end = _der_read(der)
+    _version, n, e, d, p, q = _der_ints(der, body, end)[:6]
+    return RsaKey(n, e, d, p, q)
+
+
+def load_signer(path):
+    """Return (key, certificate DER) from a PEM file, generating a debug key
+    and self-signed certificate there first if the file does not exist."""
+    if not os.path.exists(path):
+        key = RsaKey.generate()
+        cert = self_signed_certificate(key)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(_pem("RSA PRIVATE KEY", key.to_der()) + _pem("CERTIFICATE", cert))
+        os.replace(tmp, path)
+        return key, cert
+
+    with open(path) as f:
+        blocks = _pem_blocks(f.read())
+    if "RSA PRIVATE KEY" in blocks:
+        key = _key_from_der(blocks["RSA PRIVATE KEY"], pkcs8=False)
+    elif "PRIVATE KEY" in blocks:
+        key = _key_from_der(blocks["PRIVATE KEY"], pkcs8=True)
+    else:
+        raise ValueError(f"{path} has no unencrypted RSA private key")
+    if "CERTIFICATE" not in blocks:
+        raise ValueError(f"{path} has no certificate")
+    cert = blocks["CERTIFICATE"]
+    if _cert_parts(cert)[2] != key.public_key_info():
+        raise ValueError(f"{path}: the certificate does not match the private key")
+    return key, cert
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Zip
+# ─────────────────────────────────────────────────────────────────────────────
+
+_LOCAL   = struct.Struct("<4s5H3L2H")
+_CENTRAL = struct.Struct("<4s6H3L5H2L")
+_END     = struct.Struct("<4s4H2LH")
+
+ALIGNMENT = 4
+PAGE_ALIGNMENT = 4096
+_ALIGN_EXTRA_ID = 0xD935
+
+
+class _Entry:
+    __slots__ = ("name", "flags", "method", "time", "date", "crc", "csize", "size",
+                 "version", "internal_attr", "external_attr", "payload", "offset", "source")
+
+    def chunks(self):
+        """The compressed payload in pieces of at most _CHUNK bytes, read from
+        the source archive when the entry came from one."""
+        if self.source is None:
+            yield self.payload
+            return
+        self.source.seek(self.offset)
+        left = self.csize
+        while left:
+            chunk = self.source.read(min(left, _CHUNK))
+            if not chunk:
+                raise ValueError(f"truncated entry {self.name.decode(errors='replace')}")
+            left -= len(chunk)
+            yield chunk
+
+    def data(self):
+        payload = b"".join(self.chunks())
+        if self.method == 0:
+            return payload
+        return zlib.decompress(payload, -15)
+
+    def digest(self):
+        """SHA-256 of the uncompressed data, inflated a chunk at a time."""
+        h = hashlib.sha256()
+        inflater = zlib.decompressobj(-15) if self.method else None
+        for chunk in self.chunks():
+            h.update(inflater.decompress(chunk) if inflater else chunk)
+        if inflater:
+            h.update(inflater.flush())
+        return h.digest()
+
+
+def _read_entries(f):
+    """The entries of the zip open as binary file `f`, in central directory
+    order. Only the central directory is read up front; payloads stay in the
+    file until an entry's chunks() asks for them, so `f` must stay open while
+    the entries are in use. Zip64 archives are not supported (an APK never
+    needs them)."""
+    f.seek(0, os.SEEK_END)
+    tail_start = max(0, f.tell() - 65557)
+    f.seek(tail_start)
+    tail = f.read()
+    eocd = tail.rfind(b"PK\x05\x06")
+    if eocd < 0:
+        raise ValueError("not a zip file")
+    _sig, _disk, _cd_disk, _n, count, cd_size, cd_offset, _comment = _END.unpack_from(tail, eocd)
+    f.seek(cd_offset)
+    directory = f.read(cd_size)
+
+    entries = []
+    pos = 0
+    for _ in range(count):
+        fields = _CENTRAL.unpack_from(directory, pos)
+        if fields[0] != b"PK\x01\x02":
+            raise ValueError("bad central directory")
+        (_sig, version, _needed, flags, method, mtime, mdate, crc, csize, size,
+         name_len, extra_len, comment_len, _disk, internal_attr, external_attr, local) = fields
+        entry = _Entry()
+        entry.name = directory[pos + _CENTRAL.size:pos + _CENTRAL.size + name_len]
+        entry.flags = flags & 0x800
+        entry.method = method
+        entry.time, entry.date = mtime, mdate
+        entry.crc, entry.csize, entry.size = crc, csize, size
+        entry.version = version
+        entry.internal_attr, entry.external_attr = internal_attr, external_attr
+        f.seek(local)
+        lfields = _LOCAL.unpack(f.read(_LOCAL.size))
+        entry.payload = None
+        entry.offset = local + _LOCAL.size + lfields[9] + lfields[10]
+        entry.source = f
+        entries.append(entry)
+        pos += _CENTRAL.size + name_len + extra_len + comment_len
+    return entries
+
+
+def _alignment_for(entry):
+    if entry.method != 0:
+        return 0
+    if entry.name.startswith(b"lib/") and entry.name.endswith(b".so"):
+        return PAGE_ALIGNMENT
+    return ALIGNMENT
+
+
+def _write_entries(entries, out):
+    """Write the entries' local headers and payloads to the start of the
+    binary file `out`, every stored entry aligned, streaming each payload
+    from its source archive. Returns the central directory that goes with
+    them, to be written after anything else that sits in between."""
+    central = bytearray()
+    for entry in entries:
+        offset = out.tell()
+        extra = b""
+        alignment = _alignment_for(entry)
+        if alignment:
+            pad = -(offset + _LOCAL.size + len(entry.name)) % alignment
+            if pad:
+                while pad < 6:
+                    pad += alignment
+                extra = struct.pack("<HHH", _ALIGN_EXTRA_ID, pad - 4, alignment) + bytes(pad - 6)
+        out.write(_LOCAL.pack(b"PK\x03\x04", 20, entry.flags, entry.method, entry.time,
+                              entry.date, entry.crc, entry.csize, entry.size,
+                              len(entry.name), len(extra)))
+        out.write(entry.name + extra)
+        for chunk in entry.chunks():
+            out.write(chunk)
+        central += _CENTRAL.pack(b"PK\x01\x02", entry.version, 20, entry.flags, entry.method,
+                                 entry.time, entry.date, entry.crc, entry.csize, entry.size,
+                                 len(entry.name), 0, 0, 0, entry.internal_attr,
+                                 entry.external_attr, offset)
+        central += entry.name
+    return bytes(central)
+
+
+def _end_record(count, central, cd_offset):
+    return _END.pack(b"PK\x05\x06", 0, 0, count, count, len(central), cd_offset, 0)
+
+
+def _new_entry(name, data):
+    entry = _Entry()
+    entry.name = name.encode()
+    entry.flags = 0
+    entry.method = 8
+    entry.time, entry.date = 0, (1981 - 1980) << 9 | 1 << 5 | 1
+    entry.crc = zlib.crc32(data) & 0xFFFFFFFF
+    entry.size = len(data)
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    entry.payload = compressor.compress(data) + compressor.flush()
+    entry.csize = len(entry.payload)
+    entry.version = 20
+    entry.internal_attr, entry.external_attr = 0, 0
+    entry.offset = None
+    entry.source = None
+    return entry
+
+
+def _is_signature_file(name):
+    if not name.startswith(b"META-INF/") or b"/" in name[9:]:
+        return False
+    upper = name.upper()
+    return upper == b"META-INF/MANIFEST.MF" or upper.endswith((b".SF", b".RSA", b".DSA", b".EC"))
+
+# ─────────────────────────────────────────────────────────────────────────────
+# v1 (JAR) signature
+# ─────────────────────────────────────────────────────────────────────────────
+
+V1_NAME = "CERT"
+_CREATED_BY = b"Created-By: 1.0 (Android)\r\n"
+
+
+def _manifest_line(key, value):
+    """A manifest attribute, wrapped at 72 bytes per line."""
+    raw = key + b": " + value
+    lines = [raw[:72]]
+    raw = raw[72:]
+    while raw:
+        lines.append(b" " + raw[:71])
+        raw = raw[71:]
+    return b"".join(line + b"\r\n" for line in lines)
+
+
+def _b64sha256(data):
+    return base64.b64encode(hashlib.sha256(data).digest())
+
+
+def _v1_files(entries, key, cert, schemes):
+    manifest = bytearray(b"Manifest-Version: 1.0\r\n" + _CREATED_BY + b"\r\n")
+    sections = []
+    for entry in sorted(entries, key=lambda e: e.name):
+        if entry.name.endswith(b"/"):
+            continue
+        section = _manifest_line(b"Name", entry.name) + \
+            _manifest_line(b"SHA-256-Digest", base64.b64encode(entry.digest())) + b"\r\n"
+        manifest += section
+        sections.append((entry.name, section))
+    manifest = bytes(manifest)
+
+    sf = bytearray(b"Signature-Version: 1.0\r\n" + _CREATED_BY)
+    sf += _manifest_line(b"SHA-256-Digest-Manifest", _b64sha256(manifest))
+    # Tells v2+ verifiers that stripping the newer signatures is an attack.
+    sf += _manifest_line(b"X-Android-APK-Signed", ", ".join(str(s) for s in schemes).encode())
+    sf += b"\r\n"
+    for name, section in sections:
+        sf += _manifest_line(b"Name", name) + _manifest_line(b"SHA-256-Digest", _b64sha256(section)) + b"\r\n"
+    sf = bytes(sf)
+
+    issuer, serial, _spki = _cert_parts(cert)
+    signer_info = _seq(
+        _int(1),
+        _seq(issuer, serial),
+        _seq(OID_SHA256, _null()),
+        _seq(OID_RSA, _null()),
+        _octets(key.sign_sha256(sf)),
+    )
+    signed_data = _seq(
+        _int(1),
+        _set(_seq(OID_SHA256, _null())),
+        _seq(OID_DATA),
+        _tlv(0xA0, cert),
+        _set(signer_info),
+    )
+    pkcs7 = _seq(OID_SIGNED, _explicit(0, signed_data))
+    return [
+        _new_entry("META-INF/MANIFEST.MF", manifest),
+        _new_entry(f"META-INF/{V1_NAME}.SF", sf),
+        _new_entry(f"META-INF/{V1_NAME}.RSA", pkcs7),
+    ]
+
+# ─────────────────────────────────────────────────────────────────────────────
+# v2 / v3 signature block
+# ─────────────────────────────────────────────────────────────────────────────
+
+V2_BLOCK_ID = 0x7109871A
+V3_BLOCK_ID = 0xF05368C0
+_STRIPPING_PROTECTION_ID = 0xBEEFF00D
+RSA_PKCS1_SHA256 = 0x0103
+V3_MIN_SDK = 28
+_MAX_SDK = 0x7FFFFFFF
+_BLOCK_MAGIC = b"APK Sig Block 42"
+_CHUNK = 1 << 20
+
+
+def _lp(data):
+    return struct.pack("<I", len(data)) + data
+
+
+def _lp_seq(items):
+    return _lp(b"".join(_lp(item) for item in items))
+
+
+def _section_chunks(section):
+    """A section in _CHUNK-byte pieces: bytes, or (file, start, end) read
+    back from disk."""
+    if isinstance(section, tuple):
+        f, pos, end = section
+        f.seek(pos)
+        while pos < end:
+            chunk = f.read(min(_CHUNK, end - pos))
+            if not chunk:
+                raise ValueError("archive shorter than its central directory offset")
+            pos += len(chunk)
+            yield chunk
+        return
+    view = memoryview(section)
+    for start in range(0, len(view), _CHUNK):
+        yield view[start:start + _CHUNK]
+
+
+def _content_digest(sections):
+    """The chunked SHA-256 content digest over the zip sections that the
+    signing block protects (entries, central directory, end record)."""
+    digests = []
+    for section in sections:
+        for chunk in _section_chunks(section):
+            h = hashlib.sha256(b"\xa5" + struct.pack("<I", len(chunk)))
+            h.update(chunk)
+            digests.append(h.digest())
+    return hashlib.sha256(b"\x5a" + struct.pack("<I", len(digests)) + b"".join(digests)).digest()
+
+
+def _v2_signer(key, cert, digest, v3_too):
+    attributes = []
+    if v3_too:
+        attributes.append(struct.pack("<II", _STRIPPING_PROTECTION_ID, 3))
+    signed = (_lp_seq([struct.pack("<I", RSA_PKCS1_SHA256) + _lp(digest)])
+              + _lp_seq([cert]) + _lp_seq(attributes))
+    signature = struct.pack("<I", RSA_PKCS1_SHA256) + _lp(key.sign_sha256(signed))
+    return _lp_seq([_lp(signed) + _lp_seq([signature]) + _lp(key.public_key_info())])
+
+
+def _v3_signer(key, cert, digest):
+    sdk = struct.pack("<II", V3_MIN_SDK, _MAX_SDK)
+    signed = (_lp_seq([struct.pack("<I", RSA_PKCS1_SHA256) + _lp(digest)])
+              + _lp_seq([cert]) + sdk + _lp_seq([]))
+    signature = struct.pack("<I", RSA_PKCS1_SHA256) + _lp(key.sign_sha256(signed))
+    return _lp_seq([_lp(signed) + sdk + _lp_seq([signature]) + _lp(key.public_key_info())])
+
+
+def _signing_block(pairs):
+    body = b"".join(struct.pack("<QI", len(value) + 4, block_id) + value for block_id, value in pairs)
+    size = len(body) + 8 + len(_BLOCK_MAGIC)
+    return struct.pack("<Q", size) + body + struct.pack("<Q", size) + _BLOCK_MAGIC
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Public API
+# ─────────────────────────────────────────────────────────────────────────────
+
+@contextmanager
+def _replacing(path):
+    """A binary file (read/write) that becomes `path` once the block
+    finishes; on an error the half-written file is removed."""
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "w+b") as f:
+            yield f
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+# align() and sign() stream entries from `src` into `dst` and read the
+# written entries back for the v2/v3 digest, so neither holds more than the
+# central directory, the v1 files and one _CHUNK of payload in memory.
+
+def align(src, dst):
+    """zipalign `src` into `dst` (stored entries 4-byte aligned, native
+    libraries page aligned). Any existing signature is dropped."""
+    with open(src, "rb") as f, _replacing(dst) as out:
+        entries = [e for e in _read_entries(f) if not _is_signature_file(e.name)]
+        central = _write_entries(entries, out)
+        out.write(central + _end_record(len(entries), central, out.tell()))
+
+
+def sign(src, dst, key, cert, v1=True):
+    """Align `src` and write it to `dst` signed with v1, v2 and v3 schemes."""
+    with open(src, "rb") as f, _replacing(dst) as out:
+        entries = [e for e in _read_entries(f) if not _is_signature_file(e.name)]
+        if v1:
+            entries = _v1_files(entries, key, cert, (2, 3)) + entries
+        central = _write_entries(entries, out)
+        cd_offset = out.tell()
+        digest = _content_digest(((out, 0, cd_offset), central,
+                                  _end_record(len(entries), central, cd_offset)))
+
+        block = _signing_block([
+            (V2_BLOCK_ID, _v2_signer(key, cert, digest, v3_too=True)),
+            (V3_BLOCK_ID, _v3_signer(key, cert, digest)),
+        ])
+        out.seek(cd_offset)
+        out.write(block + central + _end_record(len(entries), central, cd_offset + len(block)))
+
+
+def _parse_lp_seq(data):
+    items, pos = [], 0
+    while pos < len(data):
+        (length,) = struct.unpack_from("<I", data, pos)
+        items.append(data[pos + 4:pos + 4 + length])
+        pos += 4 + length
+    return items
+
+
+def _verify_block_signer(signer, digest, v3):
+    (length,) = struct.unpack_from("<I", signer)
+    signed_data, rest = signer[4:4 + length], signer[4 + length:]
+    if v3:
+        rest = rest[8:]
+    fields = _parse_lp_seq(rest)
+    signatures, public_key = _parse_lp_seq(fields[0]), fields[1]
+    for signature in signatures:
+        (algorithm,) = struct.unpack_from("<I", signature)
+        if algorithm != RSA_PKCS1_SHA256 or \
+                not _rsa_verify_sha256(public_key, signed_data, _parse_lp_seq(signature[4:])[0]):
+            return False
+
+    pos = 0
+    (length,) = struct.unpack_from("<I", signed_data, pos)
+    digests = _parse_lp_seq(signed_data[4:4 + length])
+    pos = 4 + length
+    (length,) = struct.unpack_from("<I", signed_data, pos)
+    certs = _parse_lp_seq(signed_data[pos + 4:pos + 4 + length])
+    if not certs or _cert_parts(certs[0])[2] != public_key:
+        return False
+    for item in digests:
+        (algorithm,) = struct.unpack_from("<I", item)
+        if algorithm == RSA_PKCS1_SHA256 and _parse_lp_seq(item[4:])[0] != digest:
+            return False
+    return True
+
+
+def verify(path):
+    """Check an APK's v1, v2 and v3 signatures (RSA/SHA-256 only, as this
+    module writes them) and its alignment. Returns {scheme: bool}; a scheme
+    that is absent is left out."""
+    with open(path, "rb") as f:
+        data = f.read()
+        return _verify(data, _read_entries(f))
+
+
+def _verify(data, entries):
+    eocd = data.rfind(b"PK\x05\x06", max(0, len(data) - 65557))
+    cd_offset = _END.unpack_from(data, eocd)[6]
+    results = {}
+
+    results["aligned"] = all(not _alignment_for(e) or e.offset % _alignment_for(e) == 0
+                             for e in entries)
+
+    if data[cd_offset - 16:cd_offset] == _BLOCK_MAGIC:
+        (size,) = struct.unpack_from("<Q", data, cd_offset - 24)
+        block_start = cd_offset - size - 8
+        end = bytearray(data[eocd:])
+        struct.pack_into("<L", end, 16, block_start)
+        digest = _content_digest((data[:block_start], data[cd_offset:eocd], bytes(end)))
+        pos = block_start + 8
+        while pos < cd_offset - 24:
+            length, block_id = struct.unpack_from("<QI", data, pos)
+            value = data[pos + 12:pos + 8 + length]
+            if block_id in (V2_BLOCK_ID, V3_BLOCK_ID):
+                v3 = block_id == V3_BLOCK_ID
+                signers = _parse_lp_seq(_parse_lp_seq(value)[0])
+                results["v3" if v3 else "v2"] = bool(signers) and all(
+                    _verify_block_signer(s, digest, v3) for s in signers)
+            pos += 8 + length
+
+    by_name = {e.name: e for e in entries}
+    manifest = by_name.get(b"META-INF/MANIFEST.MF")
+    sf = next((e for n, e in by_name.items() if _is_signature_file(n) and n.upper().endswith(b".SF")), None)
+    if manifest and sf:
+        results["v1"] = _verify_v1(by_name, manifest.data(), sf)
+    return results
+
+
+def _verify_v1(by_name, manifest, sf_entry):
+    sf = sf_entry.data()
+    rsa = by_name.get(sf_entry.name[:-3] + b".RSA")
+    if rsa is None:
+        return False
+    pkcs7 = rsa.data()
+    # ContentInfo -> [0] -> SignedData: certificates [0] and the last SET
+    # holding the SignerInfo whose last field is the signature.
+    _t, body, end = _der_read(pkcs7)
+    _content_type, explicit = _der_children(pkcs7, body, end)
+    _t, sd_body, sd_end = _der_read(pkcs7, explicit[2])
+    fields = _der_children(pkcs7, sd_body, sd_end)
+    certs = [f for f in fields if f[0] == 0xA0][0]
+    cert = pkcs7[certs[2]:_der_read(pkcs7, certs[2])[2]]
+    signer_set = fields[-1]
+    signer_info = _der_children(pkcs7, signer_set[2], signer_set[3])[0]
+    signature = _der_children(pkcs7, signer_info[2], signer_info[3])[-1]
+    if not _rsa_verify_sha256(_cert_parts(cert)[2], sf, pkcs7[signature[2]:signature[3]]):
+        return False
+
+    if _b64sha256(manifest) not in sf:
+        return False
+    digests = {}
+    for section in manifest.split(b"\r\n\r\n")[1:]:
+        lines = section.replace(b"\r\n ", b"").split(b"\r\n")
+        attrs = dict(line.split(b": ", 1) for line in lines if b": " in line)
+        if b"Name" in attrs:
+            digests[attrs[b"Name"]] = attrs.get(b"SHA-256-Digest")
+    for name, entry in by_name.items():
+        if name.endswith(b"/") or _is_signature_file(name):
+            continue
+        if digests.get(name) != base64.b64encode(entry.digest()):
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="zipalign and sign an APK (v1 + v2 + v3) without a JVM.")
+    sub = parser.add_subparsers(dest="command")
+    sign_p = sub.add_parser("sign", help="align and sign IN into OUT")
+    sign_p.add_argument("src")
+    sign_p.add_argument("dst")
+    sign_p.add_argument("--key", default="debug-signer.pem",
+                        help="PEM key + certificate; a debug key is created if missing")
+    align_p = sub.add_parser("align", help="zipalign IN into OUT")
+    align_p.add_argument("src")
+    align_p.add_argument("dst")
+    verify_p = sub.add_parser("verify", help="check an APK's signatures and alignment")
+    verify_p.add_argument("apk")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "sign":
+            key, cert = load_signer(args.key)
+            sign(args.src, args.dst, key, cert)
+            print(f"Signed: {args.dst}")
+        elif args.command == "align":
+            align(args.src, args.dst)
+            print(f"Aligned: {args.dst}")
+        elif args.command == "verify":
+            results = verify(args.apk)
+            for scheme in sorted(results):
+                print(f"  {scheme}: {'ok' if results[scheme] else 'FAILED'}")
+            if not all(results.values()) or not any(k.startswith("v") for k in results):
+                sys.exit(1)
+        else:
+            parser.print_help()
+            sys.exit(2)
+    except Exception as exc:
+        sys.exit(f"error: {exc}")
+
+
+if __name__ == "__main__":
+    main()
@@ -52,28 +52,29 @@ Copy-Item (Join-Path $root "module\customize.sh") $moduleDir -Force
 # Variant names read literally now: "crt-on" means the CRT shader stays ON
 # (vanilla look), "crt-off" means it is disabled. Before v2.7.0 the axis
 # secretly meant "crt-disable", so the old crt-on was actually CRT off.
+# gen_assets.py's MATRIX_VARIANTS uses the same names.
 $variants = @(
-    @{ Name = "readabletro-on_crt-on";   Readabletro = "on";  DisableCrt = "off" },
-    @{ Name = "readabletro-on_crt-off";  Readabletro = "on";  DisableCrt = "on"  },
-    @{ Name = "readabletro-off_crt-on";  Readabletro = "off"; DisableCrt = "off" },
-    @{ Name = "readabletro-off_crt-off"; Readabletro = "off"; DisableCrt = "on"  }
+    "readabletro-on_crt-on",
+    "readabletro-on_crt-off",
+    "readabletro-off_crt-on",
+    "readabletro-off_crt-off"
 )
 
-foreach ($variant in $variants) {
-    $name = $variant.Name
-    Write-Host "=== Building $name ==="
-    & $python (Join-Path $root "gen_assets.py") `
-        --readabletro $variant.Readabletro `
-        --disable-crt $variant.DisableCrt `
-        --out (Join-Path $root "src\assets_gen.h")
-    if ($LASTEXITCODE -ne 0) { throw "gen_assets.py failed for $name" }
-    # Without this check a gen_assets failure (e.g. missing src/resources
-    # extraction) only surfaces later as a baffling missing-header compile error.
-    if ($LASTEXITCODE -ne 0) { throw "gen_assets.py failed for $name (is src/resources extracted? run build.py once)" }
+# One generator pass for all four: shared inputs are read and encoded once,
+# and chunks the variants have in common land once under build\assets\shared.
+$assetsDir = Join-Path $root "build\assets"
+Write-Host "=== Generating assets for all variants ==="
+& $python (Join-Path $root "gen_assets.py") --matrix $assetsDir
+# Without this check a gen_assets failure only surfaces later as a baffling
+# missing-header compile error.
+if ($LASTEXITCODE -ne 0) { throw "gen_assets.py --matrix failed" }
 
+foreach ($name in $variants) {
+    Write-Host "=== Building $name ==="
     $buildDir = Join-Path $root "build\$name"
     if (Test-Path $buildDir) { Remove-Item -Recurse -Force $buildDir }
     cmake -G Ninja -S $root -B $buildDir `
+        "-DBALATRO_ASSETS_DIR=$((Join-Path $assetsDir $name).Replace('\', '/'))" `
         "-DCMAKE_TOOLCHAIN_FILE=$NdkDir\build\cmake\android.toolchain.cmake" `
         "-DANDROID_ABI=arm64-v8a" `
         "-DANDROID_PLATFORM=$AndroidPlatform" `
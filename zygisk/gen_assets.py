@@ -8,16 +8,28 @@ src/.
 """
 
 import argparse
-import base64
 import hashlib
+import io
+import json
 import os
+import re
 import sys
+import zlib
 from pathlib import Path
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 SRC_DIR = REPO_ROOT / "src"
 DEFAULT_OUT = Path(__file__).resolve().parent / "src" / "assets_gen.h"
 
+# The flavours build_pkg.ps1 publishes, as (name, readabletro, crt_disable).
+# "crt-on" keeps the CRT shader, so it is the crt_disable=False variant.
+MATRIX_VARIANTS = (
+    ("readabletro-on_crt-on", True, False),
+    ("readabletro-on_crt-off", True, True),
+    ("readabletro-off_crt-on", False, False),
+    ("readabletro-off_crt-off", False, True),
+)
+
 sys.path.insert(0, str(REPO_ROOT))
 import build as portrait_build  # noqa: E402
 
@@ -49,7 +61,46 @@ def _parse_args():
         default=str(DEFAULT_OUT),
         help="output assets_gen.h path",
     )
+    parser.add_argument(
+        "--format",
+        choices=("blob", "array"),
+        default="blob",
+        help="blob: one binary file linked with .incbin next to the header (default);"
+             " array: C array literals in the header itself",
+    )
+    parser.add_argument(
+        "--compress",
+        choices=("on", "off"),
+        default="on",
+        help="raw-deflate each chunk; the module inflates it when Lua first loads it",
+    )
+    parser.add_argument(
+        "--bytecode",
+        choices=("on", "off"),
+        default="off",
+        help="embed each chunk as stripped LuaJIT bytecode (luajit -b -s) instead of source;"
+             " a chunk that fails to compile stays source",
+    )
+    parser.add_argument(
+        "--luajit",
+        metavar="PATH",
+        help="LuaJIT 2.1 binary used by --bytecode on (default: luajit on PATH)",
+    )
+    parser.add_argument(
+        "--matrix",
+        metavar="DIR",
+        help="emit every readabletro x CRT variant into DIR/<variant>/ in one pass, with chunks"
+             " that several variants share written once under DIR/shared/"
+             " (--readabletro, --disable-crt and --out are ignored)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="regenerate even when the input-hash cache says nothing changed",
+    )
     args = parser.parse_args()
+    if args.matrix and args.format != "blob":
+        parser.error("--matrix needs --format blob")
     return args
 
 
@@ -65,42 +116,11 @@ def _normalize_lf(data):
     return data.replace(b"\r\n", b"\n")
 
 
-def _replace_once(content, original, modified, label):
-    if modified in content:
-        return content
-    if original not in content:
-        raise RuntimeError(f"{label} patch target not found")
-    return content.replace(original, modified, 1)
-
-
-def _apply_readabletro_lua(rel, data):
-    patches = portrait_build.READABLETRO_LUA_PATCHES.get(rel)
-    if not patches:
-        return data
-
-    content = data.decode("utf-8")
-    for original, modified in patches:
-        content = _replace_once(content, original, modified, f"Readabletro {rel}")
-    return content.encode("utf-8")
-
-
 def _apply_lua_transforms(rel, data, readabletro, crt_disable):
-    data = _normalize_lf(data)
-
-    if readabletro:
-        data = _apply_readabletro_lua(rel, data)
-
-    if rel == "game.lua" and crt_disable:
-        content = data.decode("utf-8")
-        content = _replace_once(
-            content,
-            portrait_build.CRT_PATCH_ORIGINAL,
-            portrait_build.CRT_PATCH_MODIFIED,
-            "CRT disable game.lua",
-        )
-        data = content.encode("utf-8")
-
-    return data
+    # Shared with build.py's Game.love overlay, so the Zygisk payload and the
+    # APK can never disagree on a patch. strict: a missing target is an error.
+    return portrait_build._transform_lua(rel, data, apply_crt=crt_disable,
+                                         apply_readabletro=readabletro, strict=True)
 
 
 def _pick_bracket(data):
@@ -170,79 +190,70 @@ def _resource_version(entries):
     return digest.hexdigest()
 
 
-def _lua_resource_module(name, entries):
+# Bytes a quoted Lua string cannot carry raw: newlines end it (and the lexer
+# would fold \r\n, so long brackets are out for PNG headers too), NUL is
+# escaped for the stock Lua 5.1 lexer. Always three digits, so a following
+# digit in the data cannot extend the escape.
+_LUA_BYTE_ESCAPES = {byte: b"\\%03d" % byte for byte in b"\0\r\n\\\""}
+_LUA_BYTE_ESCAPE_RE = re.compile(rb'[\0\r\n\\"]')
+
+
+def _lua_byte_string(data):
+    """Quote bytes so Lua loads them back verbatim, with nothing to decode."""
+    return b'"' + _LUA_BYTE_ESCAPE_RE.sub(lambda m: _LUA_BYTE_ESCAPES[m.group()[0]], data) + b'"'
+
+
+# Chunk-name prefix of the per-file resource chunks. The installer asks for
+# one with loadstring("", "=portrait_embedded/<path>"), and the Zygisk hook
+# on luaL_loadbufferx swaps in the embedded chunk of that name.
+EMBEDDED_CHUNK_PREFIX = "portrait_embedded/"
+
+
+def _lua_resource_index(name, entries):
+    """The preloaded index: size, SHA-256 and magic per file, no file data."""
     parts = [f'package.preload["{name}"] = function(...)\nreturn {{\n'.encode()]
     for key in sorted(entries):
         data = entries[key]
-        encoded = base64.b64encode(data)
-        magic = base64.b64encode(_resource_magic(key, data))
-        open_bracket, close_bracket = _pick_bracket(encoded)
         parts.append(
             b'["'
             + key.encode()
             + b'"]={size='
             + str(len(data)).encode()
-            + b',magic="'
-            + magic
-            + b'",data='
-            + open_bracket
-            + b"\n"
+            + b',hash="'
+            + hashlib.sha256(data).hexdigest().encode()
+            + b'",magic='
+            + _lua_byte_string(_resource_magic(key, data))
+            + b"},\n"
         )
-        parts.append(encoded)
-        parts.append(b"\n" + close_bracket + b"},\n")
     parts.append(b"}\nend\n")
     return b"".join(parts)
 
 
+def _lua_resource_chunks(entries):
+    """One chunk per file, returning its bytes; parsed only when installed."""
+    return {EMBEDDED_CHUNK_PREFIX + key: b"return " + _lua_byte_string(data) + b"\n"
+            for key, data in entries.items()}
+
+
 def _lua_string(value):
     escaped = value.replace("\\", "\\\\").replace('"', '\\"')
     return f'"{escaped}"'
 
 
 def _install_embedded_files_lua(resource_version, managed_paths):
+    """The installer run by portrait_config on every launch.
+
+    It keeps a manifest of the SHA-256 it last wrote for each file and only
+    rewrites files whose hash in the index differs or whose size on disk is
+    off. resource_version is the whole-set hash the earlier installer kept
+    in portrait_embedded_files.version; a matching one seeds the manifest so
+    an upgrade with unchanged files rewrites nothing.
+    """
     managed_table = ", ".join(_lua_string(path) for path in managed_paths)
     return f"""
 local PORTRAIT_EMBEDDED_RESOURCE_VERSION = "{resource_version}"
 local PORTRAIT_EMBEDDED_MANAGED_FILES = {{{managed_table}}}
-
-local function decode_portrait_base64(data)
-    local alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
-    local values = {{}}
-    for i = 1, #alphabet do values[alphabet:sub(i, i)] = i - 1 end
-    data = data:gsub("%s+", "")
-
-    local chunks = {{}}
-    local chunk = {{}}
-    local chunk_len = 0
-
-    local function emit(byte)
-        chunk_len = chunk_len + 1
-        chunk[chunk_len] = string.char(byte)
-        if chunk_len >= 4096 then
-            chunks[#chunks + 1] = table.concat(chunk)
-            chunk = {{}}
-            chunk_len = 0
-        end
-    end
-
-    for i = 1, #data, 4 do
-        local c1 = data:sub(i, i)
-        local c2 = data:sub(i + 1, i + 1)
-        local c3 = data:sub(i + 2, i + 2)
-        local c4 = data:sub(i + 3, i + 3)
-        local v1 = assert(values[c1], "invalid base64 byte 1")
-        local v2 = assert(values[c2], "invalid base64 byte 2")
-        local v3 = c3 == "=" and 0 or assert(values[c3], "invalid base64 byte 3")
-        local v4 = c4 == "=" and 0 or assert(values[c4], "invalid base64 byte 4")
-        local triple = v1 * 262144 + v2 * 4096 + v3 * 64 + v4
-        emit(math.floor(triple / 65536) % 256)
-        if c3 ~= "=" then emit(math.floor(triple / 256) % 256) end
-        if c4 ~= "=" then emit(triple % 256) end
-    end
-
-    if chunk_len > 0 then chunks[#chunks + 1] = table.concat(chunk) end
-    return table.concat(chunks)
-end
+local PORTRAIT_EMBEDDED_MANIFEST = "portrait_embedded_files.manifest"
 
 local function assert_portrait_embedded_file(path, data, size, magic)
     assert(#data == size, "embedded file size mismatch: " .. path)
@@ -251,45 +262,91 @@ local function assert_portrait_embedded_file(path, data, size, magic)
     end
 end
 
+local function load_portrait_embedded_file(path)
+    local chunk = loadstring("", "={EMBEDDED_CHUNK_PREFIX}" .. path)
+    return chunk and chunk()
+end
+
+-- One "<sha256> <path>" line per file this installer has written.
+local function read_portrait_embedded_manifest(files)
+    local installed = {{}}
+    local text = love.filesystem.read and love.filesystem.read(PORTRAIT_EMBEDDED_MANIFEST)
+    if text then
+        for hash, path in text:gmatch("(%x+) ([^\\n]+)") do installed[path] = hash end
+        return installed, true
+    end
+    local version_path = "portrait_embedded_files.version"
+    local version = love.filesystem.read and love.filesystem.read(version_path)
+    if version == PORTRAIT_EMBEDDED_RESOURCE_VERSION then
+        for path, item in pairs(files) do installed[path] = item.hash end
+    end
+    if version and love.filesystem.remove then love.filesystem.remove(version_path) end
+    return installed, false
+end
+
+local function write_portrait_embedded_manifest(installed)
+    local paths = {{}}
+    for path in pairs(installed) do paths[#paths + 1] = path end
+    table.sort(paths)
+    local lines = {{}}
+    for i, path in ipairs(paths) do lines[i] = installed[path] .. " " .. path .. "\\n" end
+    assert(love.filesystem.write(PORTRAIT_EMBEDDED_MANIFEST, table.concat(lines)))
+end
+
 local function install_portrait_embedded_files()
     if not (love and love.filesystem and love.filesystem.write and love.filesystem.getInfo) then return end
     local ok, files = pcall(require, "portrait_embedded_files")
     if not ok or type(files) ~= "table" then return end
-    local version_path = "portrait_embedded_files.version"
-    local current_version = love.filesystem.read and love.filesystem.read(version_path)
-    local force_install = current_version ~= PORTRAIT_EMBEDDED_RESOURCE_VERSION
-    if force_install and love.filesystem.remove then
+    local installed, has_manifest = read_portrait_embedded_manifest(files)
+    local changed = not has_manifest
+    if love.filesystem.remove then
         for _, path in ipairs(PORTRAIT_EMBEDDED_MANAGED_FILES) do
-            if not files[path] then love.filesystem.remove(path) end
+            if not files[path] and (installed[path] or not has_manifest) then
+                love.filesystem.remove(path)
+                installed[path] = nil
+                changed = true
+            end
         end
     end
     for path, item in pairs(files) do
         local info = love.filesystem.getInfo(path)
-        if force_install or not info or info.size ~= item.size then
-            local data = decode_portrait_base64(item.data)
-            local magic = decode_portrait_base64(item.magic or "")
-            assert_portrait_embedded_file(path, data, item.size, magic)
+        if installed[path] ~= item.hash or not info or info.size ~= item.size then
+            local data = load_portrait_embedded_file(path)
+            if type(data) ~= "string" then
+                -- No hook served the chunk; it stays out of the manifest and is retried next launch.
+                print("portrait: embedded file unavailable: " .. path)
+                break
+            end
+            assert_portrait_embedded_file(path, data, item.size, item.magic)
             local dir = path:match("^(.*)/[^/]+$")
             if dir then assert(love.filesystem.createDirectory(dir)) end
             assert(love.filesystem.write(path, data))
             local written = love.filesystem.read and love.filesystem.read(path)
-            if written then assert_portrait_embedded_file(path, written, item.size, magic) end
+            if written then assert_portrait_embedded_file(path, written, item.size, item.magic) end
+            installed[path] = item.hash
+            changed = true
         end
     end
-    assert(love.filesystem.write(version_path, PORTRAIT_EMBEDDED_RESOURCE_VERSION))
+    if changed then write_portrait_embedded_manifest(installed) end
 end
 install_portrait_embedded_files()
 """.encode()
 
 
-def _collect_lua_files(readabletro, crt_disable):
-    files = {}
+def _read_lua_sources():
+    """{rel: bytes} of every src/ Lua file the payload embeds, untransformed."""
+    sources = {}
     for path in SRC_DIR.rglob("*.lua"):
         rel = _rel_of(path)
-        if rel.startswith("localization/"):
-            continue
-        files[rel] = _apply_lua_transforms(rel, _read(path), readabletro, crt_disable)
-    return files
+        if not rel.startswith("localization/"):
+            sources[rel] = _read(path)
+    return sources
+
+
+def _collect_lua_files(readabletro, crt_disable, sources=None):
+    if sources is None:
+        sources = _read_lua_sources()
+    return {rel: _apply_lua_transforms(rel, data, readabletro, crt_disable) for rel, data in sources.items()}
 
 
 def _collect_shader_module(readabletro):
@@ -298,21 +355,21 @@ def _collect_shader_module(readabletro):
     The module runs inside the official app, so game.lua reads the original
     shader sources from the APK at runtime and applies these rules there.
     Only repo-owned Readabletro replacements are embedded whole; the CRT
-    slider-mask fix ships as a find/replace pair mirroring _replace_once.
+    slider-mask fix ships as a find/replace pair mirroring build._patch_text.
     This keeps the flashable ZIP free of game-derived content and removes
     the build-time dependency on an extracted src/resources tree.
     """
     replace = {}
     if readabletro:
-        base = REPO_ROOT / "patches" / "readabletro" / "shaders"
+        base = Path(portrait_build.READABLETRO_DIR) / "shaders"
         for name in ("background.fs", "splash.fs"):
             path = base / name
             if not path.exists():
                 raise FileNotFoundError(f"Readabletro shader not found: {path}")
             replace[name] = _normalize_lf(_read(path))
 
-    # Every CRT.fs transform build.py applies to the extracted tree, expressed
-    # as rules. If a new shader patch lands in _apply_crt_slider_mask_patch
+    # Every CRT.fs transform build.py's overlay applies, expressed as rules.
+    # If a new shader patch lands in _transform_crt_shader
     # (or anywhere else in build.py), it must be wired in here too — the
     # runtime otherwise sees the pristine APK shader without it.
     crt_rules = [
@@ -344,78 +401,554 @@ def _collect_readabletro_files(readabletro):
     if not readabletro:
         return {}
 
-    base = REPO_ROOT / "patches" / "readabletro"
-    files = {}
-    font = base / "fonts" / "TypoQuik-Bold.ttf"
-    if not font.exists():
-        raise FileNotFoundError(f"Readabletro font not found: {font}")
-    files["resources/fonts/TypoQuik-Bold.ttf"] = _read(font)
+    # Same path substitution build.py's overlay uses. Shaders are left out:
+    # they ship as rules in the portrait_shaders module instead.
+    overlay = portrait_build._readabletro_overlay()
+    font = "resources/fonts/TypoQuik-Bold.ttf"
+    if font not in overlay:
+        raise FileNotFoundError(f"Readabletro font not found under {portrait_build.READABLETRO_DIR}")
+    textures = sorted(arc for arc in overlay if arc.startswith("resources/textures/2x/"))
+    if not textures:
+        raise FileNotFoundError(f"Readabletro textures not found under {portrait_build.READABLETRO_DIR}")
+
+    files = {font: _read(Path(overlay[font]))}
+    for arc in textures:
+        files[arc] = _read(Path(overlay[arc]))
+    return files
 
-    texture_dir = base / "textures" / "2x"
-    if not texture_dir.is_dir():
-        raise FileNotFoundError(f"Readabletro texture directory not found: {texture_dir}")
-    for path in sorted(texture_dir.glob("*.png")):
-        files[f"resources/textures/2x/{path.name}"] = _read(path)
 
-    return files
+def _preload_parts(readabletro, managed_resource_files=None):
+    """What _fold_preloads adds that depends on the readabletro flag alone.
 
+    Returns (conf.lua prefix up to the portrait_config body, resource chunks).
+    Matrix mode builds this once per flag instead of once per variant.
+    """
+    if managed_resource_files is None:
+        managed_resource_files = _collect_readabletro_files(True)
+    resource_files = managed_resource_files if readabletro else {}
+    resource_version = _resource_version(resource_files)
+    prefix = (
+        _lua_resource_index("portrait_embedded_files", resource_files)
+        + _collect_shader_module(readabletro)
+        + b'package.preload["portrait_config"] = function(...)\n'
+        + _install_embedded_files_lua(resource_version, sorted(managed_resource_files))
+    )
+    return prefix, _lua_resource_chunks(resource_files)
 
-def _fold_preloads(files, readabletro):
+
+def _fold_preloads(files, readabletro, parts=None):
     portrait_config = files.pop("portrait_config.lua", None)
     if portrait_config is None:
         raise FileNotFoundError("portrait_config.lua not found in src/")
     if "conf.lua" not in files:
         raise FileNotFoundError("conf.lua not found in src/")
 
-    managed_resource_files = _collect_readabletro_files(True)
-    resource_files = managed_resource_files if readabletro else {}
-    resource_version = _resource_version(resource_files)
-    resource_module = _lua_resource_module("portrait_embedded_files", resource_files)
-    shader_module = _collect_shader_module(readabletro)
-    config_module = (
-        b'package.preload["portrait_config"] = function(...)\n'
-        + _install_embedded_files_lua(resource_version, sorted(managed_resource_files))
-        + portrait_config
-        + b"\nend\n"
-    )
-    files["conf.lua"] = resource_module + shader_module + config_module + files["conf.lua"]
-    return len(resource_files)
+    prefix, resource_chunks = parts or _preload_parts(readabletro)
+    files["conf.lua"] = prefix + portrait_config + b"\nend\n" + files["conf.lua"]
+    files.update(resource_chunks)
+    return len(resource_chunks)
+
+
+# zlen is the deflated size of data, or 0 when the chunk is stored as-is.
+_LUA_ASSET_STRUCT = "struct LuaAsset { const char* name; const unsigned char* data; size_t len; size_t zlen; };\n"
+
+
+def _deflate(data):
+    """Raw deflate (no zlib header), as module.cpp's inflateInit2(-15) expects."""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
 
+def _encode_chunks(files, compress, deflated=None):
+    """Return (name, payload, len, zlen) per chunk, in name order.
 
-def _write_header(files, out_path):
+    A chunk that does not shrink is stored raw with zlen 0, so the module
+    can hand it to Lua without inflating. `deflated` maps data to its
+    already deflated bytes (matrix mode deflates each distinct chunk once).
+    """
+    deflated = deflated or {}
+    chunks = []
+    for rel in sorted(files):
+        data = files[rel]
+        packed = (deflated.get(data) or _deflate(data)) if compress and data else data
+        if len(packed) < len(data):
+            chunks.append((rel, packed, len(data), len(packed)))
+        else:
+            chunks.append((rel, data, len(data), 0))
+    return chunks
+
+
+def _compile_chunks(files, luajit):
+    """Replace every chunk with luajit's stripped bytecode, in place.
+
+    Compilation shares build.py's helper and runs one luajit per distinct
+    chunk on a thread pool. A chunk luajit rejects keeps its source. Returns
+    ({name: "bytecode" | "source"}, {name: luajit's error}).
+    """
+    unique = list(dict.fromkeys(files[name] for name in sorted(files)))
+
+    def _compile(data):
+        try:
+            return portrait_build._compile_lua_chunk(luajit, data), None
+        except RuntimeError as exc:
+            return data, str(exc)
+
+    compiled = dict(zip(unique, portrait_build._ordered_map(_compile, unique, portrait_build._default_jobs())))
+    forms, rejected = {}, {}
+    for name in sorted(files):
+        data, error = compiled[files[name]]
+        files[name] = data
+        forms[name] = portrait_build._lua_form(data)
+        if error:
+            rejected[name] = error
+    return forms, rejected
+
+
+_FNV_BASIS = 0x811C9DC5
+_FNV_PRIME = 0x01000193
+
+
+def _fnv1a(name, basis=_FNV_BASIS):
+    value = basis
+    for byte in name.encode("utf-8"):
+        value = ((value ^ byte) * _FNV_PRIME) & 0xFFFFFFFF
+    return value
+
+
+def _reduce(value, n):
+    # Map onto [0, n) by the high bits: FNV's low bits are too weak for a
+    # power-of-two n, where % would only see each byte's low bits.
+    return (value * n) >> 32
+
+
+def _perfect_hash(names):
+    """Hash-and-displace minimal perfect hash over names.
+
+    Returns (slots, displace): slots[i] is the name stored at index i. To
+    look a key up, take d = displace[reduce(fnv1a(key), n)]; the key lives
+    at slot -d - 1 when d < 0, else at reduce(fnv1a(key, basis=d), n).
+    Buckets are placed largest first, so the displacement search stays short.
+    """
+    n = len(names)
+    buckets = [[] for _ in range(n)]
+    for name in names:
+        buckets[_reduce(_fnv1a(name), n)].append(name)
+    slots = [None] * n
+    displace = [0] * n
+    singles = []
+    for index in sorted(range(n), key=lambda i: -len(buckets[i])):
+        bucket = buckets[index]
+        if len(bucket) == 1:
+            singles.append(index)
+            continue
+        if not bucket:
+            continue
+        basis = 1
+        while True:
+            placed = [_reduce(_fnv1a(name, basis), n) for name in bucket]
+            if len(set(placed)) == len(placed) and all(slots[slot] is None for slot in placed):
+                break
+            basis += 1
+            if basis > 1 << 24:
+                raise RuntimeError(f"no perfect hash for bucket {bucket}")
+        displace[index] = basis
+        for name, slot in zip(bucket, placed):
+            slots[slot] = name
+    free = [slot for slot in range(n) if slots[slot] is None]
+    for index, slot in zip(singles, free):
+        slots[slot] = buckets[index][0]
+        displace[index] = -slot - 1
+    return slots, displace
+
+
+def _hash_order(chunks):
+    """Reorder chunks into perfect-hash slot order; return them and the displacements."""
+    by_name = {chunk[0]: chunk for chunk in chunks}
+    slots, displace = _perfect_hash(sorted(by_name))
+    return [by_name[name] for name in slots], displace
+
+
+def _write_lookup(out, chunks, displace):
+    """Emit kAssetHash/kAssetDisplace and find_asset(), which mirrors _perfect_hash."""
+    out.write("static const uint32_t kAssetHash[] = {")
+    out.write(",".join(f"{_fnv1a(chunk[0])}u" for chunk in chunks))
+    out.write("};\n")
+    out.write("static const int32_t kAssetDisplace[] = {")
+    out.write(",".join(str(value) for value in displace))
+    out.write("};\n\n")
+    out.write(f"""static inline uint32_t asset_fnv1a(const char* s, uint32_t h) {{
+  for (; *s; s++) h = (h ^ (unsigned char)*s) * {_FNV_PRIME:#010x}u;
+  return h;
+}}
+
+static inline uint32_t asset_reduce(uint32_t h) {{
+  return (uint32_t)(((uint64_t)h * (uint32_t)kAssetCount) >> 32);
+}}
+
+// O(1): one hash picks the slot, a second compare rejects misses.
+static inline const LuaAsset* find_asset(const char* name) {{
+  uint32_t h = asset_fnv1a(name, {_FNV_BASIS:#010x}u);
+  int32_t d = kAssetDisplace[asset_reduce(h)];
+  uint32_t slot = d < 0 ? (uint32_t)(-d - 1) : asset_reduce(asset_fnv1a(name, (uint32_t)d));
+  if (kAssetHash[slot] != h || strcmp(kAssets[slot].name, name) != 0) return nullptr;
+  return &kAssets[slot];
+}}
+""")
+
+
+def _blob_paths(out_path):
+    """The packed payload and its assembler stub live next to the header."""
+    return out_path.with_suffix(".bin"), out_path.with_suffix(".S")
+
+
+def _state_paths(out_path):
+    """The input-hash cache, and the stamp CMake depends on."""
+    return out_path.with_suffix(".cache.json"), out_path.with_suffix(".stamp")
+
+
+def _replace_if_changed(path, data):
+    """Atomically write data to path unless it already holds exactly that.
+
+    Leaving an identical file alone keeps its mtime, so CMake does not
+    rebuild anything for a regeneration that changed nothing.
+    """
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return True
+
+
+def _input_key(args, out_path, luajit_banner):
+    """Hash everything the generated output depends on.
+
+    That is every src/ Lua file, the whole Readabletro tree, this script and
+    build.py (whose patch constants and transforms are applied here), the
+    CLI flags, the zlib build that does the compressing and, for bytecode,
+    the LuaJIT that compiles.
+    """
+    digest = hashlib.sha256()
+    variant = "matrix" if args.matrix else (args.readabletro, args.crt_disable)
+    options = [variant, args.format, args.compress, str(out_path), zlib.ZLIB_RUNTIME_VERSION, luajit_banner]
+    digest.update(repr(options).encode())
+    inputs = [path for path in SRC_DIR.rglob("*.lua") if not _rel_of(path).startswith("localization/")]
+    inputs += [path for path in Path(portrait_build.READABLETRO_DIR).rglob("*") if path.is_file()]
+    inputs += [Path(__file__).resolve(), Path(portrait_build.__file__).resolve()]
+    for path in sorted(inputs):
+        digest.update(str(path).encode() + b"\0")
+        digest.update(hashlib.sha256(path.read_bytes()).digest())
+    return digest.hexdigest()
+
+
+def _load_cache(cache_path):
+    try:
+        return json.loads(cache_path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _pack_blob(payloads):
+    """Concatenate the payloads; return the blob and {payload: offset}."""
+    blob = bytearray()
+    offsets = {}
+    for payload in payloads:
+        if payload not in offsets:
+            offsets[payload] = len(blob)
+            blob += payload
+    return bytes(blob), offsets
+
+
+def _blob_symbol(index):
+    return "kAssetBlob" if index == 0 else f"kAssetBlob{index}"
+
+
+def _asm_string(path):
+    return '"' + path.as_posix().replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _write_blob(chunks, out_path, shared=()):
+    """Write assets_gen.bin, an .incbin stub for it, and the lookup header.
+
+    The assembler copies the bytes straight into .rodata, so neither this
+    script nor the C++ compiler has to spell out megabytes of initialisers;
+    the header only carries offsets into the blob. In matrix mode `shared`
+    lists (bin_path, {payload: offset}) blobs that other variants link too;
+    the stub links those as well and assets_gen.bin keeps only the rest.
+    Returns the paths that actually changed.
+    """
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    bin_path, asm_path = _blob_paths(out_path)
+    chunks, displace = _hash_order(chunks)
+    located = {}
+    for index, (_path, offsets) in enumerate(shared, 1):
+        for payload, offset in offsets.items():
+            located.setdefault(payload, (index, offset))
+    blob, offsets = _pack_blob(payload for _rel, payload, _len, _zlen in chunks if payload not in located)
+    located.update((payload, (0, offset)) for payload, offset in offsets.items())
+    blobs = [(bin_path, len(blob))] + [(path, path.stat().st_size) for path, _offsets in shared]
+
+    asm = io.StringIO()
+    asm.write("// AUTO-GENERATED by zygisk/gen_assets.py. Do not edit.\n")
+    asm.write('  .section .rodata.balatro_assets,"a",%progbits\n')
+    for index, (path, size) in enumerate(blobs):
+        symbol = _blob_symbol(index)
+        asm.write("  .p2align 4\n")
+        asm.write(f"  .globl {symbol}\n  .hidden {symbol}\n  .type {symbol}, %object\n")
+        asm.write(f"{symbol}:\n")
+        asm.write(f"  .incbin {_asm_string(path)}\n")
+        asm.write(f"  .size {symbol}, {size}\n")
+    asm.write('  .section .note.GNU-stack,"",%progbits\n')
+
+    out = io.StringIO()
+    out.write("// AUTO-GENERATED by zygisk/gen_assets.py. Do not edit.\n")
+    out.write("#pragma once\n#include <stddef.h>\n#include <stdint.h>\n#include <string.h>\n\n")
+    for index, (path, size) in enumerate(blobs):
+        name = path.name if index == 0 else os.path.relpath(path, out_path.parent).replace(os.sep, "/")
+        out.write(f"// {name}, linked by {asm_path.name}: {size} bytes.\n")
+        out.write(f'extern "C" const unsigned char {_blob_symbol(index)}[] __attribute__((visibility("hidden")));\n')
+    out.write("\n" + _LUA_ASSET_STRUCT)
+    out.write("static const LuaAsset kAssets[] = {\n")
+    for rel, payload, length, zlen in chunks:
+        index, offset = located[payload]
+        out.write(f'  {{"{rel}", {_blob_symbol(index)} + {offset}, {length}, {zlen}}},\n')
+    out.write("};\n")
+    out.write(f"static const int kAssetCount = {len(chunks)};\n")
+    _write_lookup(out, chunks, displace)
+
+    outputs = ((bin_path, blob), (asm_path, asm.getvalue().encode()), (out_path, out.getvalue().encode()))
+    return [path for path, data in outputs if _replace_if_changed(path, data)]
+
+
+# CMake always assembles assets_gen.S, so --format array writes one that
+# defines nothing.
+_EMPTY_STUB = (
+    "// AUTO-GENERATED by zygisk/gen_assets.py. Do not edit.\n"
+    "// --format array: assets_gen.h holds the payload, so there is nothing to link.\n"
+    '  .section .note.GNU-stack,"",%progbits\n'
+).encode()
+
+
+def _write_header(chunks, out_path):
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    names = sorted(files.keys())
-    with out_path.open("w", encoding="utf-8") as out:
-        out.write("// AUTO-GENERATED by zygisk/gen_assets.py. Do not edit.\n")
-        out.write("#pragma once\n#include <stddef.h>\n\n")
-        for index, rel in enumerate(names):
-            data = files[rel]
-            out.write(f"static const unsigned char asset_{index}[] = {{")
-            out.write(",".join(str(byte) for byte in data))
-            out.write("};\n")
-        out.write("\nstruct LuaAsset { const char* name; const unsigned char* data; size_t len; };\n")
-        out.write("static const LuaAsset kAssets[] = {\n")
-        for index, rel in enumerate(names):
-            out.write(f'  {{"{rel}", asset_{index}, {len(files[rel])}}},\n')
+    chunks, displace = _hash_order(chunks)
+    bin_path, asm_path = _blob_paths(out_path)
+    changed = []
+    # The blob from an earlier --format blob run is linked by nothing now.
+    if bin_path.exists():
+        bin_path.unlink()
+        changed.append(bin_path)
+    if _replace_if_changed(asm_path, _EMPTY_STUB):
+        changed.append(asm_path)
+    out = io.StringIO()
+    out.write("// AUTO-GENERATED by zygisk/gen_assets.py. Do not edit.\n")
+    out.write("#pragma once\n#include <stddef.h>\n#include <stdint.h>\n#include <string.h>\n\n")
+    for index, (_rel, payload, _len, _zlen) in enumerate(chunks):
+        out.write(f"static const unsigned char asset_{index}[] = {{")
+        out.write(",".join(str(byte) for byte in payload))
         out.write("};\n")
-        out.write(f"static const int kAssetCount = {len(names)};\n")
+    out.write("\n" + _LUA_ASSET_STRUCT)
+    out.write("static const LuaAsset kAssets[] = {\n")
+    for index, (rel, _payload, length, zlen) in enumerate(chunks):
+        out.write(f'  {{"{rel}", asset_{index}, {length}, {zlen}}},\n')
+    out.write("};\n")
+    out.write(f"static const int kAssetCount = {len(chunks)};\n")
+    _write_lookup(out, chunks, displace)
+    if _replace_if_changed(out_path, out.getvalue().encode()):
+        changed.append(out_path)
+    return changed
+
+
+def _outputs_of(args, out_path):
+    bin_path, asm_path = _blob_paths(out_path)
+    return [out_path, bin_path, asm_path] if args.format == "blob" else [out_path, asm_path]
+
+
+def _write_stamp(stamp_path, outputs):
+    # The stamp names what was generated; it only moves when an output did,
+    # so depending on it costs nothing for a no-op regeneration.
+    outputs_digest = hashlib.sha256()
+    for path in outputs:
+        outputs_digest.update(path.name.encode() + b"\0" + hashlib.sha256(path.read_bytes()).digest())
+    _replace_if_changed(stamp_path, f"{outputs_digest.hexdigest()}\n".encode())
+
+
+def _summary(files, resource_count, chunks, out_path, forms, changed):
+    total = sum(length for _rel, _payload, length, _zlen in chunks)
+    stored = sum(len(payload) for _rel, payload, _len, _zlen in chunks)
+    bytecode = sum(form == "bytecode" for form in forms.values())
+    return (
+        f"embedded {len(files) - resource_count} Lua chunks, {resource_count} resource files, "
+        f"{total} bytes ({stored} stored) -> {out_path}"
+        + (f", {bytecode} as bytecode" if bytecode else "")
+        + ("" if changed else " (unchanged)")
+    )
+
+
+def _resolve_luajit(args):
+    """Return (luajit path, its version banner), or (None, None) without --bytecode."""
+    if args.bytecode != "on":
+        return None, None
+    luajit = portrait_build._find_luajit(args.luajit)
+    if not luajit:
+        sys.exit("--bytecode on needs LuaJIT 2.1: install luajit or pass --luajit PATH")
+    try:
+        return luajit, portrait_build._luajit_target(luajit)
+    except RuntimeError as exc:
+        sys.exit(f"--bytecode on: {exc}")
+
+
+# ── Matrix ───────────────────────────────────────────────────────────────────
+#
+# All four variants from one read of src/ and the Readabletro tree: the
+# resource index and chunks are built once per readabletro flag, every
+# distinct chunk is compiled and deflated once, and a payload used by more
+# than one variant goes into a blob under shared/ named after the variants
+# using it. Each variant's .S links its own assets_gen.bin plus the shared
+# blobs it needs, so no variant's module carries another one's textures.
+
+def _group_label(group):
+    """Name a shared blob after what its variants have in common."""
+    if len(group) == len(MATRIX_VARIANTS):
+        return "common"
+    common = [values[0] for values in zip(*(name.split("_") for name in group)) if len(set(values)) == 1]
+    exact = tuple(name for name, _r, _c in MATRIX_VARIANTS if all(part in name.split("_") for part in common))
+    return "_".join(common) if common and exact == group else "+".join(group)
+
+
+def _shared_blobs(variant_chunks, shared_dir):
+    """Write every payload more than one variant uses once, one blob per set
+    of variants using it. Returns {variant: [(bin_path, {payload: offset})]}
+    and the blob paths."""
+    users = {}
+    for name, chunks in variant_chunks.items():
+        for _rel, payload, _len, _zlen in chunks:
+            names = users.setdefault(payload, [])
+            if name not in names:
+                names.append(name)
+    groups = {}
+    for payload, names in users.items():
+        if len(names) > 1:
+            groups.setdefault(tuple(names), []).append(payload)
+
+    shared_dir.mkdir(parents=True, exist_ok=True)
+    linked = {name: [] for name in variant_chunks}
+    paths = []
+    for group in sorted(groups, key=lambda group: (-len(group), group)):
+        blob, offsets = _pack_blob(groups[group])
+        path = shared_dir / f"{_group_label(group)}.bin"
+        _replace_if_changed(path, blob)
+        paths.append(path)
+        for name in group:
+            linked[name].append((path, offsets))
+    for stale in shared_dir.glob("*.bin"):
+        if stale not in paths:
+            stale.unlink()
+    return linked, paths
+
+
+def _matrix_outputs(out_dir, cache):
+    outputs = []
+    for name, _readabletro, _crt_disable in MATRIX_VARIANTS:
+        out_path = out_dir / name / "assets_gen.h"
+        outputs += [out_path, *_blob_paths(out_path), _state_paths(out_path)[1]]
+    return outputs + [out_dir / "shared" / blob for blob in cache.get("shared", ())]
+
+
+def _emit_matrix(args, out_dir, luajit, luajit_banner):
+    cache_path = out_dir / "matrix.cache.json"
+    key = _input_key(args, out_dir, luajit_banner)
+    cache = _load_cache(cache_path)
+    if (not args.force and cache.get("inputs") == key
+            and all(path.exists() for path in _matrix_outputs(out_dir, cache))):
+        print(f"inputs unchanged - {out_dir} is up to date")
+        return
+
+    sources = _read_lua_sources()
+    managed_resource_files = _collect_readabletro_files(True)
+    parts = {flag: _preload_parts(flag, managed_resource_files) for flag in (True, False)}
+    variants, resource_counts = {}, {}
+    for name, readabletro, crt_disable in MATRIX_VARIANTS:
+        files = _collect_lua_files(readabletro, crt_disable, sources)
+        resource_counts[name] = _fold_preloads(files, readabletro, parts[readabletro])
+        variants[name] = files
+
+    merged = {(name, rel): data for name, files in variants.items() for rel, data in files.items()}
+    forms = {name: {rel: "source" for rel in files} for name, files in variants.items()}
+    if luajit:
+        merged_forms, rejected = _compile_chunks(merged, luajit)
+        for (name, rel), form in merged_forms.items():
+            variants[name][rel] = merged[(name, rel)]
+            forms[name][rel] = form
+        for rel, error in sorted({rel: error for (_name, rel), error in rejected.items()}.items()):
+            print(f"warning: {rel} embedded as source ({error})")
+
+    deflated = {}
+    if args.compress == "on":
+        unique = list(dict.fromkeys(data for data in merged.values() if data))
+        deflated = dict(zip(unique, portrait_build._ordered_map(_deflate, unique, portrait_build._default_jobs())))
+    chunks = {name: _encode_chunks(files, args.compress == "on", deflated) for name, files in variants.items()}
+    linked, shared_paths = _shared_blobs(chunks, out_dir / "shared")
+
+    def _emit(name):
+        out_path = out_dir / name / "assets_gen.h"
+        changed = _write_blob(chunks[name], out_path, linked[name])
+        _write_stamp(_state_paths(out_path)[1],
+                     [*_outputs_of(args, out_path), *(path for path, _offsets in linked[name])])
+        return _summary(variants[name], resource_counts[name], chunks[name], out_path, forms[name], changed)
+
+    names = [name for name, _readabletro, _crt_disable in MATRIX_VARIANTS]
+    for line in portrait_build._ordered_map(_emit, names, len(names)):
+        print(line)
+    _replace_if_changed(cache_path, json.dumps({"inputs": key, "forms": forms,
+                                                "shared": [path.name for path in shared_paths]},
+                                               indent=1, sort_keys=True).encode())
+
+    shared = sum(path.stat().st_size for path in shared_paths)
+    separate = sum(len(payload) for variant_chunks in chunks.values() for _rel, payload, _len, _zlen in variant_chunks)
+    written = shared + sum(_blob_paths(out_dir / name / "assets_gen.h")[0].stat().st_size for name in names)
+    print(f"matrix: {len(names)} variants, {written} blob bytes on disk ({shared} in {len(shared_paths)} "
+          f"shared blobs), {separate} without sharing")
 
 
 def main():
     args = _parse_args()
+    luajit, luajit_banner = _resolve_luajit(args)
+    if args.matrix:
+        _emit_matrix(args, Path(args.matrix).resolve(), luajit, luajit_banner)
+        return
+
     readabletro = args.readabletro == "on"
     crt_disable = args.crt_disable == "on"
     out_path = Path(args.out).resolve()
+    cache_path, stamp_path = _state_paths(out_path)
+
+    key = _input_key(args, out_path, luajit_banner)
+    cache = _load_cache(cache_path)
+    outputs = _outputs_of(args, out_path)
+    if (not args.force and cache.get("inputs") == key and stamp_path.exists()
+            and all(path.exists() for path in outputs)):
+        print(f"inputs unchanged - {out_path} is up to date")
+        return
 
     files = _collect_lua_files(readabletro=readabletro, crt_disable=crt_disable)
     embedded_resource_count = _fold_preloads(files, readabletro=readabletro)
-    _write_header(files, out_path)
-
-    total = sum(len(data) for data in files.values())
-    print(
-        f"embedded {len(files)} Lua chunks, {embedded_resource_count} resource files, "
-        f"{total} bytes -> {out_path}"
-    )
+    forms, rejected = _compile_chunks(files, luajit) if luajit else ({rel: "source" for rel in files}, {})
+    for rel, error in sorted(rejected.items()):
+        print(f"warning: {rel} embedded as source ({error})")
+    chunks = _encode_chunks(files, compress=args.compress == "on")
+    if args.format == "blob":
+        changed = _write_blob(chunks, out_path)
+    else:
+        changed = _write_header(chunks, out_path)
+
+    _write_stamp(stamp_path, outputs)
+    # forms records whether each chunk shipped as bytecode or source.
+    _replace_if_changed(cache_path, json.dumps({"inputs": key, "forms": forms}, indent=1, sort_keys=True).encode())
+    print(_summary(files, embedded_resource_count, chunks, out_path, forms, changed))
 
 
 if __name__ == "__main__":
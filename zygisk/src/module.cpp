@@ -3,14 +3,18 @@
 // (Android_JNI_SetOrientation -> JNI setRequestedOrientation(1)) into Balatro.
 #include <cstring>
 #include <cstdio>
+#include <cstdlib>
 #include <unistd.h>
 #include <dlfcn.h>
 #include <jni.h>
 #include <android/log.h>
+#include <zlib.h>
 
 #include "zygisk.hpp"
 #include "shadowhook.h"
-#include "assets_gen.h"
+// Angle brackets: the header comes from BALATRO_ASSETS_DIR (see CMakeLists.txt),
+// not from a src/assets_gen.h a single-variant run may have left next to us.
+#include <assets_gen.h>
 
 // Provided by our shadowhook patch (sh_linker.c): absolute path to load
 // libshadowhook_nothing.so from, instead of the default linker search path.
@@ -30,18 +34,74 @@ static JavaVM *g_vm = nullptr;
 typedef int (*loadbuffer_t)(void *, const char *, size_t, const char *);
 static loadbuffer_t orig_loadbuffer = nullptr;
 
+// Chunks with zlen != 0 are raw deflate (gen_assets.py --compress on).
+// They are inflated into a scratch buffer only when Lua asks for them and
+// freed once luaL_loadbuffer returns: Lua has parsed the source by then, so
+// only the compressed copy in .rodata stays mapped for the game's lifetime.
+static unsigned char *inflate_asset(const LuaAsset &asset) {
+  unsigned char *out = (unsigned char *)malloc(asset.len);
+  if (out == nullptr) return nullptr;
+  z_stream zs;
+  memset(&zs, 0, sizeof zs);
+  if (inflateInit2(&zs, -15) != Z_OK) { free(out); return nullptr; }
+  zs.next_in = (Bytef *)asset.data;
+  zs.avail_in = (uInt)asset.zlen;
+  zs.next_out = out;
+  zs.avail_out = (uInt)asset.len;
+  int rc = inflate(&zs, Z_FINISH);
+  inflateEnd(&zs);
+  if (rc != Z_STREAM_END || zs.total_out != asset.len) { free(out); return nullptr; }
+  return out;
+}
+
+// The source Lua should see for an asset: its .rodata bytes, or a freshly
+// inflated copy handed back in *owned for the caller to free.
+static const char *asset_source(const LuaAsset &asset, unsigned char **owned) {
+  *owned = nullptr;
+  if (asset.zlen == 0) return (const char *)asset.data;
+  *owned = inflate_asset(asset);
+  if (*owned == nullptr) LOGE("inflate %s failed", asset.name);
+  return (const char *)*owned;
+}
+
+// Lovely calls this for every mod file too, so the lookup is find_asset()'s
+// generated perfect hash rather than a scan of kAssets.
 static int my_loadbuffer(void *L, const char *buff, size_t sz, const char *name) {
   if (name && name[0] == '@') {
-    const char *rel = name + 1;
-    for (int i = 0; i < kAssetCount; i++) {
-      if (strcmp(rel, kAssets[i].name) == 0) {
-        return orig_loadbuffer(L, (const char *)kAssets[i].data, kAssets[i].len, name);
-      }
+    const LuaAsset *asset = find_asset(name + 1);
+    unsigned char *owned;
+    const char *source = asset ? asset_source(*asset, &owned) : nullptr;
+    if (source != nullptr) {
+      int rc = orig_loadbuffer(L, source, asset->len, name);
+      free(owned);
+      return rc;
     }
   }
   return orig_loadbuffer(L, buff, sz, name);
 }
 
+// Embedded resources are separate chunks so a normal launch never parses
+// them. The installer in portrait_config asks for one with
+// loadstring("", "=portrait_embedded/<path>"), which LuaJIT routes through
+// luaL_loadbufferx rather than luaL_loadbuffer.
+typedef int (*loadbufferx_t)(void *, const char *, size_t, const char *, const char *);
+static loadbufferx_t orig_loadbufferx = nullptr;
+static const char kEmbeddedPrefix[] = "=portrait_embedded/";
+
+static int my_loadbufferx(void *L, const char *buff, size_t sz, const char *name, const char *mode) {
+  if (name && strncmp(name, kEmbeddedPrefix, sizeof kEmbeddedPrefix - 1) == 0) {
+    const LuaAsset *asset = find_asset(name + 1);
+    unsigned char *owned;
+    const char *source = asset ? asset_source(*asset, &owned) : nullptr;
+    if (source != nullptr) {
+      int rc = orig_loadbufferx(L, source, asset->len, name, mode);
+      free(owned);
+      return rc;
+    }
+  }
+  return orig_loadbufferx(L, buff, sz, name, mode);
+}
+
 // ---- Android_JNI_SetOrientation hook (force portrait) ----
 typedef void (*setorient_t)(int, int, int, const char *);
 static setorient_t orig_setorient = nullptr;
@@ -91,6 +151,10 @@ static void install_hooks() {
                                       (void *)my_loadbuffer, (void **)&orig_loadbuffer);
   LOGI("hook luaL_loadbuffer stub=%p errno=%d", s1, shadowhook_get_errno());
 
+  void *s3 = shadowhook_hook_sym_name("liblove.so", "luaL_loadbufferx",
+                                      (void *)my_loadbufferx, (void **)&orig_loadbufferx);
+  LOGI("hook luaL_loadbufferx stub=%p errno=%d", s3, shadowhook_get_errno());
+
   void *s2 = shadowhook_hook_sym_name("liblove.so", "Android_JNI_SetOrientation",
                                       (void *)my_setorient, (void **)&orig_setorient);
   LOGI("hook Android_JNI_SetOrientation stub=%p errno=%d", s2, shadowhook_get_errno());